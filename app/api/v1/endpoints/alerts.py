@@ -1,13 +1,85 @@
-from fastapi import APIRouter, HTTPException
-from app.schemas.alert import AlertSchema
-from app.services.alerting import trigger_alert
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.deps import get_database_session
+from app.schemas.alert import (
+    AlertAcknowledge, AlertAcknowledgement, AlertCreate, AlertDetail, AlertDispatchResult, AlertHistoryPage,
+)
+from app.services import alert_history, persistence
+from app.services.alerting import plan_deliveries, trigger_alert
+from app.services.escalation import escalation_scheduler
 
 router = APIRouter()
 
-@router.post("/alerts", response_model=AlertSchema)
-async def send_alert(alert: AlertSchema):
+@router.post("/alerts", response_model=AlertDispatchResult)
+async def send_alert(alert: AlertCreate):
     try:
-        result = await trigger_alert(alert)
-        return result
+        results = await trigger_alert(
+            alert.urgency_level,
+            alert.message,
+            doctor_emails=alert.doctor_emails,
+            doctor_phones=alert.doctor_phones,
+            doctor_webhooks=alert.doctor_webhooks,
+        )
+        if results:
+            alert_id = persistence.new_id()
+            plan = plan_deliveries(alert.urgency_level, alert.doctor_emails, alert.doctor_phones, alert.doctor_webhooks)
+            persistence.record_alert(alert_id, alert.patient_id, alert.urgency_level, alert.message, "direct", plan)
+            persistence.record_delivery_attempts(alert_id, results)
+            escalation_scheduler.track(alert_id, alert.patient_id, alert.urgency_level, alert.message)
+        return AlertDispatchResult(
+            patient_id=alert.patient_id,
+            urgency_level=alert.urgency_level,
+            results=results,
+        )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/alerts", response_model=AlertHistoryPage, response_model_exclude_unset=True)
+async def list_alerts(
+    user_id: Optional[str] = None,
+    urgency_level: Optional[str] = None,
+    since: Optional[datetime] = Query(None, description="inclusive; ISO 8601, naive means UTC"),
+    until: Optional[datetime] = Query(None, description="exclusive"),
+    tag: Optional[str] = None,
+    delivery_status: Optional[str] = Query(None, description="'delivered' or 'undelivered'"),
+    fields: Optional[str] = Query(None, description="comma-separated field names; default all"),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_database_session),
+):
+    try:
+        items, next_cursor = await alert_history.query_alerts(
+            db,
+            user_id=user_id,
+            urgency_level=urgency_level,
+            since=since,
+            until=until,
+            tag=tag,
+            delivery_status=delivery_status,
+            fields=alert_history.parse_fields(fields),
+            limit=limit,
+            cursor=cursor,
+        )
+    except alert_history.InvalidQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "next_cursor": next_cursor}
+
+@router.get("/alerts/{alert_id}", response_model=AlertDetail)
+async def get_alert(alert_id: str, db: AsyncSession = Depends(get_database_session)):
+    alert = await alert_history.get_alert(db, alert_id)
+    if alert is None:
+        raise HTTPException(status_code=404, detail="Alert not found")
+    return alert
+
+@router.post("/alerts/{alert_id}/ack", response_model=AlertAcknowledgement)
+async def acknowledge_alert(alert_id: str, ack: Optional[AlertAcknowledge] = None):
+    """Stop the escalation of an alert; acknowledging again returns the first acknowledgement."""
+    try:
+        acknowledgement = await escalation_scheduler.acknowledge(alert_id, ack.acknowledged_by if ack else None)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"could not record the acknowledgement: {e}")
+    if acknowledgement is None:
+        raise HTTPException(status_code=404, detail="Alert not found or not awaiting acknowledgement")
+    return acknowledgement._asdict()
@@ -1,11 +1,27 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, BackgroundTasks
+from fastapi import APIRouter, UploadFile, File, Form, Header, HTTPException, BackgroundTasks, Depends, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict
-import tempfile
-import os
-from app.services.transcription import transcribe_audio
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Dict, Optional
+import asyncio
+import json
+from app.core.config import settings
+from app.core.metrics import timed
+from app.database import get_sessionmaker
+from app.deps import get_database_session
+from app.services.transcription import transcribe_audio_with_stats
 from app.services.profiling import profile_text
-from app.services.alerting import trigger_alert
+from app.services.alerting import plan_deliveries, trigger_alert
+from app.services.outbox import enqueue_alert
+from app.services import persistence
+from app.services.dedup import Digest, alert_suppressor, digest_message
+from app.services.escalation import Escalation, escalation_message, escalation_scheduler
+from app.services.jobs import Job, job_manager
+from app.services.pipeline import run_pipeline
+from app.services.routing import recipient_router
+from app.services.resilience import ConcurrencyLimiter, Overloaded, ProviderUnavailable, retry_after_header
+from app.services.triage_rules import pretriage
+from app.utils.uploads import UploadTooLarge, remove_quietly, save_upload, temporary_upload
 
 router = APIRouter()
 
@@ -16,56 +32,318 @@ class PatientAlertResponse(BaseModel):
     tags: List[str]
     reason: str
     alert_sent: bool
-    alert_results: Dict[str, bool] = {}
+    # {channel: {recipient: delivered}}; null while the delivery is still queued (background, immediate and outbox modes)
+    alert_results: Dict[str, Dict[str, Optional[bool]]] = {}
+    # "llm", "rules" when the red-flag pre-triage answered alone, or "rules_fallback" when the LLM was unavailable
+    triage_source: str = "llm"
+    # seconds of silence the VAD kept out of the transcription upload
+    audio_seconds_removed: Optional[float] = None
+    # a repeat of an alert sent moments ago: held back and merged into the next digest
+    alert_suppressed: bool = False
+
+class JobAccepted(BaseModel):
+    job_id: str
+    status: str
+    status_url: str
+    events_url: str
+
+class JobStatus(BaseModel):
+    job_id: str
+    user_id: str
+    mode: str
+    # queued | running | done | failed
+    status: str
+    created_at: float
+    updated_at: float
+    # latest stage event: queued, started, transcribed, triaged, alerted, completed or failed
+    stage: Optional[str] = None
+    result: Optional[PatientAlertResponse] = None
+    error: Optional[str] = None
+
+# bounded admission: a brownout upstream must not pile up unbounded requests here
+request_limiter = ConcurrencyLimiter(
+    "patient_alert",
+    settings.PATIENT_ALERT_MAX_INFLIGHT,
+    settings.PATIENT_ALERT_MAX_QUEUE,
+    settings.PATIENT_ALERT_QUEUE_TIMEOUT_SECONDS,
+)
+
+# early alerts started outside the request; held so they are not garbage-collected mid-flight
+_inflight_alerts = set()
+
+def _recipient_args(recipients):
+    # no explicit recipients: the channels' on-call defaults
+    if not recipients:
+        return {}
+    return {
+        "doctor_emails": recipients.get("email"),
+        "doctor_phones": recipients.get("sms"),
+        "doctor_webhooks": recipients.get("webhook"),
+    }
+
+async def _deliver_and_record(alert_id, urgency_level, message, recipients=None):
+    results = await trigger_alert(urgency_level=urgency_level, message=message, **_recipient_args(recipients))
+    persistence.record_delivery_attempts(alert_id, results)
+    return results
+
+@timed("dispatch")
+async def _dispatch_alert(
+    db, background_tasks, user_id, urgency_level, message, immediate=False, audit=None, dedup=True,
+    recipients=None, escalate=True,
+):
+    """
+    `audit` carries the transcript / triage ids and tags the alert record links to.
+    `recipients` ({channel: [...]}) replaces the on-call defaults; without it the patient's
+    care team and on-call rotation are paged (app/services/routing.py); with `escalate` the
+    alert is re-sent to the next tier if nobody acknowledges it in time.
+    Returns None when storm suppression held the alert back.
+    """
+    audit = audit or {}
+    urgency_level = urgency_level.upper()
+    if dedup and not await alert_suppressor.admit(user_id, urgency_level, audit.get("tags", []), message):
+        return None
+    if recipients is None:
+        # channels the routing leaves empty keep their on-call defaults
+        recipients = recipient_router.recipients(user_id, urgency_level, audit.get("tags", []))
+    alert_id = persistence.new_id()
+    plan = plan_deliveries(urgency_level, **_recipient_args(recipients))
+    if settings.ALERT_DELIVERY_MODE == "outbox":
+        delivery_mode = "outbox"
+        results = await enqueue_alert(
+            db, urgency_level=urgency_level, message=message, user_id=user_id, alert_id=alert_id,
+            **_recipient_args(recipients),
+        )
+    elif immediate or background_tasks is None:
+        delivery_mode = "immediate"
+        # BackgroundTasks only run after the response is sent; start the fan-out now instead
+        task = asyncio.create_task(_deliver_and_record(alert_id, urgency_level, message, recipients))
+        _inflight_alerts.add(task)
+        task.add_done_callback(_inflight_alerts.discard)
+        # nothing has been sent yet: the outcome goes to the audit trail, not this response
+        results = {channel: dict.fromkeys(recipients) for channel, recipients in plan.items()}
+    else:
+        delivery_mode = "background"
+        background_tasks.add_task(_deliver_and_record, alert_id, urgency_level, message, recipients)
+        results = {channel: dict.fromkeys(recipients) for channel, recipients in plan.items()}
+    if plan:
+        persistence.record_alert(
+            alert_id, user_id, urgency_level, message, delivery_mode, plan, **audit
+        )
+        if escalate:
+            escalation_scheduler.track(alert_id, user_id, urgency_level, message)
+    return results
+
+async def dispatch_digest(digest: Digest):
+    """Send the digest of alerts held back by storm suppression (started in app/main.py)."""
+    message = digest_message(digest, alert_suppressor.window)
+    async with get_sessionmaker()() as db:
+        await _dispatch_alert(
+            db, None, digest.user_id, digest.urgency_level, message, immediate=True,
+            audit={"tags": digest.tags}, dedup=False,
+        )
+
+async def dispatch_escalation(escalation: Escalation):
+    """Re-send an unacknowledged alert to its next tier at HIGH urgency (started in app/main.py)."""
+    message = escalation_message(escalation, escalation_scheduler.ack_seconds)
+    async with get_sessionmaker()() as db:
+        await _dispatch_alert(
+            db, None, escalation.user_id, "HIGH", message, immediate=True,
+            audit={"tags": ["escalation"]}, dedup=False, recipients=escalation.recipients, escalate=False,
+        )
+
+def _no_events(event, data=None):
+    pass
+
+async def _process_patient_alert(db, background_tasks, user_id, audio_path, mode, emit=_no_events):
+    """
+    Transcribe, triage and alert for one recording. `emit(event, data)` is
+    told about each stage (transcribed, triaged, alerted); the job API streams them.
+    """
+    alert_results = {}
+    alert_suppressed = False
+    early = None
+    transcript_id = persistence.new_id()
+
+    async def page_early(rules, partial_text):
+        nonlocal early, alert_results, alert_suppressed
+        early = rules
+        results = await _dispatch_alert(
+            db, background_tasks, user_id, "HIGH", partial_text, immediate=True,
+            audit={"transcript_id": transcript_id, "tags": rules.get("tags", [])},
+        )
+        alert_suppressed = results is None
+        alert_results = results or {}
+        emit("alerted", {"urgency_level": "HIGH", "early": True, "alert_results": alert_results,
+                         "alert_suppressed": alert_suppressed})
+
+    # 2. Transcribe. In pipeline mode chunks are transcribed concurrently and red flags page as soon as they appear.
+    if mode == "pipeline":
+        pipeline = await run_pipeline(
+            audio_path, on_red_flag=page_early if settings.PRETRIAGE_ENABLED else None
+        )
+        transcription = {}
+        transcribed_text = pipeline["transcribed_text"]
+        seconds_removed = pipeline["audio_seconds_removed"]
+    else:
+        transcription = await transcribe_audio_with_stats(audio_path)
+        transcribed_text = transcription["text"]
+        seconds_removed = transcription["seconds_removed"]
+    # audit rows are buffered and written in batches, off the request path
+    persistence.record_transcript(transcript_id, user_id, transcribed_text, transcription)
+    emit("transcribed", {"transcribed_text": transcribed_text, "audio_seconds_removed": seconds_removed})
+
+    # 3. Local red-flag pre-triage: obvious emergencies are paged before the LLM answers
+    if settings.PRETRIAGE_ENABLED and early is None:
+        rules = pretriage(transcribed_text)
+        if rules["urgency"] == "HIGH" and rules["confidence"] >= settings.PRETRIAGE_DISPATCH_CONFIDENCE:
+            await page_early(rules, transcribed_text)
+
+    # 4. Analyze text using LLM (skipped if the rules already paged and PRETRIAGE_SKIP_LLM is set)
+    triage_source = "llm"
+    if early and settings.PRETRIAGE_SKIP_LLM:
+        profile = early
+        triage_source = "rules"
+    else:
+        profile = await profile_text(transcribed_text)
+        if "error" in profile:
+            # the LLM was unavailable and the local rules answered
+            triage_source = "rules_fallback"
+    urgency_level = profile.get("urgency", "MEDIUM")
+    tags = profile.get("tags", [])
+    reason = profile.get("reason", "")
+    triage_id = persistence.new_id()
+    persistence.record_triage(triage_id, transcript_id, user_id, profile, triage_source)
+    emit("triaged", {"urgency_level": urgency_level, "tags": tags, "reason": reason, "triage_source": triage_source})
+
+    # 5. Queue alerts if urgency is HIGH or MEDIUM (delivered by the outbox worker)
+    if not early and urgency_level.upper() in ["HIGH", "MEDIUM"]:
+        results = await _dispatch_alert(
+            db, background_tasks, user_id, urgency_level, transcribed_text,
+            audit={"transcript_id": transcript_id, "triage_id": triage_id, "tags": tags},
+        )
+        alert_suppressed = results is None
+        alert_results = results or {}
+        emit("alerted", {"urgency_level": urgency_level, "early": False, "alert_results": alert_results,
+                         "alert_suppressed": alert_suppressed})
+    # sent, or queued for delivery (None); False only when every attempt failed
+    alert_sent = any(ok is not False for channel in alert_results.values() for ok in channel.values())
+
+    # 6. Return unified response
+    return PatientAlertResponse(
+        user_id=user_id,
+        transcribed_text=transcribed_text,
+        urgency_level=urgency_level,
+        tags=tags,
+        reason=reason,
+        alert_sent=alert_sent,
+        alert_results=alert_results,
+        triage_source=triage_source,
+        audio_seconds_removed=seconds_removed,
+        alert_suppressed=alert_suppressed,
+    )
+
+def _validate_upload(file: UploadFile, mode: str):
+    if not file.content_type.startswith("audio/"):
+        raise HTTPException(status_code=400, detail="Invalid file type. Please upload an audio file.")
+    if mode not in ("standard", "pipeline"):
+        raise HTTPException(status_code=400, detail="mode must be 'standard' or 'pipeline'.")
 
 @router.post("/patient_alert", response_model=PatientAlertResponse)
 async def patient_alert(
     background_tasks: BackgroundTasks,
-    user_id: str = Form(...),
+    user_id: str = Form(..., max_length=128),
     file: UploadFile = File(...),
+    # "standard", or "pipeline" for long recordings: chunked transcription with early red-flag alerts
+    mode: str = Form("standard"),
+    db: AsyncSession = Depends(get_database_session),
 ):
-    if not file.content_type.startswith("audio/"):
-        raise HTTPException(status_code=400, detail="Invalid file type. Please upload an audio file.")
+    _validate_upload(file, mode)
 
     try:
-        # 1. Save audio to a cross-platform temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as tmp:
-            temp_path = tmp.name
-            tmp.write(await file.read())
+        await request_limiter.acquire()
+    except Overloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers=retry_after_header(e))
+    try:
+        # 1. Stream audio to a temporary file (size-capped, always removed)
+        async with temporary_upload(file) as temp_path:
+            return await _process_patient_alert(db, background_tasks, user_id, temp_path, mode)
 
-        # 2. Transcribe audio
-        transcribed_text = await transcribe_audio(temp_path)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ProviderUnavailable as e:
+        # transcription backends down or shedding: ask the client to retry later
+        raise HTTPException(status_code=503, detail=str(e), headers=retry_after_header(e))
+    finally:
+        request_limiter.release()
 
-        # 3. Analyze text using LLM
-        profile = await profile_text(transcribed_text)
-        urgency_level = profile.get("urgency", "MEDIUM")
-        tags = profile.get("tags", [])
-        reason = profile.get("reason", "")
-
-        # 4. Trigger alerts asynchronously if urgency is HIGH or MEDIUM
-        alert_sent = False
-        alert_results = {}
-        if urgency_level.upper() in ["HIGH", "MEDIUM"]:
-            alert_results = trigger_alert(
-                urgency_level=urgency_level,
-                message=transcribed_text,
-                background_tasks=background_tasks
-            )
-            alert_sent = any(alert_results.values())
-
-        # 5. Clean up temp file
-        os.remove(temp_path)
-
-        # 6. Return unified response
-        return PatientAlertResponse(
-            user_id=user_id,
-            transcribed_text=transcribed_text,
-            urgency_level=urgency_level,
-            tags=tags,
-            reason=reason,
-            alert_sent=alert_sent,
-            alert_results=alert_results
-        )
+async def run_job(job: Job):
+    """Job handler for the asynchronous API (started in app/main.py)."""
+    async with get_sessionmaker()() as db:
+        response = await _process_patient_alert(db, None, job.user_id, job.audio_path, job.mode, emit=job.emit)
+    return response.model_dump()
+
+@router.post("/jobs", status_code=202, response_model=JobAccepted)
+async def submit_patient_alert_job(
+    request: Request,
+    response: Response,
+    user_id: str = Form(..., max_length=128),
+    file: UploadFile = File(...),
+    mode: str = Form("standard"),
+):
+    """
+    Same input as /patient_alert, answered with 202 as soon as the audio is
+    stored. Poll status_url or stream events_url (SSE) for the stages and result.
+    """
+    _validate_upload(file, mode)
+    try:
+        audio_path = await save_upload(file, directory=settings.JOB_AUDIO_DIR)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    try:
+        job = job_manager.submit(user_id, mode, audio_path)
+    except Overloaded as e:
+        remove_quietly(audio_path)
+        raise HTTPException(status_code=503, detail=str(e), headers=retry_after_header(e))
+    status_url = str(request.url_for("get_patient_alert_job", job_id=job.id))
+    response.headers["Location"] = status_url
+    return JobAccepted(
+        job_id=job.id,
+        status=job.status,
+        status_url=status_url,
+        events_url=str(request.url_for("stream_patient_alert_job", job_id=job.id)),
+    )
+
+def _get_job(job_id: str) -> Job:
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found (unknown, expired, or accepted by another instance).")
+    return job
+
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_patient_alert_job(job_id: str):
+    return _get_job(job_id).to_dict()
+
+@router.get("/jobs/{job_id}/events")
+async def stream_patient_alert_job(job_id: str, last_event_id: Optional[str] = Header(None)):
+    """
+    Server-sent events: one `event: <stage>` per stage with a JSON `data:`
+    line, ending with `completed` (the full result) or `failed`. A reconnect
+    with Last-Event-ID resumes after that event.
+    """
+    job = _get_job(job_id)
+    after = int(last_event_id) if last_event_id and last_event_id.isdigit() else -1
+
+    async def events():
+        async for record in job.subscribe(after, keepalive=settings.JOB_SSE_KEEPALIVE_SECONDS):
+            if record is None:
+                yield ": keepalive\n\n"
+            else:
+                yield f"id: {record['id']}\nevent: {record['event']}\ndata: {json.dumps(record['data'])}\n\n"
+
+    return StreamingResponse(
+        events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+@router.get("/dedup/stats")
+async def alert_dedup_stats():
+    return alert_suppressor.stats()
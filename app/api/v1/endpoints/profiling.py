@@ -1,13 +1,96 @@
-from fastapi import APIRouter, HTTPException
+import json
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from app.schemas.profiling import BatchProfileRequest
 from app.schemas.transcription import TranscriptionResponse
-from app.services.profiling import analyze_text
+from app.services.profiling import analyze_text, invalidate_profile_cache, profile_cache, profile_texts_batch
 
 router = APIRouter()
 
+JSONL_CONTENT_TYPES = ("application/x-ndjson", "application/jsonl", "application/x-jsonlines")
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse without Starlette's disconnect listener. The body
+    generator is still reading the JSONL request while results stream out,
+    and the listener would consume (and drop) those request chunks.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+
 @router.post("/profile", response_model=TranscriptionResponse)
 async def profile_text(transcription: TranscriptionResponse):
     try:
         urgency_level = analyze_text(transcription.text)
         return {"text": transcription.text, "urgency": urgency_level}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def _jsonl_transcripts(request: Request, errors: Deque[Dict[str, Any]]):
+    """
+    Yield transcripts from a JSONL body as lines arrive: each line is a string or {"text": ...}.
+    Lines that do not parse are skipped and reported in `errors` as {"line": n, "error": ...} (n is 1-based).
+    """
+    buffer = b""
+    number = 0
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            number += 1
+            if line.strip() and (text := _transcript_from_line(line, number, errors)) is not None:
+                yield text
+    if buffer.strip() and (text := _transcript_from_line(buffer, number + 1, errors)) is not None:
+        yield text
+
+def _transcript_from_line(line: bytes, number: int, errors: Deque[Dict[str, Any]]) -> Optional[str]:
+    try:
+        item = json.loads(line)
+        return item["text"] if isinstance(item, dict) else str(item)
+    except (ValueError, KeyError) as e:
+        # the 200 is already sent: report the line in the stream instead of aborting it
+        errors.append({"line": number, "error": f"{type(e).__name__}: {e}"})
+        return None
+
+@router.post("/profile/batch")
+async def profile_batch(request: Request):
+    """
+    Triage many transcripts. Body is either JSON {"transcripts": [...]} or
+    JSONL (one transcript string or {"text": ...} per line, streamed).
+    Responds with NDJSON, one {"index", "urgency", "tags", "reason"} line per
+    transcript in completion order; "index" counts the transcripts accepted.
+    A JSONL line that does not parse gets a {"line", "error"} line instead.
+    """
+    errors: Deque[Dict[str, Any]] = deque()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type in JSONL_CONTENT_TYPES:
+        transcripts = _jsonl_transcripts(request, errors)
+    else:
+        try:
+            transcripts = BatchProfileRequest.model_validate_json(await request.body()).transcripts
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors(include_url=False))
+
+    async def _lines():
+        async for index, result in profile_texts_batch(transcripts):
+            while errors:
+                yield json.dumps(errors.popleft()) + "\n"
+            yield json.dumps({"index": index, **result}) + "\n"
+        while errors:
+            yield json.dumps(errors.popleft()) + "\n"
+
+    return DuplexStreamingResponse(_lines(), media_type="application/x-ndjson")
+
+@router.get("/cache/stats")
+async def profile_cache_stats():
+    return profile_cache.stats()
+
+@router.delete("/cache")
+async def clear_profile_cache():
+    await invalidate_profile_cache()
+    return {"cleared": True}
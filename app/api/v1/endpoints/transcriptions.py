@@ -1,6 +1,8 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from app.services.transcription import transcribe_audio
+from app.services.resilience import ProviderUnavailable, retry_after_header
+from app.services.transcription import transcribe_audio_with_stats, transcription_cache
 from app.schemas.transcription import TranscriptionResponse
+from app.utils.uploads import UploadTooLarge, temporary_upload
 
 router = APIRouter()
 
@@ -10,7 +12,20 @@ async def create_transcription(file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail="Invalid file type. Please upload an audio file.")
     
     try:
-        transcription = await transcribe_audio(file)
-        return TranscriptionResponse(transcribed_text=transcription)
+        async with temporary_upload(file) as temp_path:
+            transcription = await transcribe_audio_with_stats(temp_path)
+        return TranscriptionResponse(
+            transcribed_text=transcription["text"],
+            status="ok",
+            audio_seconds_removed=transcription["seconds_removed"],
+        )
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ProviderUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e), headers=retry_after_header(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/cache/stats")
+async def transcription_cache_stats():
+    return transcription_cache.stats()
@@ -1,14 +1,201 @@
+from typing import Dict, List, Optional
+
 from pydantic_settings import BaseSettings
 
 
 class Settings(BaseSettings):
-    DATABASE_URL: str
-    API_KEY: str
+    # optional so importing the app never fails; startup (init_db) and GET /ready report them missing
+    DATABASE_URL: Optional[str] = None
+    # OpenAI key (Whisper and triage)
+    API_KEY: Optional[str] = None
     # allow fractional thresholds like 0.75
-    ALERT_THRESHOLD: float
+    ALERT_THRESHOLD: float = 0.5
+
+    # alert delivery (all optional; a channel is skipped when not configured)
+    ALERT_SERVICE_URL: Optional[str] = None
+    ALERT_FROM_EMAIL: Optional[str] = None
+    # on-call recipients paged when the caller names none (JSON lists in the environment)
+    ALERT_ONCALL_EMAILS: List[str] = []
+    ALERT_ONCALL_PHONES: List[str] = []
+    SMTP_HOST: Optional[str] = None
+    SMTP_PORT: int = 587
+    SMTP_USER: Optional[str] = None
+    SMTP_PASSWORD: Optional[str] = None
+    SMTP_STARTTLS: bool = True
+    SMTP_POOL_SIZE: int = 4
+    # idle sessions older than this are NOOP-checked before reuse
+    SMTP_HEALTH_CHECK_SECONDS: float = 30.0
+    TWILIO_ACCOUNT_SID: Optional[str] = None
+    TWILIO_AUTH_TOKEN: Optional[str] = None
+    TWILIO_FROM_NUMBER: Optional[str] = None
+    WEBHOOK_TIMEOUT_SECONDS: float = 10.0
+    WEBHOOK_MAX_CONNECTIONS: int = 100
+    WEBHOOK_MAX_KEEPALIVE: int = 20
+    # fan-out: max sends in flight per alert and per-channel deadlines
+    ALERT_MAX_CONCURRENCY: int = 32
+    ALERT_EMAIL_DEADLINE_SECONDS: float = 15.0
+    ALERT_SMS_DEADLINE_SECONDS: float = 10.0
+    ALERT_WEBHOOK_DEADLINE_SECONDS: float = 10.0
+
+    # "background": deliver from the web process via BackgroundTasks (no retries);
+    # "outbox": the API only enqueues and workers/worker.py delivers with retries. Only switch
+    # to "outbox" where that worker is deployed: without it enqueued alerts are never sent
+    ALERT_DELIVERY_MODE: str = "background"
+    OUTBOX_BATCH_SIZE: int = 50
+    OUTBOX_POLL_SECONDS: float = 1.0
+    OUTBOX_LEASE_SECONDS: float = 60.0
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    OUTBOX_BACKOFF_BASE_SECONDS: float = 2.0
+    OUTBOX_BACKOFF_MAX_SECONDS: float = 600.0
+    WORKER_CONSUMERS: int = 4
+
+    # per-patient storm suppression (app/services/dedup.py): within the window, repeat alerts with
+    # the same tags and no higher urgency are held back and sent as one digest when it ends
+    ALERT_DEDUP_ENABLED: bool = True
+    ALERT_DEDUP_WINDOW_SECONDS: float = 60.0
+    ALERT_DEDUP_MAX_KEYS: int = 10000
+    # "memory" (per process) or "database" (shared by every API replica through DATABASE_URL)
+    ALERT_DEDUP_STORE: str = "memory"
+
+    # escalation of unacknowledged alerts (app/services/escalation.py): an alert of one of these urgencies
+    # that nobody acknowledges (POST /alerts/{id}/ack) within ESCALATION_ACK_SECONDS is re-sent to the next
+    # tier, each tier a JSON object {"email": [...], "sms": [...], "webhook": [...]}, and so on until the
+    # tiers run out. No tiers: one re-send at HIGH urgency (every channel) to the on-call recipients.
+    ESCALATION_ENABLED: bool = True
+    ESCALATION_URGENCIES: List[str] = ["HIGH"]
+    ESCALATION_ACK_SECONDS: float = 300.0
+    ESCALATION_TIERS: List[Dict[str, List[str]]] = []
+    # timer resolution: escalations go out up to this much after their deadline
+    ESCALATION_TICK_SECONDS: float = 1.0
+
+    # recipient routing (app/services/routing.py): alerts of a patient page their care team
+    # (patient_care_teams / care_team_members) and whoever is on call (on_call_shifts), looked up
+    # in memory; the index picks up changed rows every ROUTING_REFRESH_SECONDS
+    ROUTING_ENABLED: bool = True
+    ROUTING_REFRESH_SECONDS: float = 30.0
+
+    # uploads are streamed to disk in chunks and rejected past the size cap
+    MAX_UPLOAD_BYTES: int = 50 * 1024 * 1024
+    UPLOAD_CHUNK_BYTES: int = 1024 * 1024
+
+    # transcription cache (keyed by audio sha256 + model); set a dir to persist across restarts
+    TRANSCRIPTION_CACHE_SIZE: int = 1024
+    TRANSCRIPTION_CACHE_TTL_SECONDS: float = 24 * 3600.0
+    TRANSCRIPTION_CACHE_DIR: Optional[str] = None
+
+    # triage cache (keyed by model + prompt version + normalized transcript)
+    PROFILE_CACHE_SIZE: int = 4096
+    PROFILE_CACHE_TTL_SECONDS: float = 24 * 3600.0
+    PROFILE_CACHE_DIR: Optional[str] = None
+    # batch triage: transcripts per chat completion and completions in flight
+    PROFILE_BATCH_PACK_SIZE: int = 8
+    PROFILE_BATCH_CONCURRENCY: int = 4
+    PROFILE_BATCH_MAX_TOKENS_PER_ITEM: int = 150
+
+    # local red-flag pre-triage (app/services/triage_rules.py)
+    PRETRIAGE_ENABLED: bool = True
+    PRETRIAGE_LEXICON_PATH: Optional[str] = None
+    # confidence at which the rules call a transcript HIGH
+    PRETRIAGE_HIGH_CONFIDENCE: float = 0.7
+    # confidence at which HIGH alerts go out before the LLM answers
+    PRETRIAGE_DISPATCH_CONFIDENCE: float = 0.9
+    # trust the rules and skip the LLM call once an alert was dispatched early
+    PRETRIAGE_SKIP_LLM: bool = False
+
+    # chunked pipeline for long recordings (/patient_alert mode=pipeline)
+    PIPELINE_CHUNK_SECONDS: float = 20.0
+    PIPELINE_MAX_CONCURRENCY: int = 4
+    PIPELINE_MIN_SILENCE_MS: int = 400
+    # silence = quieter than the recording's average loudness minus this many dB
+    PIPELINE_SILENCE_OFFSET_DB: float = -16.0
+
+    # voice-activity detection before upload to Whisper (levels in dB relative to the loudest frame)
+    VAD_ENABLED: bool = True
+    # speech = this far above the noise floor (10th percentile frame energy) ...
+    VAD_ENERGY_OFFSET_DB: float = 10.0
+    # ... clamped so frames below VAD_FLOOR_DB are never speech and frames above VAD_CEILING_DB always are
+    VAD_FLOOR_DB: float = -50.0
+    VAD_CEILING_DB: float = -30.0
+    # frames quieter than this (dB full scale) are never speech, however quiet the rest is
+    VAD_ABSOLUTE_FLOOR_DBFS: float = -60.0
+    # quieter frames still count as speech when they cross zero this often (unvoiced "s", "f", "th")
+    VAD_ZCR_THRESHOLD: float = 0.25
+    VAD_MIN_SPEECH_MS: int = 90
+    # pauses shorter than this are kept, and every kept segment is padded by VAD_PAD_MS
+    VAD_MIN_SILENCE_MS: int = 600
+    VAD_PAD_MS: int = 200
+
+    # database connection pool (ignored for SQLite)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: float = 10.0
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+
+    # audit records (transcripts, triage results, alerts, delivery attempts) are buffered and
+    # inserted in batches of PERSIST_BATCH_SIZE rows or every PERSIST_FLUSH_SECONDS
+    PERSIST_ENABLED: bool = True
+    PERSIST_BATCH_SIZE: int = 200
+    PERSIST_FLUSH_SECONDS: float = 1.0
+    # rows kept while the database is unreachable; the oldest are dropped beyond this
+    PERSIST_MAX_BUFFER: int = 20000
+
+    # admission control around OpenAI / SMTP / Twilio / webhooks (app/services/resilience.py):
+    # per-provider concurrency adapts between MIN and MAX to the observed latency
+    PROVIDER_GUARD_ENABLED: bool = True
+    PROVIDER_INITIAL_CONCURRENCY: int = 8
+    PROVIDER_MIN_CONCURRENCY: int = 1
+    PROVIDER_MAX_CONCURRENCY: int = 64
+    # latency above this multiple of the long-run average counts as congestion; the limit is then multiplied by the ratio
+    PROVIDER_LATENCY_TOLERANCE: float = 2.0
+    PROVIDER_BACKOFF_RATIO: float = 0.9
+    # calls waiting for a slot beyond this count or this long are shed
+    PROVIDER_MAX_QUEUE: int = 100
+    PROVIDER_QUEUE_TIMEOUT_SECONDS: float = 5.0
+    # consecutive failures that open a provider's circuit, and how long it stays open before one probe call
+    CIRCUIT_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_RESET_SECONDS: float = 30.0
+    OPENAI_TRANSCRIPTION_TIMEOUT_SECONDS: float = 60.0
+    OPENAI_TRIAGE_TIMEOUT_SECONDS: float = 20.0
+    # /patient_alert requests handled at once / waiting for a turn; beyond that they get 503 + Retry-After
+    PATIENT_ALERT_MAX_INFLIGHT: int = 64
+    PATIENT_ALERT_MAX_QUEUE: int = 256
+    PATIENT_ALERT_QUEUE_TIMEOUT_SECONDS: float = 10.0
+
+    # asynchronous /patient_alert/jobs (app/services/jobs.py): pipelines run on JOB_WORKERS in-process
+    # workers; at most JOB_MAX_PENDING jobs wait, finished jobs stay pollable for JOB_RETENTION_SECONDS
+    JOB_WORKERS: int = 16
+    JOB_MAX_PENDING: int = 5000
+    JOB_RETENTION_SECONDS: float = 3600.0
+    # where job audio waits for a worker (None = the system temp dir)
+    JOB_AUDIO_DIR: Optional[str] = None
+    # SSE comment sent on an idle event stream so proxies keep it open
+    JOB_SSE_KEEPALIVE_SECONDS: float = 15.0
+
+    # provider clients / heavy modules (app/services/clients.py) built in the background after startup;
+    # GET /ready answers 503 until they are. With PREWARM_CONNECTIONS their connections are opened too
+    CLIENT_PRELOAD: List[str] = ["openai", "vad"]
+    CLIENT_PREWARM_CONNECTIONS: bool = False
+
+    # add a Server-Timing header with per-stage durations to every response (exposes timings to clients)
+    METRICS_SERVER_TIMING: bool = False
+    # requests slower than this are logged with their stage breakdown (0 = off)
+    METRICS_SLOW_REQUEST_SECONDS: float = 10.0
+
+    # transcription backends: "openai" (Whisper API) or "local" (offline engine in a process pool)
+    TRANSCRIPTION_BACKEND: str = "openai"
+    # raced against the primary when it fails or has not answered after TRANSCRIPTION_FALLBACK_AFTER_SECONDS;
+    # "none" (default) or "" = off. "local" starts LOCAL_ASR_WORKERS engine processes in every app worker.
+    TRANSCRIPTION_FALLBACK_BACKEND: str = "none"
+    TRANSCRIPTION_FALLBACK_AFTER_SECONDS: float = 15.0
+    # "sphinx" (pocketsphinx, bundled model), "vosk" or "faster_whisper"
+    LOCAL_ASR_ENGINE: str = "sphinx"
+    # vosk model directory / faster-whisper model size or path / pocketsphinx acoustic model dir
+    LOCAL_ASR_MODEL: Optional[str] = None
+    # worker processes, each holding one loaded model (0 = one per CPU)
+    LOCAL_ASR_WORKERS: int = 2
 
     class Config:
         env_file = ".env"
 
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
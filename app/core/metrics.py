@@ -0,0 +1,235 @@
+"""
+In-process latency metrics, rendered in the Prometheus text format at /metrics.
+
+Instrument code with `with span("stage"):` or `@timed("stage")` on a
+coroutine function. A span costs two perf_counter() calls, a bisect over the
+bucket bounds and a few increments (benchmarks/bench_metrics_overhead.py);
+there are no locks because spans are recorded on the event loop thread.
+Work done in threads is timed around the awaiting coroutine, not inside the
+thread.
+
+MetricsMiddleware times every request, adds a Server-Timing header with the
+request's spans when METRICS_SERVER_TIMING is set, and logs requests slower
+than METRICS_SLOW_REQUEST_SECONDS together with that breakdown.
+"""
+import contextvars
+import functools
+from bisect import bisect_left
+from time import perf_counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.logger import logger
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# seconds; upper end covers long recordings and slow LLM answers
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+STAGE_SECONDS = "medical_alert_stage_seconds"
+REQUEST_SECONDS = "medical_alert_http_request_seconds"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Fixed-bucket histogram; bucket i counts observations <= bounds[i] (the last one is +Inf)."""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Iterable[float] = DEFAULT_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{key}="{_escape(value)}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """
+    Named histograms (one per label set) plus collectors: callables returning
+    a flat {name: number} dict, such as the existing cache / writer stats(),
+    exported as gauges.
+    """
+
+    def __init__(self):
+        self._histograms: Dict[str, Tuple[str, Dict[Labels, Histogram]]] = {}
+        self._collectors: List[Tuple[str, str, Callable[[], Dict[str, Any]]]] = []
+
+    def histogram(self, name: str, help: str, **labels: str) -> Histogram:
+        family = self._histograms.get(name)
+        if family is None:
+            family = self._histograms[name] = (help, {})
+        key = tuple(sorted(labels.items()))
+        histogram = family[1].get(key)
+        if histogram is None:
+            histogram = family[1][key] = Histogram()
+        return histogram
+
+    def register_collector(self, prefix: str, help: str, collect: Callable[[], Dict[str, Any]]) -> None:
+        self._collectors.append((prefix, help, collect))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for name, (help, series) in sorted(self._histograms.items()):
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} histogram"]
+            for labels, histogram in sorted(series.items()):
+                cumulative = 0
+                for bound, count in zip((*histogram.bounds, "+Inf"), histogram.counts):
+                    cumulative += count
+                    le = f'le="{bound}"'
+                    lines.append(f"{name}_bucket{_format_labels(labels, le)} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_number(histogram.sum)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        for prefix, help, collect in self._collectors:
+            try:
+                values = collect()
+            except Exception:
+                logger.exception("metrics collector %s failed", prefix)
+                continue
+            for key, value in values.items():
+                if isinstance(value, (int, float)):
+                    name = f"{prefix}_{key}"
+                    lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {_number(value)}"]
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+_stage_histograms: Dict[str, Histogram] = {}
+# stage -> seconds for the current request, when it collects Server-Timing
+_request_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    histogram = _stage_histograms.get(stage)
+    if histogram is None:
+        histogram = _stage_histograms[stage] = registry.histogram(
+            STAGE_SECONDS, "Time spent in each processing stage.", stage=stage
+        )
+    histogram.observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+class span:
+    """`with span("vad"):` records the block's duration under that stage."""
+
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self) -> "span":
+        self.started = perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        observe_stage(self.stage, perf_counter() - self.started)
+
+
+def timed(stage: str):
+    """Decorator for coroutine functions: every call is recorded as a span, also when it raises."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                observe_stage(stage, perf_counter() - started)
+
+        return wrapper
+
+    return decorator
+
+
+def server_timing_header(timings: Dict[str, float], total: float) -> str:
+    entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items()]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def _route_template(scope: Scope) -> str:
+    """
+    "/api/v1/alerts/alerts/{alert_id}" for a request to any alert, so label
+    cardinality stays bounded; requests no route matched share one series.
+    """
+    route = scope.get("route")
+    if route is None or not hasattr(route, "path"):
+        return "unmatched"
+    # routes of an included router may carry only their own path; take the prefix from the request
+    segments = route.path.count("/")
+    prefix = scope["path"].rsplit("/", segments)[0] if scope["path"].count("/") >= segments else ""
+    return prefix + route.path
+
+
+class MetricsMiddleware:
+    """
+    Times each HTTP request by method, route template and status, and
+    collects the spans recorded while handling it (see module docstring).
+    """
+
+    def __init__(self, app: ASGIApp, server_timing: Optional[bool] = None, slow_request_seconds: Optional[float] = None):
+        self.app = app
+        self.server_timing = settings.METRICS_SERVER_TIMING if server_timing is None else server_timing
+        self.slow_request_seconds = (
+            settings.METRICS_SLOW_REQUEST_SECONDS if slow_request_seconds is None else slow_request_seconds
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: Dict[str, float] = {}
+        token = _request_timings.set(timings)
+        started = perf_counter()
+        status = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    header = server_timing_header(timings, perf_counter() - started)
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            elapsed = perf_counter() - started
+            route = _route_template(scope)
+            registry.histogram(
+                REQUEST_SECONDS, "HTTP request latency.", method=scope["method"], route=route, status=str(status)
+            ).observe(elapsed)
+            if self.slow_request_seconds and elapsed >= self.slow_request_seconds:
+                logger.warning(
+                    "slow request %s %s -> %d in %.2f s (%s)",
+                    scope["method"], route, status, elapsed, server_timing_header(timings, elapsed),
+                )
@@ -0,0 +1,97 @@
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase
+
+from app.core.config import settings
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+def async_database_url(url: str) -> str:
+    """
+    Map the plain driver URLs we keep in .env onto their async drivers
+    (postgresql:// -> asyncpg, sqlite:// -> aiosqlite).
+    """
+    scheme, sep, rest = url.partition("://")
+    if scheme in ("postgres", "postgresql"):
+        return f"postgresql+asyncpg://{rest}"
+    if scheme == "sqlite":
+        return f"sqlite+aiosqlite://{rest}"
+    return url
+
+
+_engine: Optional[AsyncEngine] = None
+_sessionmaker: Optional[async_sessionmaker] = None
+
+
+def engine_options(url: str) -> dict:
+    """
+    Pool tuning for server databases. SQLite keeps SQLAlchemy's defaults
+    (in-memory databases use a single static connection).
+    """
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        # recycle before server / proxy idle timeouts, and drop dead connections on checkout
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": True,
+    }
+
+
+def get_engine() -> AsyncEngine:
+    global _engine
+    if _engine is None:
+        if not settings.DATABASE_URL:
+            raise RuntimeError("DATABASE_URL is not set")
+        url = async_database_url(settings.DATABASE_URL)
+        _engine = create_async_engine(url, **engine_options(url))
+    return _engine
+
+
+async def ping() -> None:
+    """Round trip to the database (readiness check)."""
+    async with get_engine().connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+def get_sessionmaker() -> async_sessionmaker:
+    global _sessionmaker
+    if _sessionmaker is None:
+        _sessionmaker = async_sessionmaker(get_engine(), expire_on_commit=False)
+    return _sessionmaker
+
+
+async def init_db(engine: Optional[AsyncEngine] = None) -> None:
+    """
+    Create any missing tables. There are no migrations yet, so this runs at
+    startup of both the API and the worker.
+    """
+    # registers the tables on Base.metadata
+    import app.models.alert  # noqa: F401
+    import app.models.dedup  # noqa: F401
+    import app.models.escalation  # noqa: F401
+    import app.models.outbox  # noqa: F401
+    import app.models.routing  # noqa: F401
+    import app.models.transcript  # noqa: F401
+
+    async with (engine or get_engine()).begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def dispose_engine() -> None:
+    global _engine, _sessionmaker
+    if _engine is not None:
+        engine, _engine, _sessionmaker = _engine, None, None
+        await engine.dispose()
+
+
+async def get_db() -> AsyncIterator[AsyncSession]:
+    async with get_sessionmaker()() as session:
+        yield session
@@ -1,10 +1,8 @@
-from fastapi import Depends
-from sqlalchemy.orm import Session
+from typing import AsyncIterator
+
+from sqlalchemy.ext.asyncio import AsyncSession
 from .database import get_db
 
-def get_database_session() -> Session:
-    db = get_db()
-    try:
+async def get_database_session() -> AsyncIterator[AsyncSession]:
+    async for db in get_db():
         yield db
-    finally:
-        db.close()
\ No newline at end of file
@@ -1,8 +1,76 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.v1.endpoints import transcriptions, profiling, alerts, patient_alert
+from app.core.config import settings
+from app.core import metrics
+from app.core.logger import logger
+from app.database import dispose_engine, init_db, ping
+from app.services import alerting, persistence, resilience, transcription
+from app.services.clients import clients
+from app.services.profiling import profile_cache
+from app.services.dedup import alert_suppressor
+from app.services.escalation import escalation_scheduler
+from app.services.jobs import job_manager
+from app.services.routing import recipient_router
+from app.utils.uploads import MaxBodySizeMiddleware
+
+
+def _log_asr_warmup(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("transcription backend failed to start", exc_info=task.exception())
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # the engine (and its connection pool) is created here, once per process
+    await init_db()
+    persistence.audit_writer.start()
+    # pooled SMTP / HTTP / Twilio clients live for the whole process
+    await alerting.start_delivery_clients()
+    # sends the digest of repeat alerts held back during a suppression window
+    alert_suppressor.start(patient_alert.dispatch_digest)
+    # re-sends unacknowledged alerts; deadlines pending before a restart are picked up from the table
+    if settings.ESCALATION_ENABLED:
+        recovered = await escalation_scheduler.recover()
+        if recovered:
+            logger.info("recovered %d pending alert escalations", recovered)
+        escalation_scheduler.start(patient_alert.dispatch_escalation)
+    # care teams and on-call rotations are loaded into memory once, then refreshed incrementally
+    if settings.ROUTING_ENABLED:
+        await recipient_router.refresh()
+        recipient_router.start()
+    # workers for the 202 job API; they use the pools started above
+    job_manager.start(patient_alert.run_job)
+    # provider clients and numpy / pydub load in the background; /ready waits for them
+    app.state.warmup = asyncio.create_task(
+        clients.warm(settings.CLIENT_PRELOAD, connect=settings.CLIENT_PREWARM_CONNECTIONS)
+    )
+    # local ASR workers are spawned and load their model in the background too; /ready waits for them
+    app.state.asr_warmup = asyncio.create_task(transcription.start_transcription_backends())
+    app.state.asr_warmup.add_done_callback(_log_asr_warmup)
+    try:
+        yield
+    finally:
+        app.state.warmup.cancel()
+        app.state.asr_warmup.cancel()
+        await job_manager.close()
+        await transcription.close_transcription_backends()
+        await escalation_scheduler.close()
+        await recipient_router.close()
+        # pending digests go out while the delivery clients and the engine are still open
+        await alert_suppressor.close()
+        await alerting.close_delivery_clients()
+        # write buffered audit rows before the pool goes away
+        await persistence.audit_writer.close()
+        await clients.aclose()
+        await dispose_engine()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -11,6 +79,43 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# headroom over the file cap for the multipart envelope and form fields; audio upload routes only
+app.add_middleware(
+    MaxBodySizeMiddleware,
+    max_bytes=settings.MAX_UPLOAD_BYTES + 64 * 1024,
+    paths=("/api/v1/patient_alert", "/api/v1/transcriptions"),
+)
+# outermost, so request latency includes the other middleware
+app.add_middleware(metrics.MetricsMiddleware)
+
+metrics.registry.register_collector(
+    "medical_alert_transcription_cache", "Transcription cache counters.", lambda: transcription.transcription_cache.stats()
+)
+metrics.registry.register_collector(
+    "medical_alert_profile_cache", "Triage cache counters.", lambda: profile_cache.stats()
+)
+metrics.registry.register_collector(
+    "medical_alert_audit_writer", "Buffered audit writer counters.", lambda: persistence.audit_writer.stats()
+)
+metrics.registry.register_collector(
+    "medical_alert_provider", "Upstream provider limiter and circuit breaker state.", resilience.stats
+)
+metrics.registry.register_collector(
+    "medical_alert_dedup", "Alert storm suppression counters.", lambda: alert_suppressor.stats()
+)
+
+metrics.registry.register_collector(
+    "medical_alert_clients", "Lazily built provider clients and heavy modules.", lambda: clients.stats()
+)
+metrics.registry.register_collector(
+    "medical_alert_escalation", "Unacknowledged alert escalation counters.", lambda: escalation_scheduler.stats()
+)
+metrics.registry.register_collector(
+    "medical_alert_jobs", "Asynchronous patient alert job counters.", lambda: job_manager.stats()
+)
+metrics.registry.register_collector(
+    "medical_alert_routing", "In-memory recipient routing index.", lambda: recipient_router.stats()
+)
 
 app.include_router(patient_alert.router, prefix="/api/v1/patient_alert", tags=["patient_alert"])
 
@@ -18,6 +123,40 @@ app.include_router(transcriptions.router, prefix="/api/v1/transcriptions", tags=
 app.include_router(profiling.router, prefix="/api/v1/profiling", tags=["profiling"])
 app.include_router(alerts.router, prefix="/api/v1/alerts", tags=["alerts"])
 
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/ready", include_in_schema=False)
+async def read_ready(request: Request):
+    """
+    Readiness for load balancers and autoscalers: 200 once startup is done,
+    the preloaded clients are built, the transcription backends (the local
+    ASR pool) are warm and the database answers; 503 with the failing checks
+    otherwise.
+    """
+    warmup = getattr(request.app.state, "warmup", None)
+    checks = {"clients": "ok" if warmup is not None and warmup.done() else "warming"}
+    asr_warmup = getattr(request.app.state, "asr_warmup", None)
+    if asr_warmup is None or not asr_warmup.done():
+        checks["local_asr"] = "warming"
+    elif asr_warmup.cancelled():
+        checks["local_asr"] = "cancelled"
+    elif asr_warmup.exception() is not None:
+        checks["local_asr"] = f"{type(asr_warmup.exception()).__name__}: {asr_warmup.exception()}"
+    else:
+        checks["local_asr"] = "ok"
+    missing = [name for name in ("DATABASE_URL", "API_KEY") if not getattr(settings, name)]
+    checks["config"] = f"missing {', '.join(missing)}" if missing else "ok"
+    try:
+        await asyncio.wait_for(ping(), 2.0)
+        checks["database"] = "ok"
+    except Exception as e:
+        checks["database"] = f"{type(e).__name__}: {e}"
+    ready = all(state == "ok" for state in checks.values())
+    return JSONResponse({"ready": ready, "checks": checks}, status_code=200 if ready else 503)
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the Voice-to-Text Profiling and Alert System"}
\ No newline at end of file
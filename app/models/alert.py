@@ -0,0 +1,73 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import JSON, Boolean, DateTime, Index, Integer, String, Text, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+# Audit tables are append-only and written in batches by independent writers (API and
+# outbox workers), so they link by id without foreign keys: a delivery attempt may be
+# committed before the buffered alert row it refers to.
+
+
+class PatientAlert(Base):
+    """One alert dispatched for a patient; `id` is the outbox alert_id when queued."""
+
+    __tablename__ = "patient_alerts"
+    # History queries page newest-first on (created_at, id); each filter combination the
+    # dashboard uses has an index that ends in those columns, so a page is one range scan.
+    __table_args__ = (
+        Index("ix_patient_alerts_created", "created_at", "id"),
+        Index("ix_patient_alerts_user_created", "user_id", "created_at", "id"),
+        Index("ix_patient_alerts_user_urgency_created", "user_id", "urgency_level", "created_at", "id"),
+        Index("ix_patient_alerts_urgency_created", "urgency_level", "created_at", "id"),
+        # partial: only the (few) alerts nobody has received yet
+        Index(
+            "ix_patient_alerts_undelivered_created", "created_at", "id",
+            sqlite_where=text("delivered_at IS NULL"), postgresql_where=text("delivered_at IS NULL"),
+        ),
+    )
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    user_id: Mapped[Optional[str]] = mapped_column(String(128))
+    transcript_id: Mapped[Optional[str]] = mapped_column(String(36), index=True)
+    triage_id: Mapped[Optional[str]] = mapped_column(String(36))
+    urgency_level: Mapped[str] = mapped_column(String(16))
+    message: Mapped[str] = mapped_column(Text)
+    # "outbox", "background", "immediate" (early red-flag page) or "direct" (/alerts)
+    delivery_mode: Mapped[str] = mapped_column(String(16))
+    # {channel: [recipient, ...]} as planned at dispatch
+    recipients: Mapped[Dict[str, List[str]]] = mapped_column(JSON)
+    # triage tags, also indexed one row per tag in alert_tags
+    tags: Mapped[List[str]] = mapped_column(JSON, default=list)
+    created_at: Mapped[datetime] = mapped_column(DateTime)
+    # first successful delivery to any recipient; NULL while nobody has received the alert
+    delivered_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+
+
+class AlertTag(Base):
+    """Tag lookup for alert history; JSON arrays cannot be indexed portably."""
+
+    __tablename__ = "alert_tags"
+    __table_args__ = (Index("ix_alert_tags_tag_created", "tag", "created_at", "alert_id"),)
+
+    alert_id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    tag: Mapped[str] = mapped_column(String(64), primary_key=True)
+    # copy of the alert's created_at so a tag query pages on this index alone
+    created_at: Mapped[datetime] = mapped_column(DateTime)
+
+
+class DeliveryAttempt(Base):
+    """One send of one alert to one recipient; retries add further rows."""
+
+    __tablename__ = "delivery_attempts"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    alert_id: Mapped[str] = mapped_column(String(36), index=True)
+    channel: Mapped[str] = mapped_column(String(16))
+    recipient: Mapped[str] = mapped_column(String(512))
+    attempt: Mapped[int] = mapped_column(Integer, default=1)
+    delivered: Mapped[bool] = mapped_column(Boolean)
+    error: Mapped[Optional[str]] = mapped_column(Text)
+    attempted_at: Mapped[datetime] = mapped_column(DateTime)
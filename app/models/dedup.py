@@ -0,0 +1,29 @@
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import JSON, DateTime, Integer, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class AlertWindow(Base):
+    """
+    Suppression window of one (patient, tag set), shared by API replicas when
+    ALERT_DEDUP_STORE=database. Rows are short-lived: the sweeper deletes them
+    once a window ends with nothing held back.
+    """
+
+    __tablename__ = "alert_windows"
+
+    # sha1 of user_id + sorted tags
+    key: Mapped[str] = mapped_column(String(40), primary_key=True)
+    user_id: Mapped[Optional[str]] = mapped_column(String(128))
+    tags: Mapped[List[str]] = mapped_column(JSON)
+    # highest urgency forwarded in this window (LOW 0, MEDIUM 1, HIGH 2)
+    rank: Mapped[int] = mapped_column(Integer)
+    ends_at: Mapped[datetime] = mapped_column(DateTime, index=True)
+    # repeats held back for the digest, their highest urgency and the latest message
+    suppressed: Mapped[int] = mapped_column(Integer, default=0)
+    digest_rank: Mapped[int] = mapped_column(Integer, default=0)
+    last_message: Mapped[Optional[str]] = mapped_column(Text)
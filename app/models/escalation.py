@@ -0,0 +1,37 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import DateTime, Index, Integer, String, Text, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class AlertEscalation(Base):
+    """
+    Acknowledgement state of one alert that escalates when nobody acknowledges
+    it (app/services/escalation.py). The in-process timers are rebuilt from
+    the rows with a due_at after a restart.
+    """
+
+    __tablename__ = "alert_escalations"
+    # partial: only the alerts still waiting for an acknowledgement
+    __table_args__ = (
+        Index(
+            "ix_alert_escalations_due", "due_at",
+            sqlite_where=text("due_at IS NOT NULL"), postgresql_where=text("due_at IS NOT NULL"),
+        ),
+    )
+
+    # the PatientAlert id of the original alert
+    alert_id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    user_id: Mapped[Optional[str]] = mapped_column(String(128))
+    urgency_level: Mapped[str] = mapped_column(String(16))
+    message: Mapped[str] = mapped_column(Text)
+    # escalation steps already sent (0 until the first deadline passes)
+    tier: Mapped[int] = mapped_column(Integer, default=0)
+    # next escalation; NULL once acknowledged or when no step is left
+    due_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    created_at: Mapped[datetime] = mapped_column(DateTime)
+    acknowledged_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    acknowledged_by: Mapped[Optional[str]] = mapped_column(String(128))
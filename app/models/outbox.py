@@ -0,0 +1,43 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import DateTime, Index, Integer, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+# delivery states
+PENDING = "pending"
+IN_PROGRESS = "in_progress"
+DELIVERED = "delivered"
+DEAD = "dead"
+
+
+class AlertOutbox(Base):
+    """
+    One row per (channel, recipient) delivery of an alert. Rows are written by
+    the API and drained by workers/worker.py.
+    """
+
+    __tablename__ = "alert_outbox"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    alert_id: Mapped[str] = mapped_column(String(36), index=True)
+    user_id: Mapped[Optional[str]] = mapped_column(String(128))
+    channel: Mapped[str] = mapped_column(String(16))
+    recipient: Mapped[str] = mapped_column(String(512))
+    urgency_level: Mapped[str] = mapped_column(String(16))
+    message: Mapped[str] = mapped_column(Text)
+    status: Mapped[str] = mapped_column(String(16), default=PENDING)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime)
+    locked_until: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    claimed_by: Mapped[Optional[str]] = mapped_column(String(64))
+    last_error: Mapped[Optional[str]] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime)
+    updated_at: Mapped[datetime] = mapped_column(DateTime)
+
+    __table_args__ = (
+        # the claim query: due pending rows and expired leases, oldest first
+        Index("ix_alert_outbox_status_due", "status", "next_attempt_at"),
+    )
@@ -0,0 +1,55 @@
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import JSON, Boolean, DateTime, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+# Routing tables are read into the in-memory index of app/services/routing.py, which
+# refreshes from rows whose updated_at moved. Rows are deactivated (active=False, with
+# a new updated_at) rather than deleted, so a refresh sees the removal.
+
+
+class PatientCareTeam(Base):
+    """The care team that is paged for a patient's alerts."""
+
+    __tablename__ = "patient_care_teams"
+
+    user_id: Mapped[str] = mapped_column(String(128), primary_key=True)
+    team_id: Mapped[str] = mapped_column(String(64))
+    active: Mapped[bool] = mapped_column(Boolean, default=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, index=True)
+
+
+class CareTeamMember(Base):
+    """One address of a care team member on one channel."""
+
+    __tablename__ = "care_team_members"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    team_id: Mapped[str] = mapped_column(String(64), index=True)
+    # "email" | "sms" | "webhook"
+    channel: Mapped[str] = mapped_column(String(16))
+    address: Mapped[str] = mapped_column(String(512))
+    # paged for alerts at or above this urgency (LOW, MEDIUM, HIGH)
+    min_urgency: Mapped[str] = mapped_column(String(16), default="LOW")
+    # only alerts carrying one of these triage tags; NULL or empty: every alert
+    tags: Mapped[Optional[List[str]]] = mapped_column(JSON)
+    active: Mapped[bool] = mapped_column(Boolean, default=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, index=True)
+
+
+class OnCallShift(Base):
+    """An on-call rotation slot: paged for every alert of the team (NULL team: of every patient) while it runs."""
+
+    __tablename__ = "on_call_shifts"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    team_id: Mapped[Optional[str]] = mapped_column(String(64), index=True)
+    channel: Mapped[str] = mapped_column(String(16))
+    address: Mapped[str] = mapped_column(String(512))
+    starts_at: Mapped[datetime] = mapped_column(DateTime)
+    ends_at: Mapped[datetime] = mapped_column(DateTime)
+    active: Mapped[bool] = mapped_column(Boolean, default=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, index=True)
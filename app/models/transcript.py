@@ -0,0 +1,39 @@
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import JSON, DateTime, Float, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class Transcript(Base):
+    """Text of one patient recording, with how much audio the VAD trimmed."""
+
+    __tablename__ = "transcripts"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    user_id: Mapped[Optional[str]] = mapped_column(String(128), index=True)
+    text: Mapped[str] = mapped_column(Text)
+    audio_seconds: Mapped[Optional[float]] = mapped_column(Float)
+    speech_seconds: Mapped[Optional[float]] = mapped_column(Float)
+    # transcription backend that produced the text ("openai", "local")
+    backend: Mapped[Optional[str]] = mapped_column(String(32))
+    created_at: Mapped[datetime] = mapped_column(DateTime)
+
+
+class TriageResult(Base):
+    """Urgency decision for a transcript, from the LLM or the red-flag rules."""
+
+    __tablename__ = "triage_results"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    transcript_id: Mapped[Optional[str]] = mapped_column(String(36), index=True)
+    user_id: Mapped[Optional[str]] = mapped_column(String(128))
+    urgency_level: Mapped[str] = mapped_column(String(16))
+    tags: Mapped[List[str]] = mapped_column(JSON)
+    reason: Mapped[str] = mapped_column(Text)
+    # "llm" or "rules"
+    source: Mapped[str] = mapped_column(String(16))
+    confidence: Mapped[Optional[float]] = mapped_column(Float)
+    created_at: Mapped[datetime] = mapped_column(DateTime)
@@ -1,6 +1,7 @@
 
+from datetime import datetime
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional
 
 class AlertBase(BaseModel):
     patient_id: str
@@ -8,7 +9,9 @@ class AlertBase(BaseModel):
     message: str
 
 class AlertCreate(AlertBase):
-    pass
+    doctor_emails: Optional[List[str]] = None
+    doctor_phones: Optional[List[str]] = None
+    doctor_webhooks: Optional[List[str]] = None
 
 class Alert(AlertBase):
     id: int
@@ -16,5 +19,52 @@ class Alert(AlertBase):
     class Config:
         orm_mode = True
 
+class AlertDispatchResult(BaseModel):
+    patient_id: str
+    urgency_level: str
+    # {channel: {recipient: delivered}}
+    results: Dict[str, Dict[str, bool]] = {}
+
+class AlertRecord(BaseModel):
+    # every field is optional: history queries return only the fields asked for
+    id: Optional[str] = None
+    user_id: Optional[str] = None
+    transcript_id: Optional[str] = None
+    triage_id: Optional[str] = None
+    urgency_level: Optional[str] = None
+    message: Optional[str] = None
+    delivery_mode: Optional[str] = None
+    recipients: Optional[Dict[str, List[str]]] = None
+    tags: Optional[List[str]] = None
+    created_at: Optional[datetime] = None
+    delivered_at: Optional[datetime] = None
+
+class AlertHistoryPage(BaseModel):
+    items: List[AlertRecord]
+    # pass back as `cursor` for the next (older) page; null on the last page
+    next_cursor: Optional[str] = None
+
+class DeliveryAttemptRecord(BaseModel):
+    channel: str
+    recipient: str
+    attempt: int
+    delivered: bool
+    error: Optional[str] = None
+    attempted_at: datetime
+
+class AlertDetail(AlertRecord):
+    attempts: List[DeliveryAttemptRecord] = []
+
+class AlertAcknowledge(BaseModel):
+    # who saw the alert (doctor id, name or pager)
+    acknowledged_by: Optional[str] = None
+
+class AlertAcknowledgement(BaseModel):
+    alert_id: str
+    acknowledged_at: datetime
+    acknowledged_by: Optional[str] = None
+    # escalation steps sent before the acknowledgement
+    escalations: int
+
 # Alias
 AlertSchema = Alert
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseModel
 
 class TranscriptionRequest(BaseModel):
@@ -6,4 +8,6 @@ class TranscriptionRequest(BaseModel):
 class TranscriptionResponse(BaseModel):
     transcribed_text: str
     status: str
-    error: str = None
\ No newline at end of file
+    error: str = None
+    # seconds of silence the VAD kept out of the upload (None when it did not run)
+    audio_seconds_removed: Optional[float] = None
\ No newline at end of file
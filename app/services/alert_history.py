@@ -0,0 +1,148 @@
+"""
+Alert history queries for the on-call dashboard.
+
+Pages are newest-first and use keyset pagination: the cursor is the
+(created_at, id) of the last row returned, and the next page asks for rows
+strictly before it. Unlike OFFSET, the cost of a page does not grow with how
+deep the caller has paged, and rows inserted meanwhile do not shift pages.
+Every filter combination is served by one of the composite indexes on
+patient_alerts / alert_tags (see app/models/alert.py).
+"""
+import base64
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.alert import AlertTag, DeliveryAttempt, PatientAlert
+
+# fields a caller may select; the cursor columns are always fetched
+FIELDS = {
+    "id": PatientAlert.id,
+    "user_id": PatientAlert.user_id,
+    "transcript_id": PatientAlert.transcript_id,
+    "triage_id": PatientAlert.triage_id,
+    "urgency_level": PatientAlert.urgency_level,
+    "message": PatientAlert.message,
+    "delivery_mode": PatientAlert.delivery_mode,
+    "recipients": PatientAlert.recipients,
+    "tags": PatientAlert.tags,
+    "created_at": PatientAlert.created_at,
+    "delivered_at": PatientAlert.delivered_at,
+}
+DELIVERY_STATUSES = ("delivered", "undelivered")
+
+
+class InvalidQuery(ValueError):
+    pass
+
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    """"id,urgency_level,created_at" -> names, in FIELDS order; None or "" -> all fields."""
+    if not fields:
+        return list(FIELDS)
+    wanted = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = wanted - FIELDS.keys()
+    if unknown:
+        raise InvalidQuery(f"unknown fields {sorted(unknown)}; choose from {list(FIELDS)}")
+    return [name for name in FIELDS if name in wanted]
+
+
+def encode_cursor(created_at: datetime, alert_id: str) -> str:
+    raw = json.dumps([created_at.isoformat(), alert_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        created_at, alert_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(created_at), str(alert_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidQuery("invalid cursor") from e
+
+
+def _naive_utc(value: datetime) -> datetime:
+    # timestamps are stored as naive UTC
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+async def query_alerts(
+    session: AsyncSession,
+    user_id: Optional[str] = None,
+    urgency_level: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    tag: Optional[str] = None,
+    delivery_status: Optional[str] = None,
+    fields: Sequence[str] = tuple(FIELDS),
+    limit: int = 50,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    One page of alerts, newest first, and the cursor for the next page
+    (None on the last page). `since` is inclusive, `until` exclusive.
+    """
+    if delivery_status is not None and delivery_status not in DELIVERY_STATUSES:
+        raise InvalidQuery(f"delivery_status must be one of {list(DELIVERY_STATUSES)}")
+
+    if tag is not None:
+        # page on the tag index; its created_at / alert_id mirror the alert's
+        created_at, alert_id = AlertTag.created_at, AlertTag.alert_id
+        stmt = select(AlertTag.created_at, AlertTag.alert_id).join(PatientAlert, PatientAlert.id == AlertTag.alert_id)
+        stmt = stmt.where(AlertTag.tag == tag)
+    else:
+        created_at, alert_id = PatientAlert.created_at, PatientAlert.id
+        stmt = select(PatientAlert.created_at, PatientAlert.id)
+    stmt = stmt.add_columns(*(FIELDS[name] for name in fields))
+
+    if user_id is not None:
+        stmt = stmt.where(PatientAlert.user_id == user_id)
+    if urgency_level is not None:
+        stmt = stmt.where(PatientAlert.urgency_level == urgency_level.upper())
+    if delivery_status == "undelivered":
+        stmt = stmt.where(PatientAlert.delivered_at.is_(None))
+    elif delivery_status == "delivered":
+        stmt = stmt.where(PatientAlert.delivered_at.is_not(None))
+    if since is not None:
+        stmt = stmt.where(created_at >= _naive_utc(since))
+    if until is not None:
+        stmt = stmt.where(created_at < _naive_utc(until))
+    if cursor is not None:
+        stmt = stmt.where(tuple_(created_at, alert_id) < tuple_(*decode_cursor(cursor)))
+
+    # one extra row tells us whether there is a next page
+    stmt = stmt.order_by(created_at.desc(), alert_id.desc()).limit(limit + 1)
+    rows = (await session.execute(stmt)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][0], rows[-1][1])
+    return [dict(zip(fields, row[2:])) for row in rows], next_cursor
+
+
+async def get_alert(session: AsyncSession, alert_id: str) -> Optional[Dict[str, Any]]:
+    """One alert with all its delivery attempts, oldest first."""
+    alert = (await session.execute(select(*FIELDS.values()).where(PatientAlert.id == alert_id))).first()
+    if alert is None:
+        return None
+    attempts = (await session.execute(
+        select(DeliveryAttempt).where(DeliveryAttempt.alert_id == alert_id).order_by(DeliveryAttempt.id)
+    )).scalars()
+    result = dict(zip(FIELDS, alert))
+    result["attempts"] = [
+        {
+            "channel": a.channel,
+            "recipient": a.recipient,
+            "attempt": a.attempt,
+            "delivered": a.delivered,
+            "error": a.error,
+            "attempted_at": a.attempted_at,
+        }
+        for a in attempts
+    ]
+    return result
@@ -1,179 +1,386 @@
-from fastapi import BackgroundTasks
-from typing import Any, Dict, List
-import smtplib
-from email.mime.text import MIMEText
-from twilio.rest import Client
 import asyncio
-from typing import Optional, List, Dict, Any
+import queue
 import smtplib
+import threading
+import time
 from email.message import EmailMessage
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
+
 import httpx
 
 from app.core import config
+from app.core.metrics import timed
+from app.services.clients import clients
+from app.services.resilience import guarded
 
 settings = config.settings
 
-# Optional import for Twilio — only used if configured
-try:
-    from twilio.rest import Client as TwilioClient
-except Exception:
-    TwilioClient = None
 
+class SMTPPool:
+    """
+    Small pool of authenticated SMTP sessions shared by all email alerts.
+    Sessions are opened lazily (connect, STARTTLS, login once) and handed back
+    after each message. A session that sat idle longer than
+    `health_check_after` seconds is NOOP-checked before reuse and replaced if
+    the server dropped it. All methods are blocking; call them from a thread.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 587,
+        user: Optional[str] = None,
+        password: Optional[str] = None,
+        size: int = 4,
+        starttls: bool = True,
+        timeout: float = 10.0,
+        health_check_after: float = 30.0,
+    ):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle: "queue.LifoQueue[Tuple[smtplib.SMTP, float]]" = queue.LifoQueue()
+        self._closed = False
+
+    def _connect(self) -> smtplib.SMTP:
+        if self.port == 465:
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.starttls:
+                server.starttls()
+        if self.user and self.password:
+            server.login(self.user, self.password)
+        return server
+
+    @staticmethod
+    def _discard(server: smtplib.SMTP) -> None:
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def _checkout(self) -> smtplib.SMTP:
+        while True:
+            try:
+                server, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.monotonic() - last_used < self.health_check_after:
+                return server
+            try:
+                if server.noop()[0] == 250:
+                    return server
+            except Exception:
+                pass
+            self._discard(server)
+
+    def send(self, msg: EmailMessage) -> None:
+        if self._closed:
+            raise RuntimeError("SMTP pool is closed")
+        with self._slots:
+            server = self._checkout()
+            try:
+                server.send_message(msg)
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                # stale session that slipped past the health check: retry once on a fresh one
+                self._discard(server)
+                server = self._connect()
+                try:
+                    server.send_message(msg)
+                except Exception:
+                    self._discard(server)
+                    raise
+            except Exception:
+                self._discard(server)
+                raise
+            self._idle.put((server, time.monotonic()))
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(server)
+
+
+class DeliveryClients:
+    """
+    App-lifetime delivery transports: one keep-alive HTTP client for webhooks,
+    an SMTP session pool and a single Twilio client. Created in the FastAPI
+    lifespan (see app/main.py) and shared by every send_* call.
+    """
+
+    def __init__(self):
+        self.http = httpx.AsyncClient(
+            timeout=settings.WEBHOOK_TIMEOUT_SECONDS,
+            limits=httpx.Limits(
+                max_connections=settings.WEBHOOK_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.WEBHOOK_MAX_KEEPALIVE,
+            ),
+        )
+        self.smtp: Optional[SMTPPool] = None
+        if settings.SMTP_HOST:
+            self.smtp = SMTPPool(
+                settings.SMTP_HOST,
+                settings.SMTP_PORT,
+                settings.SMTP_USER,
+                settings.SMTP_PASSWORD,
+                size=settings.SMTP_POOL_SIZE,
+                starttls=settings.SMTP_STARTTLS,
+                health_check_after=settings.SMTP_HEALTH_CHECK_SECONDS,
+            )
+        # None unless TWILIO_* are set and the optional library is installed
+        self.twilio = clients.get("twilio")
+
+    async def aclose(self) -> None:
+        await self.http.aclose()
+        if self.smtp is not None:
+            await asyncio.to_thread(self.smtp.close)
+
+
+_clients: Optional[DeliveryClients] = None
+
+
+def get_delivery_clients() -> DeliveryClients:
+    """
+    Return the shared delivery clients, creating them on first use so scripts
+    and the worker work without the FastAPI lifespan.
+    """
+    global _clients
+    if _clients is None:
+        _clients = DeliveryClients()
+    return _clients
+
+
+async def start_delivery_clients() -> DeliveryClients:
+    return get_delivery_clients()
+
+
+async def close_delivery_clients() -> None:
+    global _clients
+    if _clients is not None:
+        clients, _clients = _clients, None
+        await clients.aclose()
 
+
+@timed("send_email")
 async def send_email(to_email: str, subject: str, body: str) -> bool:
     """
-    Send an email alert using SMTP. Runs blocking smtplib in a threadpool.
+    Send an email alert over a pooled SMTP session. Runs blocking smtplib in a threadpool.
     Returns True on success, False on failure.
     """
+    pool = get_delivery_clients().smtp
+    if pool is None:
+        # SMTP_HOST not configured
+        return False
+
     def _send():
         msg = EmailMessage()
-        msg["From"] = getattr(settings, "ALERT_FROM_EMAIL", getattr(settings, "SMTP_USER", "no-reply@example.com"))
+        msg["From"] = settings.ALERT_FROM_EMAIL or settings.SMTP_USER or "no-reply@example.com"
         msg["To"] = to_email
         msg["Subject"] = subject
         msg.set_content(body)
-
-        host = getattr(settings, "SMTP_HOST", None)
-        port = int(getattr(settings, "SMTP_PORT", 587))
-        user = getattr(settings, "SMTP_USER", None)
-        password = getattr(settings, "SMTP_PASSWORD", None)
-
-        if not host:
-            raise RuntimeError("SMTP_HOST not configured")
-
-        if port == 465:
-            server = smtplib.SMTP_SSL(host, port, timeout=10)
-        else:
-            server = smtplib.SMTP(host, port, timeout=10)
-            server.starttls()
-        if user and password:
-            server.login(user, password)
-        server.send_message(msg)
-        server.quit()
+        pool.send(msg)
         return True
 
     try:
-        return await asyncio.to_thread(_send)
+        return await guarded("smtp", lambda: asyncio.to_thread(_send))
     except Exception:
         return False
 
 
+@timed("send_webhook")
 async def send_webhook(url: str, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> bool:
     """
-    Send a JSON POST to a webhook URL. Returns True if HTTP status < 400.
+    Send a JSON POST to a webhook URL over the shared keep-alive client. Returns True if HTTP status < 400.
     """
+    async def _post() -> httpx.Response:
+        resp = await get_delivery_clients().http.post(url, json=payload, headers=headers or {})
+        # 5xx counts against the endpoint's circuit; 4xx is our request's fault
+        if resp.status_code >= 500:
+            resp.raise_for_status()
+        return resp
+
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            resp = await client.post(url, json=payload, headers=headers or {})
-            return resp.status_code < 400
+        resp = await guarded(f"webhook:{httpx.URL(url).host}", _post)
+        return resp.status_code < 400
     except Exception:
         return False
 
 
-async def send_sms(phones: List[str], body: str) -> bool:
+@timed("send_sms")
+async def send_sms_one(phone: str, body: str) -> bool:
     """
-    Send SMS messages using Twilio if configured. Runs Twilio client in threadpool.
-    Returns True if all sends appear successful (best-effort).
+    Send a single SMS using the shared Twilio client if configured. Runs Twilio client in threadpool.
+    Returns True on success, False on failure or when Twilio is not configured.
     """
-    account_sid = getattr(settings, "TWILIO_ACCOUNT_SID", None)
-    auth_token = getattr(settings, "TWILIO_AUTH_TOKEN", None)
-    from_number = getattr(settings, "TWILIO_FROM_NUMBER", None)
+    client = get_delivery_clients().twilio
+    from_number = settings.TWILIO_FROM_NUMBER
 
-    if not (account_sid and auth_token and from_number and TwilioClient):
+    if not (client and from_number):
         # Twilio not configured or library missing
         return False
 
-    def _send_all():
-        client = TwilioClient(account_sid, auth_token)
-        for to in phones:
-            client.messages.create(body=body, from_=from_number, to=to)
+    def _send():
+        client.messages.create(body=body, from_=from_number, to=phone)
         return True
 
     try:
-        return await asyncio.to_thread(_send_all)
+        return await guarded("twilio", lambda: asyncio.to_thread(_send))
     except Exception:
         return False
 
 
-def trigger_alert(
+async def send_sms(phones: List[str], body: str) -> bool:
+    """
+    Send SMS messages to every phone concurrently.
+    Returns True if all sends appear successful (best-effort).
+    """
+    results = await asyncio.gather(*(send_sms_one(p, body) for p in phones))
+    return bool(results) and all(results)
+
+
+# channels paged per urgency level; low urgency sends nothing by default
+CHANNELS_BY_URGENCY = {
+    "high": ("sms", "email", "webhook"),
+    "medium": ("email", "webhook"),
+}
+
+
+def _channel_deadlines() -> Dict[str, float]:
+    return {
+        "email": settings.ALERT_EMAIL_DEADLINE_SECONDS,
+        "sms": settings.ALERT_SMS_DEADLINE_SECONDS,
+        "webhook": settings.ALERT_WEBHOOK_DEADLINE_SECONDS,
+    }
+
+
+def plan_deliveries(
+    urgency_level: str,
+    doctor_emails: Optional[List[str]] = None,
+    doctor_phones: Optional[List[str]] = None,
+    doctor_webhooks: Optional[List[str]] = None,
+) -> Dict[str, List[str]]:
+    """
+    Resolve which recipients are paged on which channel for this urgency.
+    Falls back to ALERT_ONCALL_EMAILS / ALERT_ONCALL_PHONES and ALERT_SERVICE_URL
+    for channels the caller gives no recipients for.
+    """
+    if not doctor_emails:
+        doctor_emails = settings.ALERT_ONCALL_EMAILS
+    if not doctor_phones:
+        doctor_phones = settings.ALERT_ONCALL_PHONES
+    if not doctor_webhooks and settings.ALERT_SERVICE_URL:
+        doctor_webhooks = [settings.ALERT_SERVICE_URL]
+    recipients = {
+        "email": list(doctor_emails or []),
+        "sms": list(doctor_phones or []),
+        "webhook": list(doctor_webhooks or []),
+    }
+    channels = CHANNELS_BY_URGENCY.get(urgency_level.lower(), ())
+    return {channel: recipients[channel] for channel in channels if recipients[channel]}
+
+
+def deliver(channel: str, recipient: str, urgency_level: str, message: str) -> Awaitable[bool]:
+    """
+    Send one alert to one recipient on one channel ("email" | "sms" | "webhook").
+    """
+    if channel == "email":
+        return send_email(recipient, f"[ALERT] Urgency: {urgency_level.upper()}", message)
+    if channel == "sms":
+        return send_sms_one(recipient, message)
+    if channel == "webhook":
+        return send_webhook(recipient, {"message": message, "urgency": urgency_level})
+    raise ValueError(f"unknown alert channel: {channel}")
+
+
+def channel_deadline(channel: str) -> float:
+    return _channel_deadlines()[channel]
+
+
+async def fan_out(
+    urgency_level: str,
+    message: str,
+    plan: Dict[str, List[str]],
+    max_concurrency: Optional[int] = None,
+) -> Dict[str, Dict[str, bool]]:
+    """
+    Deliver to every recipient of every channel concurrently, with at most
+    `max_concurrency` sends in flight. Each channel has its own deadline
+    (ALERT_*_DEADLINE_SECONDS) measured from the start of the fan-out; a send
+    still pending at its channel's deadline counts as failed.
+    Returns {channel: {recipient: delivered}}.
+    """
+    sem = asyncio.Semaphore(max_concurrency or settings.ALERT_MAX_CONCURRENCY)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    deadlines = {channel: started + limit for channel, limit in _channel_deadlines().items()}
+
+    async def _deliver(channel: str, recipient: str) -> bool:
+        async def _limited() -> bool:
+            async with sem:
+                return await deliver(channel, recipient, urgency_level, message)
+
+        try:
+            return await asyncio.wait_for(_limited(), deadlines[channel] - loop.time())
+        except Exception:
+            return False
+
+    deliveries = [(channel, recipient) for channel, recipients in plan.items() for recipient in recipients]
+    outcomes = await asyncio.gather(*(_deliver(c, r) for c, r in deliveries))
+
+    results: Dict[str, Dict[str, bool]] = {channel: {} for channel in plan}
+    for (channel, recipient), ok in zip(deliveries, outcomes):
+        results[channel][recipient] = ok
+    return results
+
+
+async def trigger_alert(
     urgency_level: str,
     message: str,
     doctor_emails: Optional[List[str]] = None,
     doctor_phones: Optional[List[str]] = None,
     doctor_webhooks: Optional[List[str]] = None,
     background_tasks=None,
-) -> Dict[str, bool]:
+) -> Dict[str, Dict[str, bool]]:
     """
-    Trigger alerts based on urgency.
+    Trigger alerts based on urgency. Runs on the caller's event loop; all channels overlap.
     - urgency_level: "high" | "medium" | "low"
     - message: alert body
     - doctor_emails: list of recipient emails
     - doctor_phones: list of phone numbers for SMS
     - doctor_webhooks: list of webhook URLs to POST to
-    - background_tasks: optional FastAPI BackgroundTasks instance; when present tasks are scheduled
-    Returns dict with delivery attempts results (best-effort, may be False if not configured).
-    """
-    results = {"email": False, "sms": False, "webhook": False}
-
-    async def _do_email_all(emails: List[str]) -> bool:
-        ok = True
-        for e in emails:
-            if not await send_email(e, f"[ALERT] Urgency: {urgency_level.upper()}", message):
-                ok = False
-        return ok
-
-    async def _do_sms_all(phones: List[str]) -> bool:
-        return await send_sms(phones, message)
-
-    async def _do_webhook_all(webhooks: List[str]) -> bool:
-        ok = True
-        for w in webhooks:
-            if not await send_webhook(w, {"message": message, "urgency": urgency_level}):
-                ok = False
-        return ok
-
-    should_send_email = bool(doctor_emails)
-    should_send_sms = bool(doctor_phones)
-    should_send_webhook = bool(doctor_webhooks) or bool(getattr(settings, "ALERT_SERVICE_URL", None))
-
-    # include default configured endpoints if not provided
-    if not doctor_webhooks and getattr(settings, "ALERT_SERVICE_URL", None):
-        doctor_webhooks = [getattr(settings, "ALERT_SERVICE_URL")]
-
-    # For high urgency: SMS + email + webhook; medium: email + webhook; low: none
-    if urgency_level.lower() == "high":
-        if should_send_sms:
-            if background_tasks:
-                background_tasks.add_task(_do_sms_all, doctor_phones)
-                results["sms"] = True
-            else:
-                results["sms"] = asyncio.run(_do_sms_all(doctor_phones))
-        if should_send_email:
-            if background_tasks:
-                background_tasks.add_task(_do_email_all, doctor_emails)
-                results["email"] = True
-            else:
-                results["email"] = asyncio.run(_do_email_all(doctor_emails))
-        if should_send_webhook:
-            if background_tasks:
-                background_tasks.add_task(_do_webhook_all, doctor_webhooks)
-                results["webhook"] = True
-            else:
-                results["webhook"] = asyncio.run(_do_webhook_all(doctor_webhooks))
-    elif urgency_level.lower() == "medium":
-        if should_send_email:
-            if background_tasks:
-                background_tasks.add_task(_do_email_all, doctor_emails)
-                results["email"] = True
-            else:
-                results["email"] = asyncio.run(_do_email_all(doctor_emails))
-        if should_send_webhook:
-            if background_tasks:
-                background_tasks.add_task(_do_webhook_all, doctor_webhooks)
-                results["webhook"] = True
-            else:
-                results["webhook"] = asyncio.run(_do_webhook_all(doctor_webhooks))
-    else:
-        # low urgency: no automatic alerts by default
-        pass
-
-    return results
\ No newline at end of file
+    - background_tasks: optional FastAPI BackgroundTasks instance; when present the fan-out is scheduled
+    Returns {channel: {recipient: delivered}} (best-effort; scheduled deliveries are reported as True).
+    """
+    plan = plan_deliveries(urgency_level, doctor_emails, doctor_phones, doctor_webhooks)
+    if not plan:
+        return {}
+
+    if background_tasks:
+        background_tasks.add_task(fan_out, urgency_level, message, plan)
+        return {channel: {r: True for r in recipients} for channel, recipients in plan.items()}
+
+    return await fan_out(urgency_level, message, plan)
+
+
+def trigger_alert_sync(
+    urgency_level: str,
+    message: str,
+    doctor_emails: Optional[List[str]] = None,
+    doctor_phones: Optional[List[str]] = None,
+    doctor_webhooks: Optional[List[str]] = None,
+) -> Dict[str, Dict[str, bool]]:
+    """
+    Blocking wrapper around trigger_alert for scripts and the REPL.
+    Must not be called from inside a running event loop; await trigger_alert there instead.
+    """
+    return asyncio.run(trigger_alert(urgency_level, message, doctor_emails, doctor_phones, doctor_webhooks))
@@ -0,0 +1,178 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class _LeaderCancelled(Exception):
+    """Set on a single-flight future whose computing task was cancelled; its waiters retry."""
+
+
+class DiskCacheStore:
+    """
+    Persistent cache tier: one JSON file per key under `directory`. Entries
+    older than the cache TTL are treated as missing. Values must be
+    JSON-serializable. Methods are blocking; AsyncTTLCache runs them in a thread.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest() + ".json")
+
+    def get(self, key: str, ttl: float) -> Tuple[bool, Any]:
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > ttl:
+                os.remove(path)
+                return False, None
+            with open(path, "r", encoding="utf-8") as f:
+                return True, json.load(f)
+        except (OSError, ValueError):
+            return False, None
+
+    def set(self, key: str, value: Any) -> None:
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(value, f)
+        os.replace(tmp, path)
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self) -> None:
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                os.remove(os.path.join(self.directory, name))
+
+
+class AsyncTTLCache:
+    """
+    Async memoizing cache for expensive upstream calls:
+    - in-process LRU tier bounded by `maxsize` entries and `ttl` seconds;
+    - optional persistent tier (DiskCacheStore) consulted on an LRU miss;
+    - single-flight: concurrent misses for the same key share one upstream call.
+    Failures are never cached; every waiter of a failed call sees the exception.
+    If the task computing a key is cancelled (its client went away), one of the
+    waiters takes the computation over instead of all of them failing.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0, store: Optional[DiskCacheStore] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.store = store
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.upstream_seconds = 0.0
+
+    def _get_local(self, key: str) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def _set_local(self, key: str, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        while True:
+            found, value = self._get_local(key)
+            if found:
+                self.hits += 1
+                return value
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(pending)
+            except _LeaderCancelled:
+                # the first waiter to get here computes the key, the others wait on it
+                self.coalesced -= 1
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            if self.store is not None:
+                found, value = await asyncio.to_thread(self.store.get, key, self.ttl)
+                if found:
+                    self.persistent_hits += 1
+                    self._set_local(key, value)
+                    future.set_result(value)
+                    return value
+
+            self.misses += 1
+            started = time.perf_counter()
+            value = await compute()
+            self.upstream_seconds += time.perf_counter() - started
+            self._set_local(key, value)
+            future.set_result(value)
+            if self.store is not None:
+                try:
+                    await asyncio.to_thread(self.store.set, key, value)
+                except (OSError, TypeError, ValueError):
+                    pass  # the persistent tier is best-effort
+            return value
+        except asyncio.CancelledError:
+            if not future.done():
+                # only this task was cancelled: its waiters retry rather than being cancelled with it
+                future.set_exception(_LeaderCancelled())
+                future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # keep "exception was never retrieved" quiet when nobody else waited
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def invalidate(self, key: str) -> None:
+        self._entries.pop(key, None)
+        if self.store is not None:
+            await asyncio.to_thread(self.store.delete, key)
+
+    async def clear(self) -> None:
+        self._entries.clear()
+        if self.store is not None:
+            await asyncio.to_thread(self.store.clear)
+
+    def stats(self) -> Dict[str, Any]:
+        served = self.hits + self.persistent_hits + self.coalesced
+        lookups = served + self.misses
+        avg_upstream = self.upstream_seconds / self.misses if self.misses else 0.0
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "persistent_hits": self.persistent_hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "hit_ratio": served / lookups if lookups else 0.0,
+            "upstream_calls_saved": served,
+            "upstream_seconds": round(self.upstream_seconds, 3),
+            # every served lookup would otherwise have cost one average upstream call
+            "estimated_seconds_saved": round(served * avg_upstream, 3),
+        }
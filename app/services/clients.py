@@ -0,0 +1,137 @@
+"""
+Provider clients and heavy optional modules, built on first use.
+
+Importing the app no longer constructs OpenAI or Twilio clients or loads
+numpy / pydub: each is a named entry here whose factory runs the first time
+get() is called. The FastAPI lifespan calls warm() for CLIENT_PRELOAD in the
+background once startup is done, so the first request does not pay the
+import, and /ready answers 503 until that has finished. With
+CLIENT_PREWARM_CONNECTIONS the warm step also opens the provider's
+connection (TLS handshake, pooled for the first real call).
+
+Tests and benchmarks point an entry at a stub with set() or register().
+"""
+import asyncio
+import importlib
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+
+
+class ClientRegistry:
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._warmers: Dict[str, Callable[[Any], Awaitable[None]]] = {}
+        self._closers: Dict[str, Callable[[Any], Awaitable[None]]] = {}
+        self._instances: Dict[str, Any] = {}
+        self.load_seconds: Dict[str, float] = {}
+
+    def register(
+        self,
+        name: str,
+        factory: Callable[[], Any],
+        connect: Optional[Callable[[Any], Awaitable[None]]] = None,
+        close: Optional[Callable[[Any], Awaitable[None]]] = None,
+    ) -> None:
+        """`connect(instance)` opens a connection ahead of the first call; `close(instance)` releases it."""
+        self._factories[name] = factory
+        self._warmers.pop(name, None)
+        self._closers.pop(name, None)
+        if connect is not None:
+            self._warmers[name] = connect
+        if close is not None:
+            self._closers[name] = close
+        self._instances.pop(name, None)
+
+    def get(self, name: str) -> Any:
+        try:
+            return self._instances[name]
+        except KeyError:
+            pass
+        started = time.perf_counter()
+        instance = self._instances[name] = self._factories[name]()
+        self.load_seconds[name] = time.perf_counter() - started
+        return instance
+
+    def set(self, name: str, instance: Any) -> None:
+        self._instances[name] = instance
+
+    def loaded(self, name: str) -> bool:
+        return name in self._instances
+
+    async def warm(self, names: Iterable[str], connect: bool = False) -> None:
+        """
+        Build each entry off the event loop (imports block), then with
+        `connect` open its connection. Failures are logged, not raised: an
+        entry that cannot warm is built again on its first real use.
+        """
+        for name in names:
+            if name not in self._factories:
+                logger.warning("unknown client %r in CLIENT_PRELOAD; choose from %s", name, sorted(self._factories))
+                continue
+            try:
+                instance = await asyncio.to_thread(self.get, name)
+                if connect and instance is not None and name in self._warmers:
+                    await self._warmers[name](instance)
+            except Exception:
+                logger.warning("could not warm client %s", name, exc_info=True)
+
+    async def aclose(self) -> None:
+        for name, close in self._closers.items():
+            instance = self._instances.pop(name, None)
+            if instance is not None:
+                try:
+                    await close(instance)
+                except Exception:
+                    logger.warning("could not close client %s", name, exc_info=True)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            **{f"{name}_loaded": int(name in self._instances) for name in self._factories},
+            **{f"{name}_load_seconds": seconds for name, seconds in self.load_seconds.items()},
+        }
+
+
+clients = ClientRegistry()
+
+
+def _openai():
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(api_key=settings.API_KEY)
+
+
+async def _connect_openai(client) -> None:
+    # any answer (a 401 included) leaves a TLS connection in the client's pool
+    try:
+        await client.with_options(max_retries=0, timeout=5.0).models.list()
+    except Exception as e:
+        logger.debug("OpenAI warm-up call answered with %s", e)
+
+
+async def _close_openai(client) -> None:
+    await client.close()
+
+
+def _twilio():
+    if not (settings.TWILIO_ACCOUNT_SID and settings.TWILIO_AUTH_TOKEN):
+        return None
+    try:
+        from twilio.rest import Client
+    except Exception:
+        # the library is optional; SMS is skipped without it
+        return None
+    return Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+
+
+clients.register("openai", _openai, connect=_connect_openai, close=_close_openai)
+clients.register("twilio", _twilio)
+# numpy + pydub, needed by the VAD on every transcription
+clients.register("vad", lambda: importlib.import_module("app.services.vad"))
+
+
+def openai_client():
+    """The shared AsyncOpenAI client (Whisper and chat completions)."""
+    return clients.get("openai")
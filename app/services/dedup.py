@@ -0,0 +1,326 @@
+"""
+Per-patient alert deduplication and storm suppression.
+
+A patient in distress often sends several voice notes within a minute, and
+each one would page every doctor again. Alerts are grouped by
+(user_id, tag set). The first alert of a group is forwarded and opens a
+window of ALERT_DEDUP_WINDOW_SECONDS. Repeats inside the window are held
+back unless their urgency is higher than anything forwarded in it; such an
+escalation is forwarded and restarts the window, and the repeats held so
+far are carried into the restarted window's digest. When a window ends with
+repeats held back, one digest alert (count + latest message) is sent and a
+new window opens, so a continuing storm costs one page per window.
+
+Windows live in memory (bounded by ALERT_DEDUP_MAX_KEYS) or, with
+ALERT_DEDUP_STORE=database, in the alert_windows table so every API replica
+sees the same windows. A store failure forwards the alert: suppression must
+never be the reason a page is lost.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import and_, case, delete, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.database import get_sessionmaker
+from app.models.dedup import AlertWindow
+
+URGENCY_RANK = {"LOW": 0, "MEDIUM": 1, "HIGH": 2}
+_URGENCY_BY_RANK = {rank: level for level, rank in URGENCY_RANK.items()}
+
+
+class Digest(NamedTuple):
+    """Repeats held back during one window, sent as a single alert when it ends."""
+
+    user_id: Optional[str]
+    urgency_level: str
+    tags: List[str]
+    count: int
+    # the most recent held-back message
+    message: str
+
+
+def _utcnow() -> datetime:
+    # naive UTC, like the outbox timestamps
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def window_key(user_id: Optional[str], tags: List[str]) -> str:
+    return hashlib.sha1(json.dumps([user_id, sorted(tags)]).encode()).hexdigest()
+
+
+def digest_message(digest: Digest, window_seconds: float) -> str:
+    plural = "s" if digest.count != 1 else ""
+    return (
+        f"{digest.count} further alert{plural} from this patient in the last {window_seconds:.0f} s "
+        f"were merged into this digest. Latest: {digest.message}"
+    )
+
+
+class _Window:
+    __slots__ = ("user_id", "tags", "rank", "ends_at", "suppressed", "digest_rank", "last_message")
+
+    def __init__(self, user_id: Optional[str], tags: List[str], rank: int, ends_at: float):
+        self.user_id = user_id
+        self.tags = tags
+        self.rank = rank
+        self.ends_at = ends_at
+        self.suppressed = 0
+        self.digest_rank = 0
+        self.last_message = ""
+
+    def digest(self) -> Digest:
+        return Digest(self.user_id, _URGENCY_BY_RANK[self.digest_rank], self.tags, self.suppressed, self.last_message)
+
+
+class MemoryWindowStore:
+    """
+    Windows of this process in an insertion-ordered dict bounded by
+    `max_keys`. When full, the least recently opened window is evicted; if it
+    was holding repeats back, its digest is sent at the next sweep.
+    """
+
+    def __init__(self, max_keys: Optional[int] = None, clock: Callable[[], float] = time.monotonic):
+        self.max_keys = max_keys or settings.ALERT_DEDUP_MAX_KEYS
+        self.clock = clock
+        self._windows: "OrderedDict[str, _Window]" = OrderedDict()
+        self._evicted: List[Digest] = []
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    async def admit(self, key: str, user_id: Optional[str], tags: List[str], rank: int, message: str, window: float) -> bool:
+        now = self.clock()
+        current = self._windows.get(key)
+        if current is None or current.ends_at <= now or rank > current.rank:
+            opened = self._windows[key] = _Window(user_id, tags, rank, now + window)
+            if current is not None:
+                # repeats held in the window being replaced go out with the new window's digest
+                opened.suppressed, opened.digest_rank = current.suppressed, current.digest_rank
+                opened.last_message = current.last_message
+            self._windows.move_to_end(key)
+            while len(self._windows) > self.max_keys:
+                _, evicted = self._windows.popitem(last=False)
+                self.evictions += 1
+                if evicted.suppressed:
+                    self._evicted.append(evicted.digest())
+            return True
+        current.suppressed += 1
+        current.digest_rank = max(current.digest_rank, rank)
+        current.last_message = message
+        return False
+
+    async def take_due(self, window: float, force: bool = False) -> List[Digest]:
+        """Digests of ended windows (all windows when `force`); their windows restart."""
+        now = self.clock()
+        digests, self._evicted = self._evicted, []
+        for key, current in list(self._windows.items()):
+            if current.ends_at > now and not force:
+                continue
+            if current.suppressed:
+                digests.append(current.digest())
+                current.ends_at = now + window
+                current.suppressed = current.digest_rank = 0
+                current.last_message = ""
+            else:
+                del self._windows[key]
+        return digests
+
+
+class DatabaseWindowStore:
+    """
+    Windows in the alert_windows table, shared by every API replica. Each
+    decision is a conditional UPDATE, so concurrent replicas cannot both
+    forward the same repeat, and any replica's sweeper may send a digest
+    (claimed the same way, like outbox rows).
+    """
+
+    def __init__(self, sessionmaker: Optional[async_sessionmaker] = None, batch_size: int = 100):
+        self._sessionmaker = sessionmaker
+        self.batch_size = batch_size
+
+    async def admit(self, key: str, user_id: Optional[str], tags: List[str], rank: int, message: str, window: float) -> bool:
+        now = _utcnow()
+        opened = {"user_id": user_id, "tags": tags, "rank": rank, "ends_at": now + timedelta(seconds=window)}
+        async with (self._sessionmaker or get_sessionmaker())() as session:
+            for _ in range(2):
+                # suppressed / digest_rank / last_message are kept: repeats held so far go out with the new
+                # window's digest
+                forwarded = await session.execute(
+                    update(AlertWindow)
+                    .where(AlertWindow.key == key, or_(AlertWindow.ends_at <= now, AlertWindow.rank < rank))
+                    .values(**opened)
+                )
+                if forwarded.rowcount:
+                    await session.commit()
+                    return True
+                held = await session.execute(
+                    update(AlertWindow)
+                    .where(AlertWindow.key == key, AlertWindow.ends_at > now, AlertWindow.rank >= rank)
+                    .values(
+                        suppressed=AlertWindow.suppressed + 1,
+                        digest_rank=case((AlertWindow.digest_rank < rank, rank), else_=AlertWindow.digest_rank),
+                        last_message=message,
+                    )
+                )
+                if held.rowcount:
+                    await session.commit()
+                    return False
+                session.add(AlertWindow(key=key, suppressed=0, digest_rank=0, last_message=None, **opened))
+                try:
+                    await session.commit()
+                    return True
+                except IntegrityError:
+                    # another replica opened this window first; decide against its row
+                    await session.rollback()
+        return True
+
+    async def take_due(self, window: float, force: bool = False) -> List[Digest]:
+        # shared windows outlive this process: on shutdown (`force`) another replica digests them
+        if force:
+            return []
+        now = _utcnow()
+        digests = []
+        async with (self._sessionmaker or get_sessionmaker())() as session:
+            due = (await session.execute(
+                select(AlertWindow)
+                .where(AlertWindow.ends_at <= now, AlertWindow.suppressed > 0)
+                .order_by(AlertWindow.ends_at)
+                .limit(self.batch_size)
+            )).scalars().all()
+            for row in due:
+                claimed = await session.execute(
+                    update(AlertWindow)
+                    .where(AlertWindow.key == row.key, AlertWindow.ends_at == row.ends_at,
+                           AlertWindow.suppressed == row.suppressed)
+                    .values(ends_at=now + timedelta(seconds=window), suppressed=0, digest_rank=0, last_message=None)
+                    .execution_options(synchronize_session=False)
+                )
+                if claimed.rowcount:
+                    digests.append(Digest(row.user_id, _URGENCY_BY_RANK[row.digest_rank], list(row.tags),
+                                          row.suppressed, row.last_message or ""))
+            await session.execute(
+                delete(AlertWindow).where(and_(AlertWindow.ends_at <= now, AlertWindow.suppressed == 0))
+            )
+            await session.commit()
+        return digests
+
+
+STORES = {"memory": MemoryWindowStore, "database": DatabaseWindowStore}
+
+
+class AlertSuppressor:
+    """
+    Front door for alert dispatch: admit() says whether an alert goes out now.
+    A background sweeper sends digests through the callback given to start().
+    """
+
+    def __init__(self, store=None, window: Optional[float] = None):
+        self._store = store
+        self._window = window
+        self._on_digest: Optional[Callable[[Digest], Awaitable[None]]] = None
+        self._task: Optional[asyncio.Task] = None
+        self.forwarded = 0
+        self.suppressed = 0
+        self.digests = 0
+        self.digest_failures = 0
+        self.store_errors = 0
+
+    @property
+    def store(self):
+        if self._store is None:
+            if settings.ALERT_DEDUP_STORE not in STORES:
+                raise ValueError(f"unknown ALERT_DEDUP_STORE {settings.ALERT_DEDUP_STORE!r}; choose from {sorted(STORES)}")
+            self._store = STORES[settings.ALERT_DEDUP_STORE]()
+        return self._store
+
+    @property
+    def window(self) -> float:
+        return self._window or settings.ALERT_DEDUP_WINDOW_SECONDS
+
+    async def admit(self, user_id: Optional[str], urgency_level: str, tags: List[str], message: str) -> bool:
+        """True if the alert should be sent now; False if it was held back for the window's digest."""
+        if not settings.ALERT_DEDUP_ENABLED:
+            return True
+        if self._on_digest is not None and (self._task is None or self._task.done()):
+            self.start(self._on_digest)
+        tags = sorted({tag.lower() for tag in tags})
+        try:
+            forward = await self.store.admit(
+                window_key(user_id, tags), user_id, tags, URGENCY_RANK.get(urgency_level.upper(), 0), message, self.window
+            )
+        except Exception:
+            self.store_errors += 1
+            logger.exception("alert dedup store failed; forwarding the alert")
+            forward = True
+        if forward:
+            self.forwarded += 1
+        else:
+            self.suppressed += 1
+        return forward
+
+    def start(self, on_digest: Callable[[Digest], Awaitable[None]]) -> None:
+        self._on_digest = on_digest
+        if settings.ALERT_DEDUP_ENABLED and (self._task is None or self._task.done()):
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        interval = min(1.0, self.window / 4)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sweep()
+            except Exception:
+                self.store_errors += 1
+                logger.exception("alert dedup sweep failed")
+
+    async def sweep(self, force: bool = False) -> int:
+        """Send the digests of ended windows. Returns how many were sent."""
+        if self._on_digest is None:
+            return 0
+        sent = 0
+        for digest in await self.store.take_due(self.window, force):
+            try:
+                await self._on_digest(digest)
+                sent += 1
+            except Exception:
+                self.digest_failures += 1
+                logger.exception("sending alert digest for %s failed", digest.user_id)
+        self.digests += sent
+        return sent
+
+    async def close(self) -> None:
+        """Stop the sweeper and send the digests still pending in this process."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._store is not None:
+            await self.sweep(force=True)
+
+    def stats(self) -> Dict[str, int]:
+        stats = {
+            "forwarded": self.forwarded,
+            "suppressed": self.suppressed,
+            "digests": self.digests,
+            "digest_failures": self.digest_failures,
+            "store_errors": self.store_errors,
+        }
+        if isinstance(self._store, MemoryWindowStore):
+            stats.update(windows=len(self._store), evictions=self._store.evictions)
+        return stats
+
+
+alert_suppressor = AlertSuppressor()
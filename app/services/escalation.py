@@ -0,0 +1,274 @@
+"""
+Escalation of alerts nobody acknowledges.
+
+Every dispatched alert whose urgency is in ESCALATION_URGENCIES gets a row
+in alert_escalations and a deadline ESCALATION_ACK_SECONDS out. A doctor
+acknowledges it with POST /api/v1/alerts/alerts/{alert_id}/ack. If the
+deadline passes first, the alert is re-sent to the next tier of
+ESCALATION_TIERS with a new deadline, until it is acknowledged or the tiers
+run out.
+
+Deadlines live in a hierarchical timer wheel (app/services/timer_wheel.py)
+advanced by one background task every ESCALATION_TICK_SECONDS, not in a
+sleeping task per alert, so tens of thousands of pending alerts cost a dict
+entry each. The table is the source of truth: the timers are rebuilt from
+it at startup, and each escalation first claims its row with a conditional
+UPDATE, so an alert acknowledged on another replica (or escalated by one)
+is not paged again here. A store failure escalates anyway: an outage of the
+database must not be the reason a page is missed.
+
+track() does not wait on the database: the timer is set at once and the row
+is queued on a BufferedWriter (app/services/persistence.py) and inserted
+with the next batch. A row still in the buffer is acknowledged or escalated
+in place, so it is inserted in its current state; rows lost with the
+process only cost the restart recovery of those alerts.
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.database import get_sessionmaker
+from app.models.escalation import AlertEscalation
+from app.services.persistence import BufferedWriter
+from app.services.timer_wheel import TimerWheel
+
+
+class Escalation(NamedTuple):
+    """One re-send of an unacknowledged alert, handed to the callback given to start()."""
+
+    alert_id: str
+    user_id: Optional[str]
+    message: str
+    # 1 for the first escalation
+    tier: int
+    # {"email": [...], "sms": [...], "webhook": [...]}; empty means the on-call defaults
+    recipients: Dict[str, List[str]]
+
+
+class Acknowledgement(NamedTuple):
+    alert_id: str
+    acknowledged_at: datetime
+    acknowledged_by: Optional[str]
+    # escalation steps sent before the acknowledgement
+    escalations: int
+
+
+def _utcnow() -> datetime:
+    # naive UTC, like the outbox timestamps
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _epoch(moment: datetime) -> float:
+    return moment.replace(tzinfo=timezone.utc).timestamp()
+
+
+def escalation_tiers() -> List[Dict[str, List[str]]]:
+    return list(settings.ESCALATION_TIERS) or [{}]
+
+
+def escalation_message(escalation: Escalation, ack_seconds: float) -> str:
+    return (
+        f"ESCALATION {escalation.tier}: not acknowledged within {ack_seconds:.0f} s "
+        f"(alert {escalation.alert_id}). {escalation.message}"
+    )
+
+
+class _Pending:
+    __slots__ = ("user_id", "message", "tier", "row")
+
+    def __init__(self, user_id: Optional[str], message: str, tier: int, row: Optional[Dict] = None):
+        self.user_id = user_id
+        self.message = message
+        self.tier = tier
+        # the values queued for insertion by track(); updated in place while they may still be buffered
+        self.row = row
+
+
+class EscalationScheduler:
+    def __init__(
+        self,
+        sessionmaker: Optional[async_sessionmaker] = None,
+        ack_seconds: Optional[float] = None,
+        tick: Optional[float] = None,
+        clock: Callable[[], datetime] = _utcnow,
+    ):
+        self._sessionmaker = sessionmaker
+        self._ack_seconds = ack_seconds
+        self.clock = clock
+        self.wheel = TimerWheel(tick or settings.ESCALATION_TICK_SECONDS, start=_epoch(clock()))
+        self._pending: Dict[str, _Pending] = {}
+        self._writer = BufferedWriter(sessionmaker)
+        self._on_escalate: Optional[Callable[[Escalation], Awaitable[None]]] = None
+        self._task: Optional[asyncio.Task] = None
+        self.tracked = 0
+        self.acknowledged = 0
+        self.escalated = 0
+        self.escalation_failures = 0
+        self.store_errors = 0
+
+    @property
+    def ack_seconds(self) -> float:
+        return self._ack_seconds or settings.ESCALATION_ACK_SECONDS
+
+    def _sessions(self) -> async_sessionmaker:
+        return self._sessionmaker or get_sessionmaker()
+
+    def _schedule(self, alert_id: str, pending: _Pending, due_at: datetime) -> None:
+        self._pending[alert_id] = pending
+        self.wheel.schedule(alert_id, _epoch(due_at))
+
+    def track(self, alert_id: str, user_id: Optional[str], urgency_level: str, message: str) -> bool:
+        """
+        Start the acknowledgement deadline of a dispatched alert; False if its
+        urgency does not escalate. Never waits on the database.
+        """
+        if not settings.ESCALATION_ENABLED or urgency_level.upper() not in settings.ESCALATION_URGENCIES:
+            return False
+        if self._on_escalate is not None and (self._task is None or self._task.done()):
+            self.start(self._on_escalate)
+        now = self.clock()
+        due_at = now + timedelta(seconds=self.ack_seconds)
+        row = self._writer.add(
+            AlertEscalation, alert_id=alert_id, user_id=user_id, urgency_level=urgency_level.upper(),
+            message=message, tier=0, due_at=due_at, created_at=now, acknowledged_at=None, acknowledged_by=None,
+        )
+        self._schedule(alert_id, _Pending(user_id, message, 0, row), due_at)
+        self.tracked += 1
+        return True
+
+    async def acknowledge(self, alert_id: str, acknowledged_by: Optional[str] = None) -> Optional[Acknowledgement]:
+        """
+        Record the acknowledgement and stop escalating. Acknowledging twice
+        keeps the first acknowledgement. None if the alert is not tracked.
+        """
+        now = self.clock()
+        pending = self._pending.get(alert_id)
+        if pending is not None and pending.row is not None and pending.row["acknowledged_at"] is None:
+            # inserted already acknowledged if the row is still buffered (the UPDATE below misses it)
+            pending.row.update(acknowledged_at=now, acknowledged_by=acknowledged_by, due_at=None)
+        await self._writer.flush()
+        async with self._sessions()() as session:
+            await session.execute(
+                update(AlertEscalation)
+                .where(AlertEscalation.alert_id == alert_id, AlertEscalation.acknowledged_at.is_(None))
+                .values(acknowledged_at=now, acknowledged_by=acknowledged_by, due_at=None)
+            )
+            await session.commit()
+            row = await session.get(AlertEscalation, alert_id)
+        pending = self._pending.pop(alert_id, None)
+        if pending is not None:
+            self.wheel.cancel(alert_id)
+            self.acknowledged += 1
+        if row is None:
+            # tracked in memory only (its row was dropped from the write buffer or is still in it), or unknown
+            return Acknowledgement(alert_id, now, acknowledged_by, pending.tier) if pending is not None else None
+        return Acknowledgement(alert_id, row.acknowledged_at, row.acknowledged_by, row.tier)
+
+    async def recover(self) -> int:
+        """Rebuild the timers of every alert still waiting for an acknowledgement. Returns how many."""
+        async with self._sessions()() as session:
+            rows = (await session.execute(
+                select(AlertEscalation.alert_id, AlertEscalation.user_id, AlertEscalation.message,
+                       AlertEscalation.tier, AlertEscalation.due_at)
+                .where(AlertEscalation.due_at.is_not(None))
+            )).all()
+        for alert_id, user_id, message, tier, due_at in rows:
+            # deadlines that passed while no replica was running fire at the next tick
+            self._schedule(alert_id, _Pending(user_id, message, tier), due_at)
+        return len(rows)
+
+    async def _claim(self, alert_id: str, tier: int, due_at: Optional[datetime]) -> bool:
+        """False if the alert was acknowledged or escalated elsewhere; True if claimed or its row was never written."""
+        # rows track() queued are written first so the claim sees them
+        await self._writer.flush()
+        async with self._sessions()() as session:
+            claimed = await session.execute(
+                update(AlertEscalation)
+                .where(AlertEscalation.alert_id == alert_id, AlertEscalation.tier == tier,
+                       AlertEscalation.acknowledged_at.is_(None))
+                .values(tier=tier + 1, due_at=due_at)
+            )
+            await session.commit()
+            # no row: dropped from the write buffer or not flushed yet; escalate from memory
+            return bool(claimed.rowcount) or await session.get(AlertEscalation, alert_id) is None
+
+    async def _escalate(self, alert_id: str) -> None:
+        pending = self._pending.pop(alert_id, None)
+        if pending is None:
+            return
+        tiers = escalation_tiers()
+        if pending.tier >= len(tiers):
+            return
+        tier = pending.tier + 1
+        due_at = self.clock() + timedelta(seconds=self.ack_seconds) if tier < len(tiers) else None
+        try:
+            if not await self._claim(alert_id, pending.tier, due_at):
+                # acknowledged, or escalated by another replica (which holds the next deadline)
+                return
+        except Exception:
+            self.store_errors += 1
+            logger.exception("escalation store failed; escalating alert %s anyway", alert_id)
+        pending.tier = tier
+        if pending.row is not None:
+            pending.row.update(tier=tier, due_at=due_at)
+        try:
+            await self._on_escalate(Escalation(alert_id, pending.user_id, pending.message, tier, tiers[tier - 1]))
+            self.escalated += 1
+        except Exception:
+            self.escalation_failures += 1
+            logger.exception("escalating alert %s to tier %d failed", alert_id, tier)
+        if due_at is not None:
+            self._schedule(alert_id, pending, due_at)
+
+    async def fire_due(self) -> int:
+        """Escalate every alert whose deadline has passed. Returns how many deadlines fired."""
+        if self._on_escalate is None:
+            return 0
+        due = self.wheel.advance(_epoch(self.clock()))
+        # bounded batches: a burst of expiries must not open a session per alert at once
+        for start in range(0, len(due), 32):
+            await asyncio.gather(*(self._escalate(alert_id) for alert_id in due[start:start + 32]))
+        return len(due)
+
+    def start(self, on_escalate: Callable[[Escalation], Awaitable[None]]) -> None:
+        self._on_escalate = on_escalate
+        if settings.ESCALATION_ENABLED and (self._task is None or self._task.done()):
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.wheel.tick)
+            try:
+                await self.fire_due()
+            except Exception:
+                logger.exception("escalation scheduler tick failed")
+
+    async def close(self) -> None:
+        """Stop the timers; pending deadlines stay in the table for the next start (or another replica)."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._writer.close()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self.wheel),
+            "tracked": self.tracked,
+            "acknowledged": self.acknowledged,
+            "escalated": self.escalated,
+            "escalation_failures": self.escalation_failures,
+            "store_errors": self.store_errors,
+            "unwritten": self._writer.stats()["buffered"],
+        }
+
+
+escalation_scheduler = EscalationScheduler()
@@ -0,0 +1,228 @@
+"""
+Asynchronous /patient_alert jobs.
+
+POST /patient_alert/jobs stores the upload on disk and returns 202 at once;
+JOB_WORKERS in-process workers run the same pipeline as the synchronous
+endpoint, JOB_MAX_PENDING jobs at most waiting (beyond that: Overloaded, so
+503 + Retry-After). A pending job costs a small object and its audio file,
+not a connection, so an instance holds thousands of them.
+
+Each job records its stage events (queued, started, transcribed, triaged,
+alerted, completed / failed). Clients poll the job or subscribe to the events
+over SSE; a subscriber first gets the events it missed, then live ones.
+Finished jobs stay readable for JOB_RETENTION_SECONDS. Jobs live in this
+process only: poll the instance that accepted the job, and jobs still
+pending at shutdown are failed.
+"""
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.services.resilience import Overloaded
+from app.utils.uploads import remove_quietly
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+TERMINAL_EVENTS = ("completed", "failed")
+
+
+class Job:
+    __slots__ = ("id", "user_id", "mode", "audio_path", "status", "created_at", "updated_at",
+                 "result", "error", "events", "_subscribers")
+
+    def __init__(self, user_id: str, mode: str, audio_path: str):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.mode = mode
+        self.audio_path = audio_path
+        self.status = QUEUED
+        self.created_at = self.updated_at = time.time()
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.events: List[Dict[str, Any]] = []
+        self._subscribers: Set[asyncio.Queue] = set()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    def emit(self, event: str, data: Optional[Dict[str, Any]] = None) -> None:
+        """Record a stage event and hand it to every live subscriber."""
+        record = {"id": len(self.events), "event": event, "data": data or {}, "at": time.time()}
+        self.events.append(record)
+        self.updated_at = record["at"]
+        for queue in self._subscribers:
+            queue.put_nowait(record)
+
+    async def subscribe(self, after: int = -1, keepalive: Optional[float] = None) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Events with id > `after`, then live ones, until the job completes or
+        fails. With `keepalive`, None is yielded after that many idle seconds.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        # no await between the replay snapshot and registering, so nothing is missed or repeated
+        backlog = self.events[after + 1:]
+        self._subscribers.add(queue)
+        try:
+            for record in backlog:
+                yield record
+                if record["event"] in TERMINAL_EVENTS:
+                    return
+            while True:
+                try:
+                    record = await asyncio.wait_for(queue.get(), keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if record["id"] <= after:
+                    continue
+                yield record
+                if record["event"] in TERMINAL_EVENTS:
+                    return
+        finally:
+            self._subscribers.discard(queue)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "user_id": self.user_id,
+            "mode": self.mode,
+            "status": self.status,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "stage": self.events[-1]["event"] if self.events else None,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+# handler(job) runs the pipeline, calling job.emit() per stage, and returns the result dict
+JobHandler = Callable[[Job], Awaitable[Dict[str, Any]]]
+
+
+class JobManager:
+    """Bounded FIFO of jobs served by a pool of asyncio workers."""
+
+    def __init__(self, workers: Optional[int] = None, max_pending: Optional[int] = None,
+                 retention: Optional[float] = None):
+        self.workers = workers or settings.JOB_WORKERS
+        self.max_pending = max_pending or settings.JOB_MAX_PENDING
+        self.retention = retention if retention is not None else settings.JOB_RETENTION_SECONDS
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._handler: Optional[JobHandler] = None
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self, handler: JobHandler) -> None:
+        self._handler = handler
+        if self._tasks and not all(task.done() for task in self._tasks):
+            return
+        # a queue is bound to the loop that first waits on it; carry over anything still pending
+        previous, self._queue = self._queue, asyncio.Queue()
+        while previous is not None and not previous.empty():
+            self._queue.put_nowait(previous.get_nowait())
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._work()) for _ in range(self.workers)]
+
+    def submit(self, user_id: str, mode: str, audio_path: str) -> Job:
+        """Queue a job that owns `audio_path` (deleted when it finishes). Raises Overloaded when full."""
+        if self._handler is None:
+            raise RuntimeError("job workers are not running")
+        if not self._tasks or all(task.done() for task in self._tasks):
+            self.start(self._handler)
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise Overloaded(f"{self.pending} jobs already pending", retry_after=5.0)
+        self._prune()
+        job = Job(user_id, mode, audio_path)
+        self._jobs[job.id] = job
+        job.emit("queued", {"position": self.pending + 1})
+        self._queue.put_nowait(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    async def _work(self) -> None:
+        while True:
+            try:
+                job = await asyncio.wait_for(self._queue.get(), max(self.retention, 1.0))
+            except asyncio.TimeoutError:
+                # idle: finished jobs still expire when nothing new is submitted
+                self._prune()
+                continue
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+                self._prune()
+
+    async def _run(self, job: Job) -> None:
+        job.status = RUNNING
+        job.emit("started")
+        self.running += 1
+        try:
+            job.result = await self._handler(job)
+        except asyncio.CancelledError:
+            self._fail(job, "shut down before the job finished")
+            raise
+        except Exception as e:
+            logger.exception("patient alert job %s failed", job.id)
+            self._fail(job, f"{type(e).__name__}: {e}")
+        else:
+            job.status = DONE
+            self.completed += 1
+            job.emit("completed", job.result)
+        finally:
+            self.running -= 1
+            remove_quietly(job.audio_path)
+
+    def _fail(self, job: Job, error: str) -> None:
+        job.status = FAILED
+        job.error = error
+        self.failed += 1
+        job.emit("failed", {"error": error})
+
+    def _prune(self) -> None:
+        # oldest first; stop at the first job that is still pending or recent
+        cutoff = time.time() - self.retention
+        while self._jobs:
+            job = next(iter(self._jobs.values()))
+            if not job.finished or job.updated_at > cutoff:
+                return
+            self._jobs.popitem(last=False)
+
+    async def close(self) -> None:
+        """Stop the workers; running and queued jobs are failed and their audio removed."""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        while self._queue is not None and not self._queue.empty():
+            job = self._queue.get_nowait()
+            self._fail(job, "shut down before the job started")
+            remove_quietly(job.audio_path)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": self.pending,
+            "running": self.running,
+            "tracked": len(self._jobs),
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+
+job_manager = JobManager()
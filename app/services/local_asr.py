@@ -0,0 +1,184 @@
+"""
+CPU-only offline speech recognition in a warm process pool.
+
+SpeechRecognition's recognize_sphinx / recognize_vosk / recognize_faster_whisper
+construct their model on every call, which costs more than decoding a short
+voice note. Here each worker process of a ProcessPoolExecutor loads the engine
+once (in the pool initializer) and keeps it for its lifetime; requests only
+ship a file path to the worker and a string back.
+
+Engines ("LOCAL_ASR_ENGINE"):
+    sphinx          pocketsphinx (bundled en-US model, no download)
+    vosk            vosk, LOCAL_ASR_MODEL = path to an unpacked model
+    faster_whisper  faster-whisper, LOCAL_ASR_MODEL = model size/path (default "base"), int8 on CPU
+
+This module must stay importable without app settings: worker processes are
+spawned and import it fresh.
+"""
+import asyncio
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Type
+
+import numpy as np
+
+from app.utils.audio import TARGET_RATE, load_samples
+
+
+class LocalEngine:
+    """Loaded once per worker process; transcribe() gets 16 kHz mono float32 samples."""
+
+    def __init__(self, model: Optional[str] = None):
+        self.model = model
+
+    def transcribe(self, samples: np.ndarray) -> str:
+        raise NotImplementedError
+
+
+def _pcm16(samples: np.ndarray) -> bytes:
+    return np.clip(samples * 32767.0, -32768, 32767).astype("<i2").tobytes()
+
+
+class SphinxEngine(LocalEngine):
+    def __init__(self, model: Optional[str] = None):
+        super().__init__(model)
+        from pocketsphinx import Decoder
+
+        options = {"samprate": TARGET_RATE, "loglevel": "FATAL"}
+        if model:
+            options["hmm"] = model
+        self.decoder = Decoder(**options)
+
+    def transcribe(self, samples: np.ndarray) -> str:
+        self.decoder.start_utt()
+        self.decoder.process_raw(_pcm16(samples), full_utt=True)
+        self.decoder.end_utt()
+        hypothesis = self.decoder.hyp()
+        return hypothesis.hypstr if hypothesis is not None else ""
+
+
+class VoskEngine(LocalEngine):
+    def __init__(self, model: Optional[str] = None):
+        super().__init__(model)
+        from vosk import Model, SetLogLevel
+
+        if not model:
+            raise ValueError("the vosk engine needs LOCAL_ASR_MODEL (path to an unpacked model)")
+        SetLogLevel(-1)
+        self.vosk_model = Model(model)
+
+    def transcribe(self, samples: np.ndarray) -> str:
+        from vosk import KaldiRecognizer
+
+        recognizer = KaldiRecognizer(self.vosk_model, TARGET_RATE)
+        recognizer.AcceptWaveform(_pcm16(samples))
+        return json.loads(recognizer.FinalResult()).get("text", "")
+
+
+class FasterWhisperEngine(LocalEngine):
+    def __init__(self, model: Optional[str] = None):
+        super().__init__(model)
+        from faster_whisper import WhisperModel
+
+        # one thread per worker process: the pool is the unit of parallelism
+        self.whisper = WhisperModel(model or "base", device="cpu", compute_type="int8", cpu_threads=1)
+
+    def transcribe(self, samples: np.ndarray) -> str:
+        segments, _ = self.whisper.transcribe(samples)
+        return " ".join(segment.text.strip() for segment in segments)
+
+
+ENGINES: Dict[str, Type[LocalEngine]] = {
+    "sphinx": SphinxEngine,
+    "vosk": VoskEngine,
+    "faster_whisper": FasterWhisperEngine,
+}
+
+# per worker process
+_engine: Optional[LocalEngine] = None
+_engine_error: Optional[str] = None
+_warm_barrier = None
+
+
+def _init_worker(engine: str, model: Optional[str], barrier=None) -> None:
+    global _engine, _engine_error, _warm_barrier
+    _warm_barrier = barrier
+    try:
+        _engine = ENGINES[engine](model)
+    except Exception as e:
+        # an initializer exception would break the whole pool; report it per call instead
+        _engine_error = f"{engine} engine unavailable: {e!r}"
+
+
+def _warm(timeout: float) -> int:
+    if _engine_error:
+        # release the workers already waiting instead of letting them time out
+        _warm_barrier.abort()
+        raise RuntimeError(_engine_error)
+    # a worker holding a warm-up task cannot take another, so one task lands on every worker
+    _warm_barrier.wait(timeout)
+    return os.getpid()
+
+
+def _transcribe_file(audio_path: str) -> str:
+    if _engine is None:
+        raise RuntimeError(_engine_error or "local ASR worker not initialized")
+    return _engine.transcribe(load_samples(audio_path))
+
+
+class LocalTranscriber:
+    """
+    A ProcessPoolExecutor whose workers each hold a loaded engine. start()
+    spawns and warms every worker up front so the first request does not pay
+    for process start-up or model loading.
+    """
+
+    def __init__(self, engine: str = "sphinx", model: Optional[str] = None, workers: Optional[int] = None):
+        if engine not in ENGINES:
+            raise ValueError(f"unknown local ASR engine {engine!r}; choose from {sorted(ENGINES)}")
+        self.engine = engine
+        self.model = model
+        self.workers = workers or os.cpu_count() or 1
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a process with a running event loop and client threads is unsafe
+            context = multiprocessing.get_context("spawn")
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self.engine, self.model, context.Barrier(self.workers)),
+            )
+        return self._pool
+
+    async def start(self, timeout: float = 60.0) -> List[int]:
+        """
+        Spawn all workers and wait until each has loaded the engine. Returns their
+        pids; raises if the engine cannot load.
+        """
+        pool = self._get_pool()
+        loop = asyncio.get_running_loop()
+        # each task waits on a barrier of `workers` parties after its worker's initializer loaded the
+        # engine, so they all return only once every worker is up
+        results = await asyncio.gather(
+            *(loop.run_in_executor(pool, _warm, timeout) for _ in range(self.workers)), return_exceptions=True
+        )
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            # the engine error rather than the broken barrier it caused elsewhere
+            raise next((e for e in errors if not isinstance(e, threading.BrokenBarrierError)), errors[0])
+        return sorted(results)
+
+    async def transcribe(self, audio_path: str) -> str:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_pool(), _transcribe_file, audio_path)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,192 @@
+import asyncio
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.models.alert import DeliveryAttempt
+from app.models.outbox import DEAD, DELIVERED, IN_PROGRESS, PENDING, AlertOutbox
+from app.services import alerting
+from app.services.persistence import fit, mark_delivered
+
+
+def _utcnow() -> datetime:
+    # naive UTC: portable across Postgres and SQLite DateTime columns
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def backoff_delay(attempts: int) -> float:
+    """
+    Seconds to wait before retry number `attempts` (1-based): exponential in the
+    attempt count, capped at OUTBOX_BACKOFF_MAX_SECONDS, with equal jitter so a
+    burst of failures does not retry in lockstep.
+    """
+    ceiling = min(
+        settings.OUTBOX_BACKOFF_MAX_SECONDS,
+        settings.OUTBOX_BACKOFF_BASE_SECONDS * (2 ** max(attempts - 1, 0)),
+    )
+    return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+
+async def enqueue_alert(
+    session: AsyncSession,
+    urgency_level: str,
+    message: str,
+    doctor_emails: Optional[List[str]] = None,
+    doctor_phones: Optional[List[str]] = None,
+    doctor_webhooks: Optional[List[str]] = None,
+    user_id: Optional[str] = None,
+    alert_id: Optional[str] = None,
+) -> Dict[str, Dict[str, Optional[bool]]]:
+    """
+    Persist one outbox row per planned delivery and commit. Nothing is sent
+    here; workers/worker.py picks the rows up. `alert_id` ties the rows to the
+    caller's audit record (a new id is generated when omitted).
+    Returns {channel: {recipient: None}} for every queued delivery, shaped like
+    trigger_alert's results; the worker records the real outcome.
+    """
+    plan = alerting.plan_deliveries(urgency_level, doctor_emails, doctor_phones, doctor_webhooks)
+    if not plan:
+        return {}
+
+    now = _utcnow()
+    alert_id = alert_id or str(uuid.uuid4())
+    session.add_all(
+        AlertOutbox(
+            alert_id=alert_id,
+            user_id=fit(AlertOutbox.user_id, user_id),
+            channel=channel,
+            recipient=recipient,
+            urgency_level=urgency_level,
+            message=message,
+            status=PENDING,
+            attempts=0,
+            next_attempt_at=now,
+            created_at=now,
+            updated_at=now,
+        )
+        for channel, recipients in plan.items()
+        for recipient in recipients
+    )
+    await session.commit()
+    return {channel: dict.fromkeys(recipients) for channel, recipients in plan.items()}
+
+
+async def claim_batch(session: AsyncSession, limit: int, lease_seconds: Optional[float] = None) -> List[AlertOutbox]:
+    """
+    Lease up to `limit` due rows to the caller. Due means pending with
+    next_attempt_at in the past, or in progress with an expired lease (a worker
+    died mid-delivery). Each claim is tagged with a unique token so two
+    consumers can never take the same row, with or without SKIP LOCKED support.
+    """
+    now = _utcnow()
+    token = uuid.uuid4().hex
+    due = or_(
+        and_(AlertOutbox.status == PENDING, AlertOutbox.next_attempt_at <= now),
+        and_(AlertOutbox.status == IN_PROGRESS, AlertOutbox.locked_until < now),
+    )
+    candidates = (
+        select(AlertOutbox.id)
+        .where(due)
+        .order_by(AlertOutbox.next_attempt_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    ids = list((await session.execute(candidates)).scalars())
+    if not ids:
+        await session.commit()
+        return []
+
+    lease = timedelta(seconds=lease_seconds if lease_seconds is not None else settings.OUTBOX_LEASE_SECONDS)
+    await session.execute(
+        update(AlertOutbox)
+        .where(AlertOutbox.id.in_(ids), due)
+        .values(
+            status=IN_PROGRESS,
+            claimed_by=token,
+            locked_until=now + lease,
+            attempts=AlertOutbox.attempts + 1,
+            updated_at=now,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+    rows = await session.execute(select(AlertOutbox).where(AlertOutbox.claimed_by == token))
+    return list(rows.scalars())
+
+
+async def record_outcomes(session: AsyncSession, outcomes: List[Tuple[AlertOutbox, Optional[str]]]) -> None:
+    """
+    Store delivery results: error None means delivered; otherwise the row is
+    rescheduled with backoff, or moved to the dead-letter state once it has
+    used OUTBOX_MAX_ATTEMPTS attempts. Every attempt is also written to the
+    delivery_attempts audit table in the same commit.
+    """
+    now = _utcnow()
+    for row, error in outcomes:
+        values = {"locked_until": None, "claimed_by": None, "updated_at": now}
+        if error is None:
+            values.update(status=DELIVERED, last_error=None)
+        elif row.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            values.update(status=DEAD, last_error=error)
+        else:
+            values.update(
+                status=PENDING,
+                last_error=error,
+                next_attempt_at=now + timedelta(seconds=backoff_delay(row.attempts)),
+            )
+        await session.execute(
+            update(AlertOutbox)
+            .where(AlertOutbox.id == row.id, AlertOutbox.claimed_by == row.claimed_by)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+    if settings.PERSIST_ENABLED and outcomes:
+        await session.execute(insert(DeliveryAttempt), [
+            {
+                "alert_id": row.alert_id,
+                "channel": row.channel,
+                "recipient": row.recipient,
+                "attempt": row.attempts,
+                "delivered": error is None,
+                "error": error,
+                "attempted_at": now,
+            }
+            for row, error in outcomes
+        ])
+        await mark_delivered(session, {row.alert_id for row, error in outcomes if error is None})
+    await session.commit()
+
+
+async def _attempt(row: AlertOutbox) -> Optional[str]:
+    try:
+        ok = await asyncio.wait_for(
+            alerting.deliver(row.channel, row.recipient, row.urgency_level, row.message),
+            alerting.channel_deadline(row.channel),
+        )
+    except asyncio.TimeoutError:
+        return f"{row.channel} delivery timed out"
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+    return None if ok else f"{row.channel} delivery failed"
+
+
+async def drain_once(sessionmaker: async_sessionmaker, batch_size: Optional[int] = None) -> int:
+    """
+    Claim one batch, deliver every row concurrently and record the outcomes.
+    Returns the number of rows processed (0 when nothing was due).
+    """
+    async with sessionmaker() as session:
+        rows = await claim_batch(session, batch_size or settings.OUTBOX_BATCH_SIZE)
+    if not rows:
+        return 0
+
+    errors = await asyncio.gather(*(_attempt(row) for row in rows))
+
+    async with sessionmaker() as session:
+        await record_outcomes(session, list(zip(rows, errors)))
+    return len(rows)
@@ -0,0 +1,309 @@
+"""
+Buffered audit persistence.
+
+Request handlers call the record_* helpers, which only append a row to an
+in-memory buffer. A background task inserts the buffer in one transaction
+(one executemany per table) once PERSIST_BATCH_SIZE rows are waiting or
+PERSIST_FLUSH_SECONDS have passed, so /patient_alert never waits on a commit.
+"""
+import asyncio
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Collection, Deque, Dict, List, Optional, Tuple, Type
+
+from sqlalchemy import and_, func, insert, select, update
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.metrics import observe_stage
+from app.database import Base, get_sessionmaker
+from app.models.alert import AlertTag, DeliveryAttempt, PatientAlert
+from app.models.transcript import Transcript, TriageResult
+
+
+def _utcnow() -> datetime:
+    # naive UTC, like the outbox timestamps
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def new_id() -> str:
+    return str(uuid.uuid4())
+
+
+def fit(column: Any, value: Optional[str]) -> Optional[str]:
+    """Cut `value` to the length of a String `column` (e.g. PatientAlert.user_id) so the insert cannot fail on it."""
+    length = getattr(column.type, "length", None)
+    if value is None or length is None or len(value) <= length:
+        return value
+    return value[:length]
+
+
+async def mark_delivered(session: AsyncSession, alert_ids: Collection[str]) -> None:
+    """
+    Set patient_alerts.delivered_at from the first successful delivery attempt.
+    Alert rows are buffered while the outbox worker commits attempts on its own,
+    so both writers call this after inserting and whichever commits second
+    fills the column in.
+    """
+    if not alert_ids:
+        return
+    first_delivery = (
+        select(func.min(DeliveryAttempt.attempted_at))
+        .where(and_(DeliveryAttempt.alert_id == PatientAlert.id, DeliveryAttempt.delivered.is_(True)))
+        .scalar_subquery()
+    )
+    await session.execute(
+        update(PatientAlert)
+        .where(PatientAlert.id.in_(list(alert_ids)), PatientAlert.delivered_at.is_(None))
+        .values(delivered_at=first_delivery)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def _mark_buffered_alerts_delivered(session: AsyncSession, by_model: Dict[Type[Base], List[Dict[str, Any]]]) -> None:
+    alert_ids = {row["id"] for row in by_model.get(PatientAlert, ())}
+    alert_ids.update(row["alert_id"] for row in by_model.get(DeliveryAttempt, ()) if row["delivered"])
+    await mark_delivered(session, alert_ids)
+
+
+class BufferedWriter:
+    """
+    Collects rows in memory and inserts them in batches. A failed batch is
+    retried row by row: rows the database rejects are dropped (and counted as
+    `rejected`), and once the database itself fails the remaining rows are kept
+    for the next flush. Beyond `max_buffer` rows the oldest are dropped (and
+    counted) so an unreachable database cannot exhaust memory.
+    `after_insert(session, rows_by_model)` runs in the same transaction.
+    """
+
+    def __init__(
+        self,
+        sessionmaker: Optional[async_sessionmaker] = None,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_buffer: Optional[int] = None,
+        after_insert: Optional[Callable[[AsyncSession, Dict[Type[Base], List[Dict[str, Any]]]], Awaitable[None]]] = None,
+    ):
+        self._sessionmaker = sessionmaker
+        self._after_insert = after_insert
+        self.batch_size = batch_size or settings.PERSIST_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.PERSIST_FLUSH_SECONDS
+        self.max_buffer = max_buffer or settings.PERSIST_MAX_BUFFER
+        self._rows: Deque[Tuple[Type[Base], Dict[str, Any]]] = deque()
+        self._full = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    def add(self, model: Type[Base], **values: Any) -> Dict[str, Any]:
+        """
+        Queue one row. Never blocks and never touches the database. Returns the
+        queued values: changes to them until the row is flushed are inserted too.
+        """
+        self._rows.append((model, values))
+        while len(self._rows) > self.max_buffer:
+            self._rows.popleft()
+            self.dropped += 1
+        if len(self._rows) >= self.batch_size:
+            self._full.set()
+        if self._task is None or self._task.done():
+            # outside the app lifespan (scripts, tests): start flushing on first use
+            try:
+                self.start()
+            except RuntimeError:
+                pass  # no running loop; rows wait for an explicit flush()
+        return values
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            # asyncio primitives bind to the loop they are first used on; recreate them for this loop
+            self._full = asyncio.Event()
+            self._lock = asyncio.Lock()
+            if len(self._rows) >= self.batch_size:
+                self._full.set()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            await self.flush()
+
+    async def flush(self) -> int:
+        """Insert everything buffered so far. Returns the number of rows written."""
+        async with self._lock:
+            if not self._rows:
+                return 0
+            rows = list(self._rows)
+            self._rows.clear()
+            # one executemany per table, in first-seen order (parents are recorded before children)
+            by_model: Dict[Type[Base], List[Dict[str, Any]]] = {}
+            for model, values in rows:
+                by_model.setdefault(model, []).append(values)
+            started = time.perf_counter()
+            try:
+                await self._insert(by_model)
+            except Exception:
+                self.failed_flushes += 1
+                logger.exception("audit flush of %d rows failed; retrying them one at a time", len(rows))
+                written = await self._insert_each(rows)
+                self.written += written
+                return written
+            observe_stage("audit_flush", time.perf_counter() - started)
+            self.flushes += 1
+            self.written += len(rows)
+            return len(rows)
+
+    async def _insert(self, by_model: Dict[Type[Base], List[Dict[str, Any]]]) -> None:
+        async with (self._sessionmaker or get_sessionmaker())() as session:
+            for model, batch in by_model.items():
+                await session.execute(insert(model), batch)
+            if self._after_insert is not None:
+                await self._after_insert(session, by_model)
+            await session.commit()
+
+    async def _insert_each(self, rows: List[Tuple[Type[Base], Dict[str, Any]]]) -> int:
+        """
+        Insert a failed batch one row per transaction. A constraint or data
+        error condemns only its row; any other error means the database is
+        unreachable, so that row and the ones after it go back in the buffer.
+        """
+        written = 0
+        for position, (model, values) in enumerate(rows):
+            try:
+                await self._insert({model: [values]})
+            except (DataError, IntegrityError):
+                self.rejected += 1
+                logger.exception("dropping a %s row the database rejected", model.__tablename__)
+            except Exception:
+                self._rows.extendleft(reversed(rows[position:]))
+                while len(self._rows) > self.max_buffer:
+                    self._rows.popleft()
+                    self.dropped += 1
+                break
+            else:
+                written += 1
+        return written
+
+    async def close(self) -> None:
+        """Stop the background task and write whatever is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "buffered": len(self._rows),
+            "written": self.written,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+        }
+
+
+audit_writer = BufferedWriter(after_insert=_mark_buffered_alerts_delivered)
+
+
+def record_transcript(transcript_id: str, user_id: Optional[str], text: str, stats: Optional[Dict[str, Any]] = None) -> None:
+    if not settings.PERSIST_ENABLED:
+        return
+    stats = stats or {}
+    audit_writer.add(
+        Transcript,
+        id=transcript_id,
+        user_id=fit(Transcript.user_id, user_id),
+        text=text,
+        audio_seconds=stats.get("audio_seconds"),
+        speech_seconds=stats.get("speech_seconds"),
+        backend=fit(Transcript.backend, stats.get("backend")),
+        created_at=_utcnow(),
+    )
+
+
+def record_triage(
+    triage_id: str, transcript_id: Optional[str], user_id: Optional[str], profile: Dict[str, Any], source: str
+) -> None:
+    if not settings.PERSIST_ENABLED:
+        return
+    audit_writer.add(
+        TriageResult,
+        id=triage_id,
+        transcript_id=transcript_id,
+        user_id=fit(TriageResult.user_id, user_id),
+        urgency_level=str(profile.get("urgency", "MEDIUM")).upper(),
+        tags=list(profile.get("tags", [])),
+        reason=profile.get("reason", ""),
+        source=source,
+        confidence=profile.get("confidence"),
+        created_at=_utcnow(),
+    )
+
+
+def record_alert(
+    alert_id: str,
+    user_id: Optional[str],
+    urgency_level: str,
+    message: str,
+    delivery_mode: str,
+    recipients: Dict[str, List[str]],
+    transcript_id: Optional[str] = None,
+    triage_id: Optional[str] = None,
+    tags: Optional[List[str]] = None,
+) -> None:
+    if not settings.PERSIST_ENABLED:
+        return
+    now = _utcnow()
+    tags = sorted({fit(AlertTag.tag, tag) for tag in tags or []})
+    audit_writer.add(
+        PatientAlert,
+        id=alert_id,
+        user_id=fit(PatientAlert.user_id, user_id),
+        transcript_id=transcript_id,
+        triage_id=triage_id,
+        # stored in upper case: the history API filters on urgency_level.upper()
+        urgency_level=urgency_level.upper(),
+        message=message,
+        delivery_mode=delivery_mode,
+        recipients=recipients,
+        tags=tags,
+        created_at=now,
+        delivered_at=None,
+    )
+    for tag in tags:
+        audit_writer.add(AlertTag, alert_id=alert_id, tag=tag, created_at=now)
+
+
+def record_delivery_attempts(alert_id: str, results: Dict[str, Dict[str, bool]], attempt: int = 1) -> None:
+    """Record in-process fan-out results ({channel: {recipient: delivered}}); the outbox worker records its own."""
+    if not settings.PERSIST_ENABLED:
+        return
+    now = _utcnow()
+    for channel, outcomes in results.items():
+        for recipient, delivered in outcomes.items():
+            audit_writer.add(
+                DeliveryAttempt,
+                alert_id=alert_id,
+                channel=channel,
+                recipient=fit(DeliveryAttempt.recipient, recipient),
+                attempt=attempt,
+                delivered=delivered,
+                error=None if delivered else f"{channel} delivery failed",
+                attempted_at=now,
+            )
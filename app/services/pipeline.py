@@ -0,0 +1,128 @@
+"""
+Incremental pipeline for long recordings.
+
+The recording is split into silence-aligned chunks that are transcribed
+concurrently. Every chunk that comes back is red-flag checked together with
+its neighbours, so a HIGH alert fires as soon as the chunk holding the red
+flag is transcribed instead of after the whole file. The full transcript is
+assembled (and profiled by the caller) afterwards.
+"""
+import asyncio
+import os
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.transcription import transcribe_audio_with_stats
+from app.services.triage_rules import pretriage
+
+# on_red_flag(rules, partial_transcript)
+RedFlagHandler = Callable[[Dict[str, Any], str], Awaitable[Any]]
+
+
+def plan_chunk_cuts(speech: List[Tuple[int, int]], total_ms: int, target_ms: int) -> List[int]:
+    """
+    Choose cut points (ms) for chunks of about `target_ms`. Cuts go in the
+    middle of the silence between speech ranges, at the last silence before a
+    chunk would outgrow the target. Stretches with no usable silence are hard
+    split at 2 * target_ms so no chunk grows unbounded.
+    Returns [0, ..., total_ms].
+    """
+    mids = [(end + start) // 2 for (_, end), (start, _) in zip(speech, speech[1:])]
+    cuts = [0]
+    previous = None
+    for mid in mids + [total_ms]:
+        if mid - cuts[-1] > target_ms and previous is not None and previous > cuts[-1]:
+            cuts.append(previous)
+        while mid - cuts[-1] > 2 * target_ms:
+            cuts.append(cuts[-1] + target_ms)
+        previous = mid
+    cuts.append(total_ms)
+    return cuts
+
+
+def split_speech_chunks(audio_path: str, out_dir: str, target_seconds: Optional[float] = None) -> List[str]:
+    """
+    Decode and preprocess (16 kHz mono) the recording, cut it at silences and
+    write each chunk as WAV into `out_dir`. Returns chunk paths in order.
+    """
+    # pydub / numpy are loaded on the first pipeline request, not at import
+    from pydub.silence import detect_nonsilent
+
+    from app.utils.audio import load_audio, preprocess_audio, save_audio
+
+    audio = preprocess_audio(load_audio(audio_path))
+    if len(audio) == 0:
+        return []
+    target_ms = int((target_seconds or settings.PIPELINE_CHUNK_SECONDS) * 1000)
+    speech = detect_nonsilent(
+        audio,
+        min_silence_len=settings.PIPELINE_MIN_SILENCE_MS,
+        silence_thresh=audio.dBFS + settings.PIPELINE_SILENCE_OFFSET_DB,
+        seek_step=10,
+    )
+    cuts = plan_chunk_cuts(speech, len(audio), target_ms)
+    paths = []
+    for i, (start, end) in enumerate(zip(cuts, cuts[1:])):
+        path = os.path.join(out_dir, f"chunk_{i:04d}.wav")
+        save_audio(audio[start:end], path)
+        paths.append(path)
+    return paths
+
+
+async def run_pipeline(
+    audio_path: str,
+    on_red_flag: Optional[RedFlagHandler] = None,
+    max_concurrency: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Transcribe a long recording chunk by chunk. `on_red_flag` is awaited at
+    most once, as soon as a partial transcript scores HIGH with at least
+    PRETRIAGE_DISPATCH_CONFIDENCE.
+    Returns {"transcribed_text", "chunks", "red_flag" (rules or None), "seconds_to_alert" (or None),
+    "audio_seconds_removed" (VAD total over the chunks, or None)}.
+    """
+    started = time.perf_counter()
+    sem = asyncio.Semaphore(max_concurrency or settings.PIPELINE_MAX_CONCURRENCY)
+
+    async def _transcribe(i: int, path: str) -> Tuple[int, Dict[str, Any]]:
+        async with sem:
+            return i, await transcribe_audio_with_stats(path)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        chunks = await asyncio.to_thread(split_speech_chunks, audio_path, workdir)
+        # created in order, so the semaphore hands earlier chunks out first
+        tasks = [asyncio.create_task(_transcribe(i, path)) for i, path in enumerate(chunks)]
+        texts: Dict[int, str] = {}
+        removed = []
+        red_flag = None
+        seconds_to_alert = None
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                i, transcription = await next_done
+                texts[i] = transcription["text"]
+                if transcription["seconds_removed"] is not None:
+                    removed.append(transcription["seconds_removed"])
+                if red_flag is not None:
+                    continue
+                # include the neighbours so a phrase cut across a chunk boundary still matches
+                window = " ".join(texts[j] for j in (i - 1, i, i + 1) if j in texts)
+                rules = pretriage(window)
+                if rules["urgency"] == "HIGH" and rules["confidence"] >= settings.PRETRIAGE_DISPATCH_CONFIDENCE:
+                    red_flag = rules
+                    seconds_to_alert = time.perf_counter() - started
+                    if on_red_flag is not None:
+                        partial = " ".join(texts[j] for j in sorted(texts))
+                        await on_red_flag(rules, partial)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return {
+        "transcribed_text": " ".join(texts[i] for i in range(len(chunks)) if texts[i]),
+        "chunks": len(chunks),
+        "red_flag": red_flag,
+        "seconds_to_alert": seconds_to_alert,
+        "audio_seconds_removed": round(sum(removed), 3) if removed else None,
+    }
@@ -1,9 +1,18 @@
-from typing import Dict, Any
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, List, Optional, Tuple, Union
+import asyncio
+import copy
+import hashlib
 import json
-from openai import AsyncOpenAI
+import re
+import sys
 from app.core import config
+from app.core.metrics import timed
+from app.services.cache import AsyncTTLCache, DiskCacheStore
+from app.services.clients import openai_client
+from app.services.resilience import ProviderUnavailable, guarded
+from app.services.triage_rules import pretriage
 
-client = AsyncOpenAI(api_key=config.settings.API_KEY)
+PROFILE_MODEL = "gpt-4o-mini"
 
 SYSTEM_PROMPT = (
     "You are a highly experienced clinical triage assistant. "
@@ -14,27 +23,72 @@ SYSTEM_PROMPT = (
     "Do not provide any text outside the JSON object."
 )
 
-async def profile_text(transcribed_text: str) -> Dict[str, Any]:
+# part of every cache key: editing SYSTEM_PROMPT makes old entries unreachable
+PROMPT_VERSION = hashlib.sha256(SYSTEM_PROMPT.encode()).hexdigest()[:12]
+
+# temperature=0.0 makes the triage deterministic, so identical transcripts are memoized
+profile_cache = AsyncTTLCache(
+    maxsize=config.settings.PROFILE_CACHE_SIZE,
+    ttl=config.settings.PROFILE_CACHE_TTL_SECONDS,
+    store=DiskCacheStore(config.settings.PROFILE_CACHE_DIR) if config.settings.PROFILE_CACHE_DIR else None,
+)
+
+
+URGENCY_LEVELS = ("HIGH", "MEDIUM", "LOW")
+
+
+class _UnparsedProfile(Exception):
+    """Raised through the cache so a non-JSON or malformed LLM reply is never memoized."""
+
+    def __init__(self, fallback: Dict[str, Any]):
+        super().__init__("LLM returned a non-JSON profile")
+        self.fallback = fallback
+
+
+def normalize_transcript(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().casefold()
+
+
+def profile_cache_key(transcribed_text: str, model: str = PROFILE_MODEL) -> str:
+    digest = hashlib.sha256(normalize_transcript(transcribed_text).encode()).hexdigest()
+    return f"{model}:{PROMPT_VERSION}:{digest}"
+
+
+async def invalidate_profile_cache() -> None:
     """
-    Send the transcript to GPT-4-mini for dynamic urgency classification.
-    Returns a dict with:
-        { "urgency": "HIGH|MEDIUM|LOW", "tags": [...], "reason": "short explanation" }
+    Drop every memoized triage result (both tiers). Use after changing the
+    prompt at runtime or when cached answers must not be reused.
     """
+    await profile_cache.clear()
+
+
+def _valid_profile(result: Any) -> bool:
+    """A reply the callers can use: a dict with a known urgency, a list of tags and a reason."""
+    return (
+        isinstance(result, dict)
+        and str(result.get("urgency", "")).upper() in URGENCY_LEVELS
+        and isinstance(result.get("tags"), list)
+        and isinstance(result.get("reason"), str)
+    )
+
+
+@timed("llm")
+async def _profile_upstream(transcribed_text: str) -> Dict[str, Any]:
     user_prompt = (
         f"Patient transcript:\n\"\"\"\n{transcribed_text}\n\"\"\"\n\n"
         "Analyze the patient's condition and return only a single JSON object "
         "with 'urgency', 'tags', and 'reason'."
     )
 
-    resp = await client.chat.completions.create(
-        model="gpt-4o-mini",
+    resp = await guarded("openai_chat", lambda: openai_client().chat.completions.create(
+        model=PROFILE_MODEL,
         messages=[
             {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": user_prompt},
         ],
         temperature=0.0,
         max_tokens=250
-    )
+    ))
 
     content = resp.choices[0].message.content.strip()
 
@@ -42,13 +96,181 @@ async def profile_text(transcribed_text: str) -> Dict[str, Any]:
         result = json.loads(content)
     except Exception:
         # Fallback if GPT responds incorrectly
-        result = {
+        raise _UnparsedProfile({
             "urgency": "MEDIUM",
             "tags": [],
             "reason": content  # return raw content for debugging
-        }
+        })
+    if not _valid_profile(result):
+        # valid JSON of the wrong shape (a string, a list, missing keys): triage with the local rules
+        raise _UnparsedProfile(_rules_profile(transcribed_text, ValueError(f"malformed LLM profile: {content[:200]}")))
+
+    return {**result, "urgency": result["urgency"].upper()}
+
 
-    return result
+def _llm_unavailable(error: Exception) -> bool:
+    """Failures the local rules answer for: fail-fast / shed / timed-out calls and any OpenAI API error."""
+    if isinstance(error, (ProviderUnavailable, asyncio.TimeoutError)):
+        return True
+    # an OpenAI error means the SDK is loaded; no need to import it here (app/services/clients.py)
+    openai = sys.modules.get("openai")
+    return openai is not None and isinstance(error, openai.APIError)
+
+
+def _rules_profile(transcribed_text: str, error: Exception) -> Dict[str, Any]:
+    rules = pretriage(transcribed_text)
+    return {
+        "urgency": rules["urgency"] if rules["urgency"] == "HIGH" else "MEDIUM",
+        "tags": rules["tags"],
+        "reason": f"LLM triage unavailable; {rules['reason']}",
+        "error": f"{type(error).__name__}: {error}",
+    }
+
+
+@timed("triage")
+async def profile_text(transcribed_text: str) -> Dict[str, Any]:
+    """
+    Send the transcript to GPT-4-mini for dynamic urgency classification.
+    Results are memoized on (model, prompt version, normalized transcript) and
+    a burst of identical transcripts makes a single upstream call. While the
+    LLM is unavailable (open circuit, shed or timed out, see
+    app/services/resilience.py, or any OpenAI API error: connection, rate
+    limit, authentication) the local red-flag rules answer instead, with an
+    extra "error" key, and nothing is cached.
+    Returns a dict with:
+        { "urgency": "HIGH|MEDIUM|LOW", "tags": [...], "reason": "short explanation" }
+    """
+    try:
+        result = await profile_cache.get_or_compute(
+            profile_cache_key(transcribed_text),
+            lambda: _profile_upstream(transcribed_text),
+        )
+    except _UnparsedProfile as e:
+        return e.fallback
+    except Exception as e:
+        if not _llm_unavailable(e):
+            raise
+        # LLM browned out: triage with the local red-flag rules, never below MEDIUM so a doctor still looks
+        return _rules_profile(transcribed_text, e)
+    # callers may mutate the result; keep the cached copy intact
+    return copy.deepcopy(result)
+
+
+BATCH_SYSTEM_PROMPT = (
+    "You are a highly experienced clinical triage assistant. "
+    "You will receive several patient transcripts or voice notes, each with a numeric id, and must determine the urgency of each patient's condition independently. "
+    "Classify urgency as one of: HIGH, MEDIUM, or LOW. "
+    "Also identify relevant symptom tags (like 'chest_pain', 'shortness_of_breath', 'fever', 'fall', etc.) and provide a concise reason for each assessment. "
+    "Respond strictly as a single JSON object {\"results\": [...]} holding one object per transcript with keys: 'id', 'urgency', 'tags' (array), and 'reason'. "
+    "Do not provide any text outside the JSON object."
+)
+
+
+async def _profile_pack(pack: List[Tuple[int, str]]) -> List[Tuple[int, Dict[str, Any]]]:
+    """
+    Triage several transcripts with one chat completion. Items the model
+    drops or mangles are re-triaged one by one through profile_text; if the
+    packed call itself fails every item gets the same local rules fallback as
+    profile_text.
+    """
+    user_prompt = (
+        "Patient transcripts as a JSON array of {id, transcript}:\n"
+        f"{json.dumps([{'id': i, 'transcript': t} for i, t in pack])}\n\n"
+        "Return only a single JSON object {\"results\": [...]} with one "
+        "{'id', 'urgency', 'tags', 'reason'} object per transcript."
+    )
+    try:
+        resp = await guarded("openai_chat", lambda: openai_client().chat.completions.create(
+            model=PROFILE_MODEL,
+            messages=[
+                {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt},
+            ],
+            temperature=0.0,
+            max_tokens=config.settings.PROFILE_BATCH_MAX_TOKENS_PER_ITEM * len(pack),
+            response_format={"type": "json_object"},
+        ))
+    except Exception as e:
+        return [(i, _rules_profile(text, e)) for i, text in pack]
+
+    try:
+        parsed = {int(r["id"]): r for r in json.loads(resp.choices[0].message.content)["results"]}
+    except Exception:
+        parsed = {}
+
+    results, missing = [], []
+    for i, text in pack:
+        item = parsed.get(i)
+        if _valid_profile(item):
+            results.append((i, {"urgency": item["urgency"].upper(), "tags": item["tags"], "reason": item["reason"]}))
+        else:
+            missing.append((i, text))
+    if missing:
+        singles = await asyncio.gather(*(profile_text(text) for _, text in missing))
+        results.extend((i, r) for (i, _), r in zip(missing, singles))
+    return results
+
+
+async def profile_texts_batch(
+    transcripts: Union[Iterable[str], AsyncIterable[str]],
+    pack_size: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
+) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Triage many transcripts, `pack_size` per chat completion, with at most
+    `max_concurrency` completions in flight. Accepts a list or an async
+    iterable (e.g. JSONL lines as they arrive) and yields (input index, profile)
+    pairs as packs finish, so results are not in input order. Input is read
+    only as fast as capacity frees up.
+    """
+    pack_size = pack_size or config.settings.PROFILE_BATCH_PACK_SIZE
+    sem = asyncio.Semaphore(max_concurrency or config.settings.PROFILE_BATCH_CONCURRENCY)
+    done = asyncio.Queue()
+    finished = object()
+
+    async def _aiter():
+        if hasattr(transcripts, "__aiter__"):
+            async for text in transcripts:
+                yield text
+        else:
+            for text in transcripts:
+                yield text
+
+    async def _run(pack):
+        try:
+            for item in await _profile_pack(pack):
+                done.put_nowait(item)
+        finally:
+            sem.release()
+
+    async def _produce():
+        tasks = []
+        try:
+            pack = []
+            index = 0
+            async for text in _aiter():
+                pack.append((index, text))
+                index += 1
+                if len(pack) == pack_size:
+                    await sem.acquire()
+                    tasks.append(asyncio.create_task(_run(pack)))
+                    pack = []
+            if pack:
+                await sem.acquire()
+                tasks.append(asyncio.create_task(_run(pack)))
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            done.put_nowait(finished)
+
+    producer = asyncio.create_task(_produce())
+    try:
+        while (item := await done.get()) is not finished:
+            yield item
+        await producer  # surface input errors
+    finally:
+        producer.cancel()
 
 
 
@@ -108,13 +330,12 @@ async def profile_text(transcribed_text: str) -> Dict[str, Any]:
 #         result = {"urgency": "MEDIUM", "tags": [], "reason": content}
 #     return result
 
-def analyze_text(transcribed_text: str) -> dict:
-    urgency_keywords = ["urgent", "emergency", "critical", "immediate", "asap"]
-    urgency_score = 0
+URGENCY_KEYWORDS = ("urgent", "emergency", "critical", "immediate", "asap")
+# one pass over the lowercased text instead of one lower() + scan per keyword
+_URGENCY_KEYWORDS_RE = re.compile("|".join(URGENCY_KEYWORDS))
 
-    for keyword in urgency_keywords:
-        if keyword in transcribed_text.lower():
-            urgency_score += 1
+def analyze_text(transcribed_text: str) -> dict:
+    urgency_score = len(set(_URGENCY_KEYWORDS_RE.findall(transcribed_text.lower())))
 
     urgency_level = "low"
     if urgency_score > 2:
@@ -126,4 +347,4 @@ def analyze_text(transcribed_text: str) -> dict:
         "transcribed_text": transcribed_text,
         "urgency_level": urgency_level,
         "urgency_score": urgency_score
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,324 @@
+"""
+Admission control around upstream providers (OpenAI, SMTP, Twilio, webhooks).
+
+Every outbound call goes through a Provider:
+
+- a circuit breaker: after CIRCUIT_FAILURE_THRESHOLD consecutive failures the
+  provider is skipped for CIRCUIT_RESET_SECONDS (CircuitOpen is raised at
+  once, so callers take their local fallback), then a single probe call
+  decides whether it closes again;
+- an adaptive concurrency limit (AIMD): each call completing in time adds
+  1/limit, while a failure, a timeout or a latency above
+  PROVIDER_LATENCY_TOLERANCE times the long-run average cuts the limit by
+  PROVIDER_BACKOFF_RATIO, at most once per round trip;
+- a bounded FIFO of calls waiting for a slot: a call that finds
+  PROVIDER_MAX_QUEUE calls already waiting, or waits longer than
+  PROVIDER_QUEUE_TIMEOUT_SECONDS, is shed with Overloaded;
+- an optional per-call timeout (ProviderTimeout).
+
+All of them are ProviderUnavailable, which carries a Retry-After hint.
+Limiters and breakers are per process and only touched from the event loop.
+"""
+import asyncio
+import math
+import re
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+from app.core.config import settings
+from app.core.logger import logger
+
+T = TypeVar("T")
+
+
+class ProviderUnavailable(RuntimeError):
+    """The call was not made (or was abandoned); retry after `retry_after` seconds."""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpen(ProviderUnavailable):
+    pass
+
+
+class Overloaded(ProviderUnavailable):
+    pass
+
+
+class ProviderTimeout(ProviderUnavailable):
+    pass
+
+
+def retry_after_header(error: ProviderUnavailable) -> Dict[str, str]:
+    return {"Retry-After": str(max(1, math.ceil(error.retry_after)))}
+
+
+class ConcurrencyLimiter:
+    """
+    At most `limit` holders at once; up to `max_queue` more wait in FIFO order
+    for at most `queue_timeout` seconds. acquire() raises Overloaded instead of
+    queueing beyond that. Pair every acquire() with one release().
+    """
+
+    def __init__(self, name: str, limit: float, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.inflight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.rejected = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _retry_after(self) -> float:
+        return self.queue_timeout
+
+    async def acquire(self) -> None:
+        if self.inflight < self.limit and not self._waiters:
+            self.inflight += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded(f"{self.name}: {len(self._waiters)} calls already waiting", self._retry_after())
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise Overloaded(f"{self.name}: no slot within {self.queue_timeout:g} s", self._retry_after()) from None
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # the slot was handed over just as the caller went away
+                self.release()
+            raise
+        finally:
+            if not waiter.done():
+                waiter.cancel()
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+
+    def release(self) -> None:
+        self.inflight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.inflight < self.limit:
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self.inflight += 1
+            waiter.set_result(None)
+
+    def stats(self) -> Dict[str, float]:
+        return {"limit": self.limit, "inflight": self.inflight, "queued": self.queued, "rejected": self.rejected}
+
+
+class AdaptiveLimiter(ConcurrencyLimiter):
+    """ConcurrencyLimiter whose limit follows the provider's latency (see module docstring)."""
+
+    def __init__(
+        self,
+        name: str,
+        initial: float,
+        min_limit: float,
+        max_limit: float,
+        max_queue: int,
+        queue_timeout: float,
+        tolerance: float = 2.0,
+        backoff: float = 0.9,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        super().__init__(name, initial, max_queue, queue_timeout)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.clock = clock
+        # long-run and recent latency averages (seconds)
+        self.baseline: Optional[float] = None
+        self.recent: Optional[float] = None
+        self._last_decrease = float("-inf")
+
+    def _retry_after(self) -> float:
+        if self.recent is None:
+            return self.queue_timeout
+        # time for the calls ahead to drain at the current limit
+        return self.recent * (len(self._waiters) + 1) / max(self.limit, 1)
+
+    def record(self, latency: Optional[float], ok: bool) -> None:
+        """Adjust the limit for one finished call (`latency` None: cancelled, no signal)."""
+        if latency is None:
+            return
+        if ok:
+            self.baseline = latency if self.baseline is None else 0.95 * self.baseline + 0.05 * latency
+            self.recent = latency if self.recent is None else 0.7 * self.recent + 0.3 * latency
+        congested = not ok or (self.baseline is not None and self.recent > self.tolerance * self.baseline)
+        now = self.clock()
+        if congested:
+            # one cut per round trip, not one per call that was already in flight
+            if now - self._last_decrease >= (self.recent or latency):
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._last_decrease = now
+        else:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+        self._wake()
+
+    def stats(self) -> Dict[str, float]:
+        return {**super().stats(), "latency_seconds": self.recent or 0.0, "baseline_seconds": self.baseline or 0.0}
+
+
+class CircuitBreaker:
+    """closed -> (failure_threshold consecutive failures) -> open -> (reset_after) -> half_open -> one probe."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_after: float, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self.opens = 0
+        self.short_circuited = 0
+
+    def before_call(self) -> None:
+        """Raise CircuitOpen unless a call may go out now; in half-open only one probe at a time."""
+        if self.state == self.OPEN:
+            remaining = self.opened_at + self.reset_after - self.clock()
+            if remaining > 0:
+                self.short_circuited += 1
+                raise CircuitOpen(f"{self.name}: circuit open", remaining)
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                self.short_circuited += 1
+                raise CircuitOpen(f"{self.name}: waiting for a probe call", 1.0)
+            self._probing = True
+
+    def record(self, ok: Optional[bool]) -> None:
+        """Outcome of a call let through by before_call(); None when it was cancelled or never made."""
+        probing, self._probing = self._probing, False
+        if ok is None:
+            return
+        if ok:
+            self.failures = 0
+            if probing or self.state != self.CLOSED:
+                logger.info("provider %s recovered, closing its circuit", self.name)
+            self.state = self.CLOSED
+            return
+        self.failures += 1
+        if probing or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning("provider %s failed %d times, opening its circuit for %.0f s",
+                               self.name, self.failures, self.reset_after)
+                self.opens += 1
+            self.state = self.OPEN
+            self.opened_at = self.clock()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "circuit_open": {self.CLOSED: 0, self.HALF_OPEN: 1, self.OPEN: 2}[self.state],
+            "consecutive_failures": self.failures,
+            "circuit_opens": self.opens,
+            "short_circuited": self.short_circuited,
+        }
+
+
+class Provider:
+    """One upstream dependency: breaker + adaptive limiter + optional timeout."""
+
+    def __init__(self, name: str, timeout: Optional[float] = None, limiter: Optional[AdaptiveLimiter] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.name = name
+        self.timeout = timeout
+        self.limiter = limiter or AdaptiveLimiter(
+            name,
+            initial=settings.PROVIDER_INITIAL_CONCURRENCY,
+            min_limit=settings.PROVIDER_MIN_CONCURRENCY,
+            max_limit=settings.PROVIDER_MAX_CONCURRENCY,
+            max_queue=settings.PROVIDER_MAX_QUEUE,
+            queue_timeout=settings.PROVIDER_QUEUE_TIMEOUT_SECONDS,
+            tolerance=settings.PROVIDER_LATENCY_TOLERANCE,
+            backoff=settings.PROVIDER_BACKOFF_RATIO,
+        )
+        self.breaker = breaker or CircuitBreaker(name, settings.CIRCUIT_FAILURE_THRESHOLD, settings.CIRCUIT_RESET_SECONDS)
+
+    async def call(self, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run `func()` under the breaker and limiter. Any exception counts as a
+        failure of the provider; cancellation (e.g. a lost fallback race) does not.
+        """
+        self.breaker.before_call()
+        try:
+            await self.limiter.acquire()
+        except BaseException:
+            self.breaker.record(None)
+            raise
+        started = time.perf_counter()
+        ok: Optional[bool] = False
+        try:
+            try:
+                result = await (asyncio.wait_for(func(), self.timeout) if self.timeout else func())
+            except asyncio.TimeoutError:
+                raise ProviderTimeout(f"{self.name}: no answer within {self.timeout:g} s", self.timeout) from None
+            ok = True
+            return result
+        except asyncio.CancelledError:
+            ok = None
+            raise
+        finally:
+            self.limiter.record(None if ok is None else time.perf_counter() - started, bool(ok))
+            self.limiter.release()
+            self.breaker.record(ok)
+
+    def stats(self) -> Dict[str, float]:
+        return {**self.limiter.stats(), **self.breaker.stats()}
+
+
+# provider name -> per-call timeout setting (None: the caller enforces its own deadline)
+PROVIDER_TIMEOUTS: Dict[str, Callable[[], Optional[float]]] = {
+    "openai_audio": lambda: settings.OPENAI_TRANSCRIPTION_TIMEOUT_SECONDS,
+    "openai_chat": lambda: settings.OPENAI_TRIAGE_TIMEOUT_SECONDS,
+}
+_providers: Dict[str, Provider] = {}
+
+
+def get_provider(name: str) -> Provider:
+    """Providers are created on first use and kept for the process (webhooks: one per host)."""
+    provider = _providers.get(name)
+    if provider is None:
+        timeout = PROVIDER_TIMEOUTS.get(name.split(":", 1)[0], lambda: None)()
+        provider = _providers[name] = Provider(name, timeout)
+    return provider
+
+
+async def guarded(name: str, func: Callable[[], Awaitable[T]]) -> T:
+    if not settings.PROVIDER_GUARD_ENABLED:
+        return await func()
+    return await get_provider(name).call(func)
+
+
+def reset_providers() -> None:
+    """Forget every limiter and breaker (tests, or after changing the PROVIDER_* settings)."""
+    _providers.clear()
+
+
+def stats() -> Dict[str, Any]:
+    """Flat {provider_stat: value} for the /metrics collector."""
+    return {
+        f"{re.sub(r'[^a-zA-Z0-9_]', '_', name)}_{key}": value
+        for name, provider in sorted(_providers.items())
+        for key, value in provider.stats().items()
+    }
@@ -0,0 +1,371 @@
+"""
+Recipient routing: who is paged for a patient's alert right now.
+
+The patient -> care team -> member mappings and the on-call rotations
+(app/models/routing.py) are held in an immutable RoutingIndex. A lookup is
+one probe of a hash table plus a scan of the team's few members and
+shifts, with no database round trip. RecipientRouter refreshes the index
+every ROUTING_REFRESH_SECONDS from the rows whose updated_at moved: the
+rows are diffed against the index and applied to a copy in a worker thread,
+and the new index is swapped in with a single assignment on the event loop,
+so requests never wait for a refresh and never see a half-applied one.
+
+Patients are the large dimension (a million is expected), so they are not
+Python objects: the hash table is two flat arrays, the 64-bit blake2b hash
+of each user_id ('q') and the number of its team ('i'), with open
+addressing, linear probing and a load factor of at most 0.7: 12 bytes a
+slot, 17 to 34 a patient, against about 100 for a dict of user_id strings
+(benchmarks/bench_routing.py: 26 MiB for a million). Two user_ids whose
+hashes collide would share a team; at a million patients the odds of any
+collision are about 3e-8.
+
+Recipients are a starting point, not a replacement: a channel the routing
+leaves empty falls back to ALERT_ONCALL_* / ALERT_SERVICE_URL in
+plan_deliveries().
+"""
+import asyncio
+import hashlib
+import time
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Dict, FrozenSet, Hashable, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.database import get_sessionmaker
+from app.models.routing import CareTeamMember, OnCallShift, PatientCareTeam
+from app.services.dedup import URGENCY_RANK
+
+_MAX_LOAD = 0.7
+# rows committed just after a refresh can carry an updated_at older than the watermark;
+# re-reading this much history picks them up (applying a row twice changes nothing)
+_OVERLAP = timedelta(seconds=5)
+
+
+def patient_key(user_id: str) -> int:
+    key = int.from_bytes(hashlib.blake2b(user_id.encode(), digest_size=8).digest(), "little", signed=True)
+    # 0 marks an empty slot
+    return key or 1
+
+
+class Member(NamedTuple):
+    channel: str
+    address: str
+    min_rank: int
+    # empty: every alert
+    tags: FrozenSet[str]
+
+
+class Shift(NamedTuple):
+    # epoch seconds
+    starts: float
+    ends: float
+    channel: str
+    address: str
+
+
+class RoutingDelta(NamedTuple):
+    # (user_id, team_id); team_id None: the patient no longer has a team
+    patients: List[Tuple[str, Optional[str]]]
+    # (member id, team_id, member); member None: removed
+    members: List[Tuple[int, str, Optional[Member]]]
+    # (shift id, team_id or None for the rotation of every patient, shift); shift None: removed
+    shifts: List[Tuple[int, Optional[str], Optional[Shift]]]
+
+
+def _probe(keys: array, key: int) -> int:
+    mask = len(keys) - 1
+    slot = key & mask
+    while True:
+        found = keys[slot]
+        if found == key or found == 0:
+            return slot
+        slot = (slot + 1) & mask
+
+
+def _apply_grouped(groups: Dict, owners: Dict, changes: Iterable[Tuple[int, Hashable, object]]) -> Tuple[Dict, Dict]:
+    """Copy-on-write update of {owner: {item id: item}}; only the owners that change are copied."""
+    groups, owners, copied = dict(groups), dict(owners), set()
+
+    def group(owner):
+        if owner not in copied:
+            groups[owner] = dict(groups.get(owner, {}))
+            copied.add(owner)
+        return groups[owner]
+
+    for item_id, owner, item in changes:
+        if item_id in owners:
+            group(owners.pop(item_id)).pop(item_id, None)
+        if item is not None:
+            group(owner)[item_id] = item
+            owners[item_id] = owner
+    for owner in copied:
+        if not groups[owner]:
+            del groups[owner]
+    return groups, owners
+
+
+class RoutingIndex:
+    """A snapshot of the routing tables. Never modified once built: apply() returns a new index."""
+
+    def __init__(
+        self,
+        keys: Optional[array] = None,
+        teams: Optional[array] = None,
+        used: int = 0,
+        patients: int = 0,
+        team_ids: Tuple[str, ...] = (),
+        members: Optional[Dict[str, Dict[int, Member]]] = None,
+        member_teams: Optional[Dict[int, str]] = None,
+        shifts: Optional[Dict[Optional[str], Dict[int, Shift]]] = None,
+        shift_teams: Optional[Dict[int, Optional[str]]] = None,
+    ):
+        self._keys = keys if keys is not None else array("q", bytes(8 * 8))
+        # team number per slot; -1: no team (a removed patient keeps its slot so probe chains stay intact)
+        self._teams = teams if teams is not None else array("i", [-1]) * len(self._keys)
+        self.used = used
+        self.patients = patients
+        self.team_ids = team_ids
+        self._team_numbers = {team: number for number, team in enumerate(team_ids)}
+        self.members = members or {}
+        self._member_teams = member_teams or {}
+        self.shifts = shifts or {}
+        self._shift_teams = shift_teams or {}
+
+    def team_of(self, user_id: str) -> Optional[str]:
+        key = patient_key(user_id)
+        slot = _probe(self._keys, key)
+        if self._keys[slot] != key:
+            return None
+        number = self._teams[slot]
+        return self.team_ids[number] if number >= 0 else None
+
+    def member(self, member_id: int) -> Optional[Member]:
+        team = self._member_teams.get(member_id)
+        return None if team is None else self.members[team][member_id]
+
+    def shift(self, shift_id: int) -> Optional[Tuple[Optional[str], Shift]]:
+        if shift_id not in self._shift_teams:
+            return None
+        team = self._shift_teams[shift_id]
+        return team, self.shifts[team][shift_id]
+
+    def recipients(
+        self, user_id: Optional[str], urgency_level: str, tags: Iterable[str] = (), now: Optional[float] = None
+    ) -> Dict[str, List[str]]:
+        """
+        {channel: [address, ...]} for an alert of this patient: care team members
+        whose urgency and tags match, plus whoever is on call for the team and
+        for every patient at `now` (epoch seconds).
+        """
+        rank = URGENCY_RANK.get(urgency_level.upper(), 0)
+        tags = {tag.lower() for tag in tags}
+        now = time.time() if now is None else now
+        team = self.team_of(user_id) if user_id else None
+        routed: Dict[str, List[str]] = {}
+
+        def add(channel: str, address: str) -> None:
+            addresses = routed.setdefault(channel, [])
+            if address not in addresses:
+                addresses.append(address)
+
+        if team is not None:
+            for member in self.members.get(team, {}).values():
+                if member.min_rank <= rank and (not member.tags or member.tags & tags):
+                    add(member.channel, member.address)
+        for owner in ((team, None) if team is not None else (None,)):
+            for shift in self.shifts.get(owner, {}).values():
+                if shift.starts <= now < shift.ends:
+                    add(shift.channel, shift.address)
+        return routed
+
+    def _rehashed(self, capacity: int) -> Tuple[array, array]:
+        size = 8
+        while size * _MAX_LOAD < capacity:
+            size *= 2
+        keys, teams = array("q", bytes(8 * size)), array("i", [-1]) * size
+        old_keys, old_teams = self._keys, self._teams
+        for slot in range(len(old_keys)):
+            number = old_teams[slot]
+            if number >= 0:
+                new = _probe(keys, old_keys[slot])
+                keys[new] = old_keys[slot]
+                teams[new] = number
+        return keys, teams
+
+    def apply(self, delta: RoutingDelta) -> "RoutingIndex":
+        """A new index with `delta` applied; this one is left as it was."""
+        team_ids = list(self.team_ids)
+        numbers = dict(self._team_numbers)
+        keys, teams, used, patients = self._keys, self._teams, self.used, self.patients
+        if delta.patients:
+            if used + len(delta.patients) > len(keys) * _MAX_LOAD:
+                # grow, dropping the slots of removed patients
+                keys, teams = self._rehashed(patients + len(delta.patients))
+                used = patients
+            else:
+                keys, teams = array("q", keys), array("i", teams)
+            for user_id, team in delta.patients:
+                key = patient_key(user_id)
+                slot = _probe(keys, key)
+                if keys[slot] == 0:
+                    if team is None:
+                        continue
+                    keys[slot] = key
+                    used += 1
+                had_team = teams[slot] >= 0
+                if team is None:
+                    teams[slot] = -1
+                else:
+                    if team not in numbers:
+                        numbers[team] = len(team_ids)
+                        team_ids.append(team)
+                    teams[slot] = numbers[team]
+                patients += (team is not None) - had_team
+        members, member_teams = self.members, self._member_teams
+        if delta.members:
+            members, member_teams = _apply_grouped(members, member_teams, delta.members)
+        shifts, shift_teams = self.shifts, self._shift_teams
+        if delta.shifts:
+            shifts, shift_teams = _apply_grouped(shifts, shift_teams, delta.shifts)
+        return RoutingIndex(keys, teams, used, patients, tuple(team_ids), members, member_teams, shifts, shift_teams)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "patients": self.patients,
+            "teams": len(self.members),
+            "members": len(self._member_teams),
+            "shifts": len(self._shift_teams),
+            "slots": len(self._keys),
+            "table_bytes": len(self._keys) * (self._keys.itemsize + self._teams.itemsize),
+        }
+
+
+def _epoch(moment: datetime) -> float:
+    # naive UTC in the database
+    return moment.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _refreshed(
+    index: RoutingIndex, patients, members, shifts, now: float
+) -> Tuple[RoutingIndex, int, Optional[datetime]]:
+    """The index with the changed rows applied, how many changes that was, and the newest updated_at read."""
+    delta = RoutingDelta(
+        [
+            (user_id, team_id if active else None)
+            for user_id, team_id, active, _ in patients
+            if index.team_of(user_id) != (team_id if active else None)
+        ],
+        [
+            (row.id, row.team_id, member)
+            for row in members
+            for member in [Member(row.channel, row.address, URGENCY_RANK.get(row.min_urgency.upper(), 0),
+                                  frozenset(tag.lower() for tag in row.tags or ())) if row.active else None]
+            if index.member(row.id) != member
+        ],
+        [
+            (row.id, row.team_id, shift)
+            for row in shifts
+            for shift in [Shift(_epoch(row.starts_at), _epoch(row.ends_at), row.channel, row.address)
+                          if row.active and _epoch(row.ends_at) > now else None]
+            if index.shift(row.id) != ((row.team_id, shift) if shift else None)
+        ]
+        # shifts that are over
+        + [(shift_id, team, None) for team, group in index.shifts.items()
+           for shift_id, shift in group.items() if shift.ends <= now],
+    )
+    stamps = [row[3] for row in patients] + [row.updated_at for row in list(members) + list(shifts)]
+    changes = len(delta.patients) + len(delta.members) + len(delta.shifts)
+    return index.apply(delta) if changes else index, changes, max(stamps) if stamps else None
+
+
+class RecipientRouter:
+    """Holds the current RoutingIndex and keeps it up to date from the routing tables."""
+
+    def __init__(self, sessionmaker: Optional[async_sessionmaker] = None, refresh_seconds: Optional[float] = None):
+        self._sessionmaker = sessionmaker
+        self._refresh_seconds = refresh_seconds
+        self.index = RoutingIndex()
+        self._since: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.last_refresh_seconds = 0.0
+
+    def recipients(self, user_id: Optional[str], urgency_level: str, tags: Iterable[str] = ()) -> Dict[str, List[str]]:
+        if not settings.ROUTING_ENABLED:
+            return {}
+        return self.index.recipients(user_id, urgency_level, tags)
+
+    async def _changed_rows(self, since: Optional[datetime]):
+        def changed(query, model):
+            return query.where(model.updated_at >= since - _OVERLAP) if since is not None else query
+
+        async with (self._sessionmaker or get_sessionmaker())() as session:
+            # plain tuples: a million patients must not become a million ORM objects on the first load
+            patients = (await session.execute(changed(
+                select(PatientCareTeam.user_id, PatientCareTeam.team_id, PatientCareTeam.active,
+                       PatientCareTeam.updated_at),
+                PatientCareTeam,
+            ))).all()
+            members = (await session.execute(changed(select(CareTeamMember), CareTeamMember))).scalars().all()
+            shifts = (await session.execute(changed(select(OnCallShift), OnCallShift))).scalars().all()
+        return patients, members, shifts
+
+    async def refresh(self) -> int:
+        """
+        Apply the routing rows changed since the last refresh (all rows the
+        first time) and swap in the new index. Returns how many changes applied.
+        """
+        started = time.perf_counter()
+        rows = await self._changed_rows(self._since)
+        # diffing and hashing every changed row (all of them on the first load) happens off the event loop too;
+        # requests keep reading the old index until the swap below
+        index, changes, since = await asyncio.to_thread(_refreshed, self.index, *rows, time.time())
+        if since is not None:
+            self._since = max(since, self._since) if self._since else since
+        self.index = index
+        self.refreshes += 1
+        self.last_refresh_seconds = time.perf_counter() - started
+        return changes
+
+    @property
+    def refresh_seconds(self) -> float:
+        return self._refresh_seconds or settings.ROUTING_REFRESH_SECONDS
+
+    def start(self) -> None:
+        if settings.ROUTING_ENABLED and (self._task is None or self._task.done()):
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                await self.refresh()
+            except Exception:
+                # keep serving the last good index
+                self.refresh_errors += 1
+                logger.exception("recipient routing refresh failed")
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            **self.index.stats(),
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "last_refresh_seconds": self.last_refresh_seconds,
+        }
+
+
+recipient_router = RecipientRouter()
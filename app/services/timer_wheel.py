@@ -0,0 +1,97 @@
+"""
+Hierarchical timing wheel (Varghese & Lauck) for many pending deadlines.
+
+Time is cut into ticks of `tick` seconds. Level 0 has one slot per tick for
+the next `slots` ticks; each higher level has `slots` slots that each cover
+a whole rotation of the level below. A timer goes into the lowest level
+whose range covers its deadline and cascades one level down each time the
+wheel reaches its slot, so schedule() and cancel() are O(1) and advance()
+costs O(ticks elapsed + timers fired). Timers fire at the first tick
+boundary at or after their deadline (up to one tick late). Deadlines past
+the top level's range wait in its last slot and are re-placed when it
+comes round.
+
+Not thread-safe; the escalation scheduler uses it from the event loop only.
+"""
+import math
+from typing import Dict, Hashable, List, Tuple
+
+
+class TimerWheel:
+    def __init__(self, tick: float = 1.0, slots: int = 256, levels: int = 4, start: float = 0.0):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.origin = start
+        # last tick processed by advance()
+        self.current = 0
+        # ticks covered by one slot of each level
+        self._units = [slots ** level for level in range(levels)]
+        # wheels[level][slot] = {key: deadline tick}
+        self._wheels: List[List[Dict[Hashable, int]]] = [[{} for _ in range(slots)] for _ in range(levels)]
+        # key -> (level, slot), so cancel() finds the timer without a scan
+        self._where: Dict[Hashable, Tuple[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._where
+
+    def _tick_of(self, deadline: float) -> int:
+        return math.ceil((deadline - self.origin) / self.tick - 1e-9)
+
+    def _place(self, key: Hashable, due: int) -> None:
+        delta = due - self.current
+        for level, unit in enumerate(self._units):
+            if delta < unit * self.slots:
+                slot = (due // unit) % self.slots
+                break
+        else:
+            # beyond the top level: park in the slot that comes round last, and re-place from there
+            level = self.levels - 1
+            slot = (self.current // self._units[level] - 1) % self.slots
+        self._wheels[level][slot][key] = due
+        self._where[key] = (level, slot)
+
+    def schedule(self, key: Hashable, deadline: float) -> None:
+        """Fire `key` at `deadline` (same clock as advance()); rescheduling a key moves it."""
+        if key in self._where:
+            self.cancel(key)
+        # a deadline already due fires at the next tick
+        self._place(key, max(self._tick_of(deadline), self.current + 1))
+
+    def cancel(self, key: Hashable) -> bool:
+        where = self._where.pop(key, None)
+        if where is None:
+            return False
+        level, slot = where
+        del self._wheels[level][slot][key]
+        return True
+
+    def advance(self, now: float) -> List[Hashable]:
+        """Move the wheel to `now` and return the keys whose deadline has passed, earliest first."""
+        target = math.floor((now - self.origin) / self.tick + 1e-9)
+        fired: List[Hashable] = []
+        while self.current < target:
+            if not self._where:
+                # nothing pending: jump instead of walking empty slots
+                self.current = target
+                break
+            self.current += 1
+            tick = self.current
+            # cascade each level whose slot boundary this tick crosses, highest first
+            for level in range(self.levels - 1, 0, -1):
+                size = self._units[level]
+                if tick % size:
+                    continue
+                slot = (tick // size) % self.slots
+                bucket, self._wheels[level][slot] = self._wheels[level][slot], {}
+                for key, due in bucket.items():
+                    self._place(key, due)
+            slot = tick % self.slots
+            bucket, self._wheels[0][slot] = self._wheels[0][slot], {}
+            for key in bucket:
+                del self._where[key]
+            fired.extend(bucket)
+        return fired
@@ -1,16 +1,268 @@
 # app/services/audio_service.py
-from openai import AsyncOpenAI
+import asyncio
+import hashlib
+import os
+import tempfile
+from typing import Any, Callable, Dict, Optional, Tuple
+
 from app.core.config import settings
+from app.core.logger import logger
+from app.core.metrics import span, timed
+from app.services.cache import AsyncTTLCache, DiskCacheStore
+from app.services.clients import clients, openai_client
+from app.services.resilience import guarded
 
-# use the API key defined in `app/core/config.py` (from `.env`)
-client = AsyncOpenAI(api_key=settings.API_KEY)
-async def transcribe_audio(audio_path: str) -> str:
+TRANSCRIPTION_MODEL = "whisper-1"
+
+# content-addressed: retries and re-sent notes hit the cache instead of Whisper
+transcription_cache = AsyncTTLCache(
+    maxsize=settings.TRANSCRIPTION_CACHE_SIZE,
+    ttl=settings.TRANSCRIPTION_CACHE_TTL_SECONDS,
+    store=DiskCacheStore(settings.TRANSCRIPTION_CACHE_DIR) if settings.TRANSCRIPTION_CACHE_DIR else None,
+)
+
+
+def audio_cache_key(audio_path: str, model: str = TRANSCRIPTION_MODEL) -> str:
     """
-    Transcribes audio file to text using Whisper API.
+    sha256 of the audio bytes (read in 1 MB chunks) plus the model name.
     """
+    digest = hashlib.sha256()
     with open(audio_path, "rb") as f:
-        transcript =await client.audio.transcriptions.create(
-            model="whisper-1",
-            file=f
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return f"{model}:{digest.hexdigest()}"
+
+
+async def _transcribe_upstream(audio_path: str) -> str:
+    async def call():
+        with open(audio_path, "rb") as f:
+            return await openai_client().audio.transcriptions.create(
+                model=TRANSCRIPTION_MODEL,
+                file=f
+            )
+
+    # an open circuit or a full queue fails at once, so the fallback backend takes over
+    transcript = await guarded("openai_audio", call)
+    return transcript.text
+
+
+class TranscriptionBackend:
+    """
+    Turns an audio file into text. `model_id` namespaces the transcription
+    cache, so switching backends never serves another engine's transcripts.
+    """
+
+    name = ""
+    model_id = ""
+
+    async def start(self) -> None:
+        pass
+
+    async def transcribe(self, audio_path: str) -> str:
+        raise NotImplementedError
+
+    async def aclose(self) -> None:
+        pass
+
+
+class OpenAIWhisperBackend(TranscriptionBackend):
+    name = "openai"
+    model_id = TRANSCRIPTION_MODEL
+
+    async def transcribe(self, audio_path: str) -> str:
+        return await _transcribe_upstream(audio_path)
+
+
+class LocalBackend(TranscriptionBackend):
+    """Offline CPU engine in a warm process pool (app/services/local_asr.py)."""
+
+    name = "local"
+
+    def __init__(self):
+        from app.services.local_asr import LocalTranscriber
+
+        self.transcriber = LocalTranscriber(
+            settings.LOCAL_ASR_ENGINE, settings.LOCAL_ASR_MODEL, settings.LOCAL_ASR_WORKERS or None
         )
-    return transcript.text
\ No newline at end of file
+        self.model_id = f"local-{settings.LOCAL_ASR_ENGINE}" + (
+            f":{settings.LOCAL_ASR_MODEL}" if settings.LOCAL_ASR_MODEL else ""
+        )
+
+    async def start(self) -> None:
+        pids = await self.transcriber.start()
+        logger.info("local ASR engine %s warm in %d worker processes", self.transcriber.engine, len(pids))
+
+    async def transcribe(self, audio_path: str) -> str:
+        return await self.transcriber.transcribe(audio_path)
+
+    async def aclose(self) -> None:
+        self.transcriber.shutdown()
+
+
+BACKENDS: Dict[str, Callable[[], TranscriptionBackend]] = {
+    "openai": OpenAIWhisperBackend,
+    "local": LocalBackend,
+}
+_backends: Dict[str, TranscriptionBackend] = {}
+
+
+def get_backend(name: str) -> TranscriptionBackend:
+    """Backends are created on first use and kept for the process."""
+    if name not in _backends:
+        if name not in BACKENDS:
+            raise ValueError(f"unknown transcription backend {name!r}; choose from {sorted(BACKENDS)}")
+        _backends[name] = BACKENDS[name]()
+    return _backends[name]
+
+
+def _fallback_name() -> Optional[str]:
+    fallback = settings.TRANSCRIPTION_FALLBACK_BACKEND
+    return fallback if fallback not in ("", "none", settings.TRANSCRIPTION_BACKEND) else None
+
+
+async def start_transcription_backends() -> None:
+    """
+    Create and warm the configured backend and its fallback. A fallback that
+    cannot start is logged and skipped at request time instead of failing startup.
+    """
+    await get_backend(settings.TRANSCRIPTION_BACKEND).start()
+    fallback = _fallback_name()
+    if fallback:
+        try:
+            await get_backend(fallback).start()
+        except Exception:
+            logger.warning("transcription fallback %r failed to start", fallback, exc_info=True)
+
+
+async def close_transcription_backends() -> None:
+    while _backends:
+        _, backend = _backends.popitem()
+        await backend.aclose()
+
+
+@timed("asr")
+async def _transcribe_with_fallback(audio_path: str) -> Tuple[str, str]:
+    """
+    Transcribe with the configured backend. If it fails, or has not answered
+    within TRANSCRIPTION_FALLBACK_AFTER_SECONDS, the fallback backend is started
+    as well and the first successful answer wins (a slow primary keeps running
+    and still wins if it finishes first). Returns (text, backend name).
+    """
+    primary = get_backend(settings.TRANSCRIPTION_BACKEND)
+    fallback_name = _fallback_name()
+    if fallback_name is None:
+        return await primary.transcribe(audio_path), primary.name
+
+    tasks = {asyncio.create_task(primary.transcribe(audio_path)): primary.name}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=settings.TRANSCRIPTION_FALLBACK_AFTER_SECONDS)
+        for task in done:
+            if task.exception() is None:
+                return task.result(), primary.name
+        logger.warning(
+            "transcription backend %s %s, trying %s", primary.name,
+            "failed" if done else f"slower than {settings.TRANSCRIPTION_FALLBACK_AFTER_SECONDS:g}s", fallback_name,
+        )
+        tasks[asyncio.create_task(get_backend(fallback_name).transcribe(audio_path))] = fallback_name
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result(), tasks[task]
+        # both failed: surface the primary's error
+        raise next(iter(tasks)).exception()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+class _FallbackTranscript(Exception):
+    """
+    Raised through the cache so a fallback backend's transcript is never stored:
+    a retry should get the primary backend again.
+    """
+
+    def __init__(self, result: Dict[str, Any]):
+        super().__init__(f"transcribed by the fallback backend {result['backend']}")
+        self.result = result
+
+
+async def _transcribe_speech(audio_path: str) -> Dict[str, Any]:
+    """
+    Upload only the speech (VAD-trimmed, 16 kHz mono WAV). Falls back to the
+    original file when the VAD is disabled, cannot decode the audio, or finds
+    no speech at all, so a missed detection never loses a recording.
+    """
+    if not settings.VAD_ENABLED:
+        text, backend = await _transcribe_with_fallback(audio_path)
+        return {"text": text, "audio_seconds": None, "speech_seconds": None, "backend": backend}
+
+    fd, trimmed_path = tempfile.mkstemp(suffix=".wav")
+    os.close(fd)
+    try:
+        try:
+            with span("vad"):
+                vad = await asyncio.to_thread(lambda: clients.get("vad").trim_silence(audio_path, trimmed_path))
+        except Exception:
+            logger.warning("VAD failed for %s, uploading the original audio", audio_path, exc_info=True)
+            vad = {"audio_seconds": None, "speech_seconds": None}
+        upload_path = trimmed_path if vad["speech_seconds"] else audio_path
+        text, backend = await _transcribe_with_fallback(upload_path)
+    finally:
+        os.remove(trimmed_path)
+    if upload_path == audio_path:
+        vad["speech_seconds"] = vad["audio_seconds"]
+    return {
+        "text": text,
+        "audio_seconds": vad["audio_seconds"],
+        "speech_seconds": vad["speech_seconds"],
+        "backend": backend,
+    }
+
+
+@timed("transcribe")
+async def transcribe_audio_with_stats(audio_path: str) -> Dict[str, Any]:
+    """
+    Like transcribe_audio, plus how much audio the VAD kept out of the upload:
+        { "text": "...", "audio_seconds": 42.0, "speech_seconds": 17.5, "seconds_removed": 24.5,
+          "backend": "openai" }
+    (the seconds are None when the VAD did not run). Cached results report the
+    trim of the original upload.
+    """
+    primary = get_backend(settings.TRANSCRIPTION_BACKEND)
+    # keyed on the original bytes so repeats skip the VAD as well as the backend
+    model = f"{primary.model_id}+vad" if settings.VAD_ENABLED else primary.model_id
+    key = await asyncio.to_thread(audio_cache_key, audio_path, model)
+
+    async def compute() -> Dict[str, Any]:
+        result = await _transcribe_speech(audio_path)
+        if result["backend"] != primary.name:
+            raise _FallbackTranscript(result)
+        return result
+
+    try:
+        result = await transcription_cache.get_or_compute(key, compute)
+    except _FallbackTranscript as e:
+        # answers this request and its coalesced waiters, which see the same exception
+        result = e.result
+    if isinstance(result, str):
+        # persistent cache entries written before VAD stats existed
+        result = {"text": result, "audio_seconds": None, "speech_seconds": None, "backend": primary.name}
+    removed = None
+    if result["audio_seconds"] is not None:
+        removed = round(result["audio_seconds"] - result["speech_seconds"], 3)
+        if removed:
+            logger.info("VAD removed %.1f s of %.1f s before transcription", removed, result["audio_seconds"])
+    return {**result, "seconds_removed": removed}
+
+
+async def transcribe_audio(audio_path: str) -> str:
+    """
+    Transcribes audio file to text with the configured backend (Whisper API by
+    default, see TRANSCRIPTION_BACKEND), falling back to the local engine when it is slow or down.
+    Silence is trimmed locally before upload (see app/services/vad.py).
+    Identical audio is served from the transcription cache, and concurrent
+    requests for the same audio share a single upstream call.
+    """
+    return (await transcribe_audio_with_stats(audio_path))["text"]
@@ -0,0 +1,141 @@
+"""
+Local red-flag pre-triage.
+
+A single compiled regex over a phrase lexicon maps a transcript to the same
+tag vocabulary SYSTEM_PROMPT asks the LLM for, plus a confidence score, in
+microseconds. /patient_alert uses it to page doctors for obvious emergencies
+before (or instead of) the LLM call.
+"""
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+# tag -> (weight, phrases). Weight is the confidence that this finding alone is an emergency.
+DEFAULT_LEXICON: Dict[str, Tuple[float, Tuple[str, ...]]] = {
+    "chest_pain": (0.85, (
+        "chest pain", "chest hurts", "pain in my chest", "chest is hurting", "chest tightness",
+        "tight chest", "tightness in my chest", "pressure in my chest", "crushing chest",
+    )),
+    "shortness_of_breath": (0.8, (
+        "can't breathe", "cannot breathe", "cant breathe", "can't catch my breath", "short of breath",
+        "shortness of breath", "trouble breathing", "difficulty breathing", "struggling to breathe",
+        "hard to breathe", "breathless",
+    )),
+    "stroke_signs": (0.9, (
+        "face is drooping", "face drooping", "slurred speech", "speech is slurred", "can't move my arm",
+        "can't feel my arm", "numb on one side", "one side of my face", "weak on one side",
+    )),
+    "unconscious": (0.75, ("passed out", "fainted", "unconscious", "blacked out", "not responding")),
+    "severe_bleeding": (0.85, (
+        "bleeding heavily", "won't stop bleeding", "wont stop bleeding", "lot of blood", "losing blood",
+    )),
+    "seizure": (0.8, ("seizure", "convulsing", "convulsions")),
+    "suicidal_ideation": (0.9, ("kill myself", "end my life", "suicidal", "want to die")),
+    "allergic_reaction": (0.85, (
+        "throat is closing", "throat closing", "throat swelling", "tongue swelling", "anaphylaxis",
+        "anaphylactic",
+    )),
+    "fall": (0.5, ("i fell", "fell down", "fell over", "had a fall", "i've fallen", "have fallen", "fallen over")),
+    "fever": (0.2, ("fever", "high temperature", "burning up")),
+    "headache": (0.1, ("headache", "migraine")),
+    "vomiting": (0.2, ("vomiting", "throwing up", "threw up")),
+}
+
+# a negation within the two words before a phrase, in the same clause
+# ("no chest pain", "not really short of breath"; but not "I don't know, chest pain")
+_NEGATION_RE = re.compile(r"\b(?:no|not|never|without|denies|don't|dont|isn't|wasn't)\b(?: +\w+){0,2} *$")
+
+
+def load_lexicon(path: Optional[str] = None) -> Dict[str, Tuple[float, Tuple[str, ...]]]:
+    """
+    Load a lexicon from JSON ({"tag": {"weight": 0.8, "phrases": [...]}}), or the
+    built-in default when no path is given.
+    """
+    if not path:
+        return DEFAULT_LEXICON
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    return {tag: (float(spec["weight"]), tuple(spec["phrases"])) for tag, spec in raw.items()}
+
+
+def _normalize(text: str) -> str:
+    return text.lower().replace("’", "'")
+
+
+def _trie_regex(phrases) -> str:
+    """
+    Build an alternation factored by common prefixes ("chest pain|chest hurts" ->
+    "chest (?:hurts|pain)"), so the regex engine tests each character once
+    instead of once per phrase. Longer matches win because optional tails are greedy.
+    """
+    trie: Dict[str, dict] = {}
+    for phrase in phrases:
+        node = trie
+        for ch in phrase:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def emit(node: Dict[str, dict]) -> str:
+        branches = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return emit(trie)
+
+
+class RedFlagMatcher:
+    """
+    Compiles the whole lexicon into one prefix-factored regex so a transcript
+    is scanned once, regardless of lexicon size.
+    """
+
+    def __init__(self, lexicon: Dict[str, Tuple[float, Tuple[str, ...]]]):
+        self.weights = {tag: weight for tag, (weight, _) in lexicon.items()}
+        self._tag_by_phrase = {
+            _normalize(phrase): tag for tag, (_, phrases) in lexicon.items() for phrase in phrases
+        }
+        self._pattern = re.compile(rf"(?<!\w)(?:{_trie_regex(self._tag_by_phrase)})(?!\w)")
+
+    def match(self, text: str) -> Dict[str, List[str]]:
+        """Return {tag: [matched phrases]} for non-negated matches."""
+        text = _normalize(text)
+        found: Dict[str, List[str]] = {}
+        for m in self._pattern.finditer(text):
+            if _NEGATION_RE.search(text, max(0, m.start() - 32), m.start()):
+                continue
+            phrase = m.group(0)
+            found.setdefault(self._tag_by_phrase[phrase], []).append(phrase)
+        return found
+
+    def assess(self, text: str) -> Dict[str, Any]:
+        """
+        Returns the same shape as profile_text plus a confidence:
+            { "urgency": "HIGH|MEDIUM|LOW", "tags": [...], "reason": "...", "confidence": 0..1 }
+        Confidence combines independent findings: 1 - prod(1 - weight).
+        """
+        found = self.match(text)
+        miss = 1.0
+        for tag in found:
+            miss *= 1.0 - self.weights[tag]
+        confidence = round(1.0 - miss, 4)
+
+        if confidence >= settings.PRETRIAGE_HIGH_CONFIDENCE:
+            urgency = "HIGH"
+        elif found:
+            urgency = "MEDIUM"
+        else:
+            urgency = "LOW"
+        tags = sorted(found, key=lambda t: -self.weights[t])
+        reason = "Red-flag phrases: " + ", ".join(p for t in tags for p in found[t]) if found else "No red-flag phrases"
+        return {"urgency": urgency, "tags": tags, "reason": reason, "confidence": confidence}
+
+
+matcher = RedFlagMatcher(load_lexicon(settings.PRETRIAGE_LEXICON_PATH))
+
+
+def pretriage(text: str) -> Dict[str, Any]:
+    return matcher.assess(text)
@@ -0,0 +1,107 @@
+"""
+Energy / zero-crossing voice-activity detection.
+
+Whisper is billed by audio duration, so recordings are trimmed to their
+speech before upload: per 30 ms frame the short-time energy (relative to the
+loudest frame) and zero-crossing rate decide speech vs. silence, short pauses
+are kept so words are not clipped, and the kept frames are re-encoded as
+16 kHz mono 16-bit WAV.
+"""
+from typing import Any, Dict, Tuple, Union
+
+import numpy as np
+from pydub import AudioSegment
+
+from app.core.config import settings
+from app.utils.audio import TARGET_RATE, iter_frames, open_audio, sample_count, save_samples
+
+FRAME_MS = 30
+FRAME_SAMPLES = TARGET_RATE * FRAME_MS // 1000
+# frames analysed per iter_frames block
+_FRAMES_PER_BLOCK = 256
+
+
+def _blocks(source: Union[str, AudioSegment]):
+    for block in iter_frames(source, frame_size=FRAME_SAMPLES * _FRAMES_PER_BLOCK, normalize=False):
+        yield block.reshape(-1, FRAME_SAMPLES)
+
+
+def frame_features(source: Union[str, AudioSegment]) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-frame energy (dBFS) and zero-crossing rate (0..1)."""
+    # iter_frames zero-pads the last block; padding frames must not pull the noise floor down
+    frames_total = -(-sample_count(source) // FRAME_SAMPLES)
+    energies, zcrs = [], []
+    for frames in _blocks(source):
+        energies.append(np.einsum("ij,ij->i", frames, frames) / FRAME_SAMPLES)
+        signs = np.signbit(frames)
+        zcrs.append(np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (FRAME_SAMPLES - 1))
+    if not energies:
+        return np.empty(0), np.empty(0)
+    energy_dbfs = 10 * np.log10(np.concatenate(energies)[:frames_total] + 1e-10)
+    return energy_dbfs, np.concatenate(zcrs)[:frames_total]
+
+
+def _runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Start and end (exclusive) indices of the True runs in a boolean array."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def speech_mask(energy_dbfs: np.ndarray, zcr: np.ndarray) -> np.ndarray:
+    """Per-frame speech decision with short blips dropped, short pauses bridged and segments padded."""
+    if not len(energy_dbfs):
+        return np.zeros(0, dtype=bool)
+    energy_db = energy_dbfs - energy_dbfs.max()
+    floor = np.percentile(energy_db, 10)
+    threshold = min(max(floor + settings.VAD_ENERGY_OFFSET_DB, settings.VAD_FLOOR_DB), settings.VAD_CEILING_DB)
+    mask = (energy_db > threshold) | (
+        (energy_db > max(threshold - settings.VAD_ENERGY_OFFSET_DB / 2, settings.VAD_FLOOR_DB))
+        & (zcr > settings.VAD_ZCR_THRESHOLD)
+    )
+    # relative levels alone would call the loudest hiss of an empty recording speech
+    mask &= energy_dbfs > settings.VAD_ABSOLUTE_FLOOR_DBFS
+
+    starts, ends = _runs(mask)
+    for start, end in zip(starts, ends):
+        if (end - start) * FRAME_MS < settings.VAD_MIN_SPEECH_MS:
+            mask[start:end] = False
+
+    starts, ends = _runs(mask)
+    for end, next_start in zip(ends, starts[1:]):
+        if (next_start - end) * FRAME_MS < settings.VAD_MIN_SILENCE_MS:
+            mask[end:next_start] = True
+
+    pad = settings.VAD_PAD_MS // FRAME_MS
+    padded = mask.copy()
+    for start, end in zip(*_runs(mask)):
+        padded[max(0, start - pad):end + pad] = True
+    return padded
+
+
+def trim_silence(audio_path: str, output_path: str) -> Dict[str, Any]:
+    """
+    Write only the speech of `audio_path` to `output_path` (16 kHz mono WAV).
+    Nothing is written when no speech is found.
+    Returns {"audio_seconds", "speech_seconds", "seconds_removed"}.
+    """
+    source = open_audio(audio_path)
+    audio_seconds = sample_count(source) / TARGET_RATE
+    mask = speech_mask(*frame_features(source))
+    kept = int(mask.sum())
+    speech_seconds = 0.0
+    if kept:
+        def speech_frames():
+            offset = 0
+            for frames in _blocks(source):
+                if offset >= len(mask):
+                    break
+                frames = frames[:len(mask) - offset]
+                yield frames[mask[offset:offset + len(frames)]].ravel()
+                offset += len(frames)
+
+        speech_seconds = min(save_samples(speech_frames(), output_path) / TARGET_RATE, audio_seconds)
+    return {
+        "audio_seconds": round(audio_seconds, 3),
+        "speech_seconds": round(speech_seconds, 3),
+        "seconds_removed": round(audio_seconds - speech_seconds, 3),
+    }
@@ -1,17 +1,318 @@
-from pydub import AudioSegment
+"""
+Audio helpers.
+
+The pydub functions (load_audio / preprocess_audio / save_audio) are kept for
+code that works on AudioSegments. The NumPy path (iter_frames / load_samples)
+is what long recordings should use: WAV files on disk are memory-mapped and
+viewed with np.frombuffer (other formats are viewed the same way over pydub's
+raw data), and downmixing, resampling and normalization run block by block in
+float32, so peak memory is a few blocks rather than several copies of the
+whole recording.
+"""
+import mmap
+import os
+import struct
+import wave
+from typing import Iterable, Iterator, NamedTuple, Optional, Union
+
 import numpy as np
+from pydub import AudioSegment
+
+TARGET_RATE = 16000
+BLOCK_FRAMES = 1 << 16
+
+_WAVE_FORMAT_PCM = 1
+_WAVE_FORMAT_IEEE_FLOAT = 3
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
 
 def load_audio(file_path):
     audio = AudioSegment.from_file(file_path)
     return audio
 
+
 def preprocess_audio(audio):
-    audio = audio.set_frame_rate(16000).set_channels(1).set_sample_width(2)
+    # downmix first so the later passes touch one channel; each pass is a no-op when already satisfied
+    audio = audio.set_channels(1).set_sample_width(2).set_frame_rate(TARGET_RATE)
     return audio
 
+
 def audio_to_numpy(audio):
-    samples = np.array(audio.get_array_of_samples())
-    return samples.astype(np.float32) / np.max(np.abs(samples))  # Normalize audio
+    """Interleaved samples as float32 peak-normalized to [-1, 1]; silence stays all zeros."""
+    samples = np.frombuffer(audio.raw_data, dtype=_pcm_dtype(audio.sample_width, signed=True)).astype(np.float32)
+    _normalize_inplace(samples, float(np.max(np.abs(samples), initial=0.0)))
+    return samples
+
 
 def save_audio(audio, output_path):
-    audio.export(output_path, format="wav")
\ No newline at end of file
+    audio.export(output_path, format="wav")
+
+
+class WavInfo(NamedTuple):
+    rate: int
+    channels: int
+    sample_width: int
+    is_float: bool
+    data_offset: int
+    frames: int
+
+
+def wav_info(path: str) -> WavInfo:
+    """
+    Parse a RIFF/WAVE header (PCM 8/16/32-bit or 32-bit float) and locate the
+    data chunk. Raises ValueError for anything else.
+    """
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        riff, _, form = struct.unpack("<4sI4s", f.read(12))
+        if riff != b"RIFF" or form != b"WAVE":
+            raise ValueError(f"{path} is not a WAV file")
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"{path} has no data chunk")
+            chunk_id, size = struct.unpack("<4sI", header)
+            if chunk_id == b"fmt ":
+                body = f.read(size)
+                tag, channels, rate, _, _, bits = struct.unpack("<HHIIHH", body[:16])
+                if tag == _WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                    tag = struct.unpack("<H", body[24:26])[0]
+                fmt = (tag, channels, rate, bits)
+            elif chunk_id == b"data":
+                if fmt is None:
+                    raise ValueError(f"{path} has data before its fmt chunk")
+                tag, channels, rate, bits = fmt
+                width = bits // 8
+                if not channels or (tag, width) not in ((_WAVE_FORMAT_PCM, 1), (_WAVE_FORMAT_PCM, 2),
+                                                        (_WAVE_FORMAT_PCM, 4), (_WAVE_FORMAT_IEEE_FLOAT, 4)):
+                    raise ValueError(f"unsupported WAV encoding (format {tag}, {bits} bits)")
+                offset = f.tell()
+                # streaming writers leave the size as 0 or 0xFFFFFFFF; trust the file length instead
+                size = min(size or file_size, file_size - offset)
+                return WavInfo(rate, channels, width, tag == _WAVE_FORMAT_IEEE_FLOAT, offset,
+                               size // (width * channels))
+            else:
+                f.seek(size + (size & 1), os.SEEK_CUR)
+
+
+def open_audio(path: str) -> Union[str, AudioSegment]:
+    """
+    A source for iter_frames / load_samples that can be read repeatedly: the
+    path itself for WAV files we can memory-map, otherwise the decoded
+    AudioSegment, so multi-pass consumers decode compressed audio only once.
+    """
+    try:
+        wav_info(path)
+        return path
+    except ValueError:
+        return load_audio(path)
+
+
+def sample_count(source: Union[str, AudioSegment], rate: int = TARGET_RATE) -> int:
+    """Number of samples iter_frames / load_samples produce at `rate` (before frame padding)."""
+    src = _open_pcm(source)
+    return resampled_length(len(src.pcm), src.rate, rate)
+
+
+def save_samples(frames: Iterable[np.ndarray], output_path: str, rate: int = TARGET_RATE) -> int:
+    """
+    Write float32 mono frames (e.g. from iter_frames) as a 16-bit PCM WAV,
+    one frame at a time. Returns the number of samples written.
+    """
+    written = 0
+    with wave.open(output_path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        for frame in frames:
+            pcm = np.clip(frame * 32767.0, -32768, 32767).astype("<i2")
+            w.writeframes(pcm.tobytes())
+            written += len(pcm)
+    return written
+
+
+def _pcm_dtype(sample_width: int, signed: bool, is_float: bool = False) -> np.dtype:
+    if is_float:
+        return np.dtype("<f4")
+    if sample_width == 1:
+        # WAV stores 8-bit audio unsigned; pydub's raw_data is already biased to signed
+        return np.dtype(np.int8 if signed else np.uint8)
+    if sample_width in (2, 4):
+        return np.dtype(f"<i{sample_width}")
+    raise ValueError(f"unsupported sample width {sample_width}")
+
+
+def _normalize_inplace(samples: np.ndarray, peak: float) -> None:
+    if peak > 0:
+        samples *= np.float32(1.0 / peak)
+
+
+class _PCMSource(NamedTuple):
+    pcm: np.ndarray  # (frames, channels) np.frombuffer view over a file mapping or pydub's bytes, never a copy
+    rate: int
+    offset: float  # subtracted before scaling (unsigned 8-bit)
+    scale: float  # maps one sample to [-1, 1]
+    mapping: Optional[mmap.mmap] = None
+    data_offset: int = 0
+
+
+def _open_pcm(source: Union[str, AudioSegment]) -> _PCMSource:
+    if isinstance(source, str):
+        try:
+            info = wav_info(source)
+        except ValueError:
+            source = load_audio(source)  # compressed or unusual formats go through ffmpeg once
+        else:
+            dtype = _pcm_dtype(info.sample_width, signed=False, is_float=info.is_float)
+            if not info.frames:
+                return _PCMSource(np.empty((0, info.channels), dtype=dtype), info.rate, *_offset_and_scale(dtype))
+            with open(source, "rb") as f:
+                mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            pcm = np.frombuffer(mapping, dtype=dtype, count=info.frames * info.channels, offset=info.data_offset)
+            return _PCMSource(pcm.reshape(-1, info.channels), info.rate, *_offset_and_scale(dtype),
+                              mapping=mapping, data_offset=info.data_offset)
+
+    if source.sample_width == 3:
+        source = source.set_sample_width(4)
+    dtype = _pcm_dtype(source.sample_width, signed=True)
+    pcm = np.frombuffer(source.raw_data, dtype=dtype).reshape(-1, source.channels)
+    return _PCMSource(pcm, source.frame_rate, *_offset_and_scale(dtype))
+
+
+def _offset_and_scale(dtype: np.dtype):
+    if dtype.kind == "f":
+        return 0.0, 1.0
+    if dtype.kind == "u":
+        return 128.0, 1.0 / 128
+    return 0.0, 1.0 / (1 << (8 * dtype.itemsize - 1))
+
+
+def _mono_blocks(src: _PCMSource, block_frames: int) -> Iterator[np.ndarray]:
+    """Yield float32 mono blocks at the source rate; each block is a fresh array."""
+    channels = src.pcm.shape[1]
+    for start in range(0, len(src.pcm), block_frames):
+        block = src.pcm[start:start + block_frames]
+        mono = block[:, 0].astype(np.float32)
+        for channel in range(1, channels):
+            mono += block[:, channel]
+        if src.offset:
+            mono -= np.float32(src.offset * channels)
+        mono *= np.float32(src.scale / channels)
+        if src.mapping is not None:
+            _release_pages(src, (start + len(block)) * block.strides[0])
+        yield mono
+
+
+def _release_pages(src: _PCMSource, end: int) -> None:
+    # Unmap pages already converted so resident memory stays at a few blocks (they remain in the page
+    # cache). Fault-around can map whole folios behind the current block, so release from the start.
+    if hasattr(mmap, "MADV_DONTNEED"):
+        src.mapping.madvise(mmap.MADV_DONTNEED, 0, src.data_offset + end)
+
+
+class _LinearResampler:
+    """
+    Streaming linear-interpolation resampler (the same interpolation pydub's
+    set_frame_rate uses through audioop.ratecv). Output sample k sits at source
+    position k * src / dst; positions are computed with integers so block
+    boundaries never drift.
+    """
+
+    def __init__(self, src_rate: int, dst_rate: int):
+        self.src = src_rate
+        self.dst = dst_rate
+        self._next = 0  # index of the next output sample
+        self._base = 0  # source index of the carried sample
+        self._carry: Optional[np.ndarray] = None
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        if self.src == self.dst:
+            return block
+        buf = block if self._carry is None else np.concatenate((self._carry, block))
+        last = self._base + len(buf) - 1
+        count = last * self.dst // self.src - self._next + 1
+        if count <= 0:
+            out = np.empty(0, dtype=np.float32)
+        else:
+            k = np.arange(self._next, self._next + count, dtype=np.int64)
+            numerator = k * self.src - self._base * self.dst
+            idx = numerator // self.dst
+            frac = ((numerator - idx * self.dst) / self.dst).astype(np.float32)
+            upper = np.minimum(idx + 1, len(buf) - 1)
+            out = buf[idx]
+            out += (buf[upper] - out) * frac
+            self._next += count
+        self._carry = buf[-1:].copy()
+        self._base = last
+        return out
+
+
+def resampled_length(frames: int, src_rate: int, dst_rate: int) -> int:
+    return 0 if frames == 0 else (frames - 1) * dst_rate // src_rate + 1
+
+
+def _peak(src: _PCMSource, block_frames: int) -> float:
+    peak = 0.0
+    for mono in _mono_blocks(src, block_frames):
+        if len(mono):
+            peak = max(peak, float(np.abs(mono, out=mono).max()))
+    return peak
+
+
+def iter_frames(
+    source: Union[str, AudioSegment],
+    frame_size: int = TARGET_RATE,
+    rate: int = TARGET_RATE,
+    normalize: bool = True,
+    block_frames: int = BLOCK_FRAMES,
+) -> Iterator[np.ndarray]:
+    """
+    Yield float32 mono frames of exactly `frame_size` samples at `rate` Hz from a
+    file path (WAV is memory-mapped) or an AudioSegment. The last frame is
+    zero-padded. With `normalize`, samples are scaled by the recording's peak
+    (silent audio stays zeros); that costs one extra read-only pass.
+    Frames may be views into a shared block but are never reused or modified afterwards.
+    """
+    src = _open_pcm(source)
+    peak = _peak(src, block_frames) if normalize else 0.0
+    resampler = _LinearResampler(src.rate, rate)
+    pending = np.empty(0, dtype=np.float32)
+    for mono in _mono_blocks(src, block_frames):
+        out = resampler.process(mono)
+        _normalize_inplace(out, peak)
+        if len(pending):
+            out = np.concatenate((pending, out))
+        full = len(out) - len(out) % frame_size
+        for start in range(0, full, frame_size):
+            yield out[start:start + frame_size]
+        pending = out[full:]
+    if len(pending):
+        last = np.zeros(frame_size, dtype=np.float32)
+        last[:len(pending)] = pending
+        yield last
+
+
+def load_samples(
+    source: Union[str, AudioSegment],
+    rate: int = TARGET_RATE,
+    normalize: bool = True,
+    block_frames: int = BLOCK_FRAMES,
+) -> np.ndarray:
+    """
+    The whole recording as one float32 mono array at `rate` Hz: the NumPy
+    replacement for audio_to_numpy(preprocess_audio(load_audio(path))). The
+    output is allocated once at its final size and filled block by block, and
+    normalized against its own peak, so no extra pass over the source is needed.
+    """
+    src = _open_pcm(source)
+    resampler = _LinearResampler(src.rate, rate)
+    samples = np.empty(resampled_length(len(src.pcm), src.rate, rate), dtype=np.float32)
+    filled = 0
+    for mono in _mono_blocks(src, block_frames):
+        out = resampler.process(mono)
+        samples[filled:filled + len(out)] = out
+        filled += len(out)
+    if normalize and len(samples):
+        _normalize_inplace(samples, float(max(samples.max(), -samples.min())))
+    return samples
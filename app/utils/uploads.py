@@ -0,0 +1,132 @@
+import asyncio
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional, Sequence
+
+from fastapi import UploadFile
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import timed
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+@timed("upload")
+async def save_upload(
+    upload: UploadFile, max_bytes: Optional[int] = None, chunk_size: Optional[int] = None, directory: Optional[str] = None
+) -> str:
+    """
+    Stream an UploadFile to a temporary file chunk by chunk, so at most one
+    chunk is held in memory. Raises UploadTooLarge as soon as more than
+    `max_bytes` have arrived. The file goes into `directory` (default: the
+    system temp dir). The caller owns (and must delete) the returned path;
+    on any error the partial file is removed here.
+    """
+    max_bytes = max_bytes if max_bytes is not None else settings.MAX_UPLOAD_BYTES
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_BYTES
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=os.path.splitext(upload.filename or "")[1], dir=directory)
+    written = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := await upload.read(chunk_size):
+                written += len(chunk)
+                if written > max_bytes:
+                    raise UploadTooLarge(f"Upload exceeds the {max_bytes} byte limit.")
+                # a blocking write would stall every other request on the loop
+                await asyncio.to_thread(out.write, chunk)
+    except BaseException:
+        remove_quietly(path)
+        raise
+    return path
+
+
+@asynccontextmanager
+async def temporary_upload(upload: UploadFile, max_bytes: Optional[int] = None) -> AsyncIterator[str]:
+    """
+    `async with temporary_upload(file) as path:` — the temp file is always
+    removed on exit, including when the body raises.
+    """
+    path = await save_upload(upload, max_bytes)
+    try:
+        yield path
+    finally:
+        remove_quietly(path)
+
+
+class MaxBodySizeMiddleware:
+    """
+    Reject request bodies larger than `max_bytes` with 413 while they are
+    still arriving (before multipart parsing spools them to disk). Requests
+    announcing a larger Content-Length are refused without reading the body.
+    Only paths starting with one of `paths` are capped (all paths when None),
+    so streaming endpoints such as /profiling/profile/batch stay unbounded.
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int, paths: Optional[Sequence[str]] = None):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = tuple(paths) if paths is not None else None
+
+    async def _reject(self, send: Send) -> None:
+        body = b'{"detail":"Request body too large."}'
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or (self.paths is not None and not scope["path"].startswith(self.paths)):
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            await self._reject(send)
+            return
+
+        received = 0
+        overflowed = False
+        response_started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received, overflowed
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    overflowed = True
+                    raise UploadTooLarge(f"Request body exceeds the {self.max_bytes} byte limit.")
+            return message
+
+        async def guarded_send(message: Message) -> None:
+            nonlocal response_started
+            if overflowed:
+                # the framework may turn the aborted body into its own 400/500; answer 413 instead
+                if message["type"] == "http.response.start" and not response_started:
+                    response_started = True
+                    await self._reject(send)
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except UploadTooLarge:
+            if not response_started:
+                await self._reject(send)
@@ -0,0 +1,93 @@
+"""
+Peak memory and wall time of audio preprocessing on long recordings.
+
+Writes a synthetic 44.1 kHz stereo 16-bit WAV of the given length, then runs
+each preprocessing path in a fresh process and reads its peak RSS (VmHWM):
+
+    pydub   audio_to_numpy(preprocess_audio(load_audio(path)))  (the old path)
+    numpy   load_samples(path): whole recording as one float32 16 kHz array
+    frames  iter_frames(path): streaming 1 s frames, nothing kept
+
+    python -m benchmarks.bench_audio_preprocess --minutes 60
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+RATE = 44100
+PATHS = ("pydub", "numpy", "frames")
+
+
+def write_recording(path: str, minutes: float, rate: int = RATE) -> None:
+    rng = np.random.default_rng(7)
+    block = rate * 10
+    with wave.open(path, "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        remaining = int(minutes * 60 * rate)
+        start = 0
+        while remaining > 0:
+            n = min(block, remaining)
+            t = (start + np.arange(n)) / rate
+            voice = 0.4 * np.sin(2 * np.pi * 180 * t) * (np.sin(2 * np.pi * 0.3 * t) > 0)
+            noise = 0.02 * rng.standard_normal((n, 2))
+            w.writeframes(((voice[:, None] + noise) * 32767).astype(np.int16).tobytes())
+            remaining -= n
+            start += n
+
+
+def _peak_rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    raise RuntimeError("VmHWM not available")
+
+
+def run_one(kind: str, path: str) -> None:
+    # runs in the child process
+    from app.utils import audio
+
+    baseline = _peak_rss_mb()
+    start = time.perf_counter()
+    if kind == "pydub":
+        samples = audio.audio_to_numpy(audio.preprocess_audio(audio.load_audio(path)))
+        count = len(samples)
+    elif kind == "numpy":
+        count = len(audio.load_samples(path))
+    else:
+        count = sum(len(frame) for frame in audio.iter_frames(path))
+    elapsed = time.perf_counter() - start
+    print(f"{kind:7s} {elapsed:8.2f} s  peak RSS {_peak_rss_mb():8.1f} MB  (+{_peak_rss_mb() - baseline:7.1f} MB)  "
+          f"{count} samples")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=60.0)
+    parser.add_argument("--paths", nargs="+", choices=PATHS, default=list(PATHS))
+    parser.add_argument("--run", nargs=2, metavar=("PATH_KIND", "FILE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_one(*args.run)
+        sys.exit(0)
+
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "sqlite:///:memory:")
+    env.setdefault("API_KEY", "benchmark")
+    env.setdefault("ALERT_THRESHOLD", "0.5")
+    with tempfile.TemporaryDirectory() as workdir:
+        recording = os.path.join(workdir, "recording.wav")
+        write_recording(recording, args.minutes)
+        print(f"{args.minutes:g} min, 44.1 kHz stereo 16-bit: {os.path.getsize(recording) / 2**20:.0f} MB on disk")
+        for kind in args.paths:
+            subprocess.run([sys.executable, "-m", "benchmarks.bench_audio_preprocess", "--run", kind, recording],
+                           env=env, check=True)
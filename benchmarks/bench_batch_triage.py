@@ -0,0 +1,69 @@
+"""
+Batch triage throughput against a local mock OpenAI server.
+
+Triage N distinct transcripts two ways with the same number of requests in
+flight: one chat completion per transcript (profile_text) vs. packed
+completions (profile_texts_batch). The stub charges a fixed latency per HTTP
+request plus a per-transcript latency, like a real model does for output tokens.
+
+    python -m benchmarks.bench_batch_triage --transcripts 400 --pack-size 8 --concurrency 8
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+os.environ.setdefault("API_KEY", "benchmark")
+os.environ.setdefault("ALERT_THRESHOLD", "0.5")
+
+from openai import AsyncOpenAI  # noqa: E402
+
+from app.services import profiling  # noqa: E402
+from app.services.cache import AsyncTTLCache  # noqa: E402
+from app.services.clients import clients  # noqa: E402
+from benchmarks.stubs import StubHTTPServer, openai_routes  # noqa: E402
+
+
+async def single(texts, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(text):
+        async with sem:
+            return await profiling.profile_text(text)
+
+    return await asyncio.gather(*(one(t) for t in texts))
+
+
+async def batch(texts, pack_size, concurrency):
+    return [item async for item in profiling.profile_texts_batch(texts, pack_size, concurrency)]
+
+
+async def main(n, pack_size, concurrency, latency, per_item):
+    texts = [f"patient note {i}: {'chest pain' if i % 7 == 0 else 'mild cough'} since yesterday" for i in range(n)]
+    with StubHTTPServer(openai_routes(per_item_latency=per_item), latency=latency) as stub:
+        clients.set("openai", AsyncOpenAI(api_key="benchmark", base_url=stub.url + "/v1", max_retries=0))
+        print(f"{n} transcripts, {concurrency} requests in flight, stub {latency * 1000:.0f} ms/request + {per_item * 1000:.0f} ms/transcript")
+
+        for label, run in (
+            ("single", lambda: single(texts, concurrency)),
+            (f"batch x{pack_size}", lambda: batch(texts, pack_size, concurrency)),
+        ):
+            profiling.profile_cache = AsyncTTLCache()  # every transcript is a miss
+            before = stub.requests
+            start = time.perf_counter()
+            results = await run()
+            elapsed = time.perf_counter() - start
+            assert len(results) == n
+            print(f"{label:<10} {n / elapsed:8.1f} transcripts/s  {elapsed:6.2f} s  {stub.requests - before:5d} LLM calls")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transcripts", type=int, default=400)
+    parser.add_argument("--pack-size", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.3, help="stub seconds per request")
+    parser.add_argument("--per-item", type=float, default=0.02, help="stub seconds per transcript")
+    args = parser.parse_args()
+    asyncio.run(main(args.transcripts, args.pack_size, args.concurrency, args.latency, args.per_item))
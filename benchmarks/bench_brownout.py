@@ -0,0 +1,127 @@
+"""
+Tail latency of triage calls through an upstream brownout.
+
+Simulates an LLM provider that serves `--capacity` calls at once in
+`--latency` seconds (calls beyond capacity queue at the provider). During
+the middle third of the run it browns out: latency is multiplied by
+`--slowdown` and capacity halves. Clients send triage calls at a fixed rate
+and give up after `--deadline` seconds, which counts as a failed triage.
+
+Each phase is run twice: calling the provider directly, and through
+app.services.resilience.Provider (adaptive limit, circuit breaker, call
+timeout) with the local red-flag rules as the fallback answer. Reports
+p50 / p99 time to a triage answer, how many came from the fallback and how
+many clients got no answer at all.
+
+    python -m benchmarks.bench_brownout --rate 100 --seconds 9 --slowdown 20
+"""
+import argparse
+import asyncio
+import os
+import time
+from typing import Dict, List
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+os.environ.setdefault("API_KEY", "benchmark")
+os.environ.setdefault("ALERT_THRESHOLD", "0.5")
+
+from app.services.resilience import AdaptiveLimiter, CircuitBreaker, Provider, ProviderUnavailable  # noqa: E402
+from app.services.triage_rules import pretriage  # noqa: E402
+
+
+class SimulatedProvider:
+    def __init__(self, latency: float, capacity: int):
+        self.latency = latency
+        self.capacity = capacity
+        self.slowdown = 1.0
+        self.inflight = 0
+        self.peak = 0
+        self._slots = asyncio.Semaphore(capacity)
+
+    def brownout(self, slowdown: float) -> None:
+        self.slowdown = slowdown
+        self._slots = asyncio.Semaphore(max(1, self.capacity // 2))
+
+    def recover(self) -> None:
+        self.slowdown = 1.0
+        self._slots = asyncio.Semaphore(self.capacity)
+
+    async def complete(self, text: str) -> Dict[str, str]:
+        self.inflight += 1
+        self.peak = max(self.peak, self.inflight)
+        try:
+            async with self._slots:
+                await asyncio.sleep(self.latency * self.slowdown)
+            return {"urgency": "MEDIUM"}
+        finally:
+            self.inflight -= 1
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+async def run(args, guarded: bool) -> None:
+    upstream = SimulatedProvider(args.latency, args.capacity)
+    provider = Provider(
+        "llm",
+        timeout=args.latency * 4,
+        limiter=AdaptiveLimiter("llm", initial=args.capacity, min_limit=1, max_limit=4 * args.capacity,
+                                max_queue=4 * args.capacity, queue_timeout=args.latency * 4),
+        breaker=CircuitBreaker("llm", failure_threshold=5, reset_after=1.0),
+    )
+    phases = {"healthy": [], "brownout": [], "recovery": []}
+    fallbacks = {phase: 0 for phase in phases}
+    unanswered = {phase: 0 for phase in phases}
+
+    async def one(phase: str, text: str) -> None:
+        started = time.perf_counter()
+
+        async def triage():
+            if not guarded:
+                return await upstream.complete(text)
+            try:
+                return await provider.call(lambda: upstream.complete(text))
+            except ProviderUnavailable:
+                fallbacks[phase] += 1
+                return pretriage(text)
+
+        try:
+            await asyncio.wait_for(triage(), args.deadline)
+            phases[phase].append(time.perf_counter() - started)
+        except asyncio.TimeoutError:
+            unanswered[phase] += 1
+
+    tasks = []
+    third = args.seconds / 3
+    started = time.perf_counter()
+    for i in range(int(args.rate * args.seconds)):
+        elapsed = i / args.rate
+        phase = "healthy" if elapsed < third else "brownout" if elapsed < 2 * third else "recovery"
+        if phase == "brownout" and upstream.slowdown == 1.0:
+            upstream.brownout(args.slowdown)
+        elif phase == "recovery" and upstream.slowdown != 1.0:
+            upstream.recover()
+        await asyncio.sleep(max(0.0, started + elapsed - time.perf_counter()))
+        tasks.append(asyncio.create_task(one(phase, "I feel dizzy and my chest hurts")))
+    await asyncio.gather(*tasks)
+
+    print(f"{'guarded' if guarded else 'direct'}: peak {upstream.peak} calls in flight at the provider")
+    for phase, latencies in phases.items():
+        print(f"  {phase:9s} p50 {percentile(latencies, 0.5) * 1000:7.0f} ms  p99 {percentile(latencies, 0.99) * 1000:7.0f} ms"
+              f"  fallback {fallbacks[phase]:4d}  no answer {unanswered[phase]:4d}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=100.0, help="triage calls per second")
+    parser.add_argument("--seconds", type=float, default=9.0)
+    parser.add_argument("--latency", type=float, default=0.2, help="healthy provider latency (s)")
+    parser.add_argument("--capacity", type=int, default=32, help="calls the provider serves at once")
+    parser.add_argument("--slowdown", type=float, default=20.0, help="latency multiplier during the brownout")
+    parser.add_argument("--deadline", type=float, default=10.0, help="client gives up after this long (s)")
+    args = parser.parse_args()
+
+    asyncio.run(run(args, guarded=False))
+    asyncio.run(run(args, guarded=True))
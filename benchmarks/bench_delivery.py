@@ -0,0 +1,118 @@
+"""
+Pooled delivery clients vs. the old per-call transports.
+
+Starts a stub SMTP server and a stub webhook server on localhost, then sends
+the same burst of email + webhook alerts twice: once with the original
+per-call code (new SMTP session / new httpx.AsyncClient per send) and once
+through the shared clients in app.services.alerting.
+
+    python -m benchmarks.bench_delivery --messages 200 --concurrency 20 --latency 0.002
+"""
+import argparse
+import asyncio
+import os
+import smtplib
+import time
+from email.message import EmailMessage
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+os.environ.setdefault("API_KEY", "benchmark")
+os.environ.setdefault("ALERT_THRESHOLD", "0.5")
+
+import httpx  # noqa: E402
+
+from benchmarks.stubs import StubHTTPServer, StubSMTPServer  # noqa: E402
+
+
+def _legacy_send_email(host: str, port: int, to_email: str) -> bool:
+    # the pre-pool code path: connect + login + send + quit for every message
+    msg = EmailMessage()
+    msg["From"] = "bench@example.com"
+    msg["To"] = to_email
+    msg["Subject"] = "[ALERT] Urgency: HIGH"
+    msg.set_content("benchmark alert")
+    server = smtplib.SMTP(host, port, timeout=10)
+    server.login("bench", "secret")
+    server.send_message(msg)
+    server.quit()
+    return True
+
+
+async def _legacy_send_webhook(url: str) -> bool:
+    async with httpx.AsyncClient(timeout=10.0) as client:
+        resp = await client.post(url, json={"message": "benchmark alert", "urgency": "HIGH"})
+        return resp.status_code < 400
+
+
+async def _burst(make_call, messages: int, concurrency: int) -> float:
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with sem:
+            assert await make_call(i)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(messages)))
+    return time.perf_counter() - start
+
+
+def _report(label: str, elapsed: float, messages: int, connections: int) -> None:
+    print(
+        f"{label:<18} {elapsed * 1000:9.1f} ms total  "
+        f"{elapsed / messages * 1e6:9.1f} us/msg  {connections:5d} connections"
+    )
+
+
+async def main(messages: int, concurrency: int, latency: float) -> None:
+    with StubSMTPServer(latency=latency) as smtp, StubHTTPServer(latency=latency) as http:
+        host, port = smtp.address
+        os.environ.update(
+            SMTP_HOST=host,
+            SMTP_PORT=str(port),
+            SMTP_USER="bench",
+            SMTP_PASSWORD="secret",
+            SMTP_STARTTLS="false",
+            SMTP_POOL_SIZE=str(min(concurrency, 8)),
+        )
+        from app.services import alerting
+
+        hook = http.url + "/hook"
+
+        print(f"{messages} messages, concurrency {concurrency}, stub latency {latency * 1000:.1f} ms/op")
+
+        elapsed = await _burst(
+            lambda i: asyncio.to_thread(_legacy_send_email, host, port, f"doc{i}@example.com"),
+            messages, concurrency,
+        )
+        _report("email per-call", elapsed, messages, smtp.connections)
+
+        before = smtp.connections
+        await alerting.start_delivery_clients()
+        try:
+            elapsed = await _burst(
+                lambda i: alerting.send_email(f"doc{i}@example.com", "[ALERT] Urgency: HIGH", "benchmark alert"),
+                messages, concurrency,
+            )
+            _report("email pooled", elapsed, messages, smtp.connections - before)
+
+            before = http.connections
+            elapsed = await _burst(lambda i: _legacy_send_webhook(hook), messages, concurrency)
+            _report("webhook per-call", elapsed, messages, http.connections - before)
+
+            before = http.connections
+            elapsed = await _burst(
+                lambda i: alerting.send_webhook(hook, {"message": "benchmark alert", "urgency": "HIGH"}),
+                messages, concurrency,
+            )
+            _report("webhook pooled", elapsed, messages, http.connections - before)
+        finally:
+            await alerting.close_delivery_clients()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.002, help="stub latency per SMTP command / HTTP request (s)")
+    args = parser.parse_args()
+    asyncio.run(main(args.messages, args.concurrency, args.latency))
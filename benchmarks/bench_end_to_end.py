@@ -0,0 +1,304 @@
+"""
+End-to-end load test of /api/v1/patient_alert/patient_alert.
+
+Runs the real app in a uvicorn process with every external service replaced
+by a local stand-in (benchmarks/stubs.py): an OpenAI-compatible server for
+/audio/transcriptions and /chat/completions with configurable latency, an
+SMTP sink, a Twilio REST stub and a webhook sink. With the default outbox
+delivery mode the real outbox worker runs in a second process.
+
+The client uploads a synthetic voice note per request (a few bytes differ
+each time, so the transcription cache does not absorb the load) at the given
+concurrency and reports throughput, latency percentiles for each server-side
+stage (upload, transcribe, triage, dispatch and their sub-spans, read from the
+app's Server-Timing header) and end to end, the time until
+every planned delivery reached a sink, and the peak RSS of each process.
+With SQLite (the default) the API, the worker and the audit writer share
+one write lock, which shows up in the dispatch stage; pass --database-url
+to measure against Postgres.
+
+    python -m benchmarks.bench_end_to_end --requests 500 --concurrency 32 --openai-latency 0.3
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from typing import Dict, List
+
+import httpx
+import numpy as np
+
+from benchmarks.stubs import TWILIO_ACCOUNT_SID, StubHTTPServer, StubSMTPServer, openai_routes, twilio_routes
+
+STAGES = ("upload", "transcribe", "triage", "dispatch")
+ONCALL_EMAILS = ["oncall@example.com"]
+ONCALL_PHONES = ["+15550100"]
+
+# --- server side -------------------------------------------------------------
+
+def _use_stub_twilio() -> None:
+    from app.core.config import settings
+    from app.services.clients import clients
+    from benchmarks.stubs import twilio_client_class
+
+    stub = twilio_client_class(os.environ["BENCH_TWILIO_URL"])
+    clients.set("twilio", stub(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN))
+
+
+def create_app():
+    """uvicorn --factory entry point: the real app with Twilio pointed at the stub."""
+    from app.main import app
+
+    _use_stub_twilio()
+    return app
+
+
+def run_stub_worker(consumers: int) -> None:
+    from workers.worker import run_worker
+
+    _use_stub_twilio()
+    asyncio.run(run_worker(consumers, batch_size=50, poll_seconds=0.05))
+
+
+# --- client side -------------------------------------------------------------
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _status_kb(pid: int, field: str) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    raise RuntimeError(f"{field} not available")
+
+
+def _wait_ready(url: str, server: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            # /ready: the provider clients are built, so the first requests measure the steady state
+            if httpx.get(url + "/ready", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+def voice_note(seconds: float, rate: int = 16000) -> bytes:
+    """A WAV with voiced bursts between pauses, so the VAD has real work to do."""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * rate)) / rate
+    voice = 0.4 * np.sin(2 * np.pi * 170 * t) * (np.sin(2 * np.pi * 0.4 * t) > 0)
+    signal = voice + 0.003 * rng.standard_normal(len(t))
+    path = tempfile.mktemp(suffix=".wav")
+    try:
+        with wave.open(path, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(rate)
+            w.writeframes((signal * 32767).astype("<i2").tobytes())
+        with open(path, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(path)
+
+
+def _transcripts(urgent_every: int):
+    counter = itertools.count()
+
+    def next_transcript() -> str:
+        i = next(counter)
+        if urgent_every and i % urgent_every == 0:
+            return f"I have crushing chest pain and it is hard to breathe (note {i})"
+        return f"Mild headache since this morning, otherwise fine (note {i})"
+
+    return next_transcript
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else float("nan")
+
+
+async def drive(url: str, note: bytes, requests: int, concurrency: int, patients: int):
+    latencies: List[float] = []
+    stages: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    statuses: Dict[int, int] = {}
+    planned = suppressed = 0
+    errors: List[str] = []
+    counter = itertools.count()
+
+    async def one(client: httpx.AsyncClient, i: int) -> None:
+        nonlocal planned, suppressed
+        body = bytearray(note)
+        body[-4:] = i.to_bytes(4, "little")  # unique audio hash per request
+        started = time.perf_counter()
+        resp = await client.post(
+            url + "/api/v1/patient_alert/patient_alert",
+            data={"user_id": f"patient-{i % patients}"},
+            files={"file": ("note.wav", bytes(body), "audio/wav")},
+        )
+        latencies.append((time.perf_counter() - started) * 1000)
+        statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+        # per-stage spans of the app's own instrumentation (METRICS_SERVER_TIMING)
+        for item in filter(None, resp.headers.get("server-timing", "").split(",")):
+            stage, duration = item.strip().split(";dur=")
+            if stage != "total":
+                stages.setdefault(stage, []).append(float(duration))
+        if resp.status_code != 200:
+            errors.append(f"{resp.status_code}: {resp.text[:200]}")
+        else:
+            result = resp.json()
+            planned += sum(len(recipients) for recipients in result["alert_results"].values())
+            suppressed += result.get("alert_suppressed", False)
+
+    async def run_client(client: httpx.AsyncClient) -> None:
+        while (i := next(counter)) < requests:
+            await one(client, i)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=300.0, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(run_client(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return elapsed, latencies, stages, statuses, planned, suppressed, errors
+
+
+def main(args) -> None:
+    urgent_every = round(1 / args.alert_ratio) if args.alert_ratio else 0
+    routes = openai_routes(per_item_latency=args.triage_latency, transcript=_transcripts(urgent_every))
+    workdir = tempfile.TemporaryDirectory()
+    processes: List[subprocess.Popen] = []
+    with StubHTTPServer(routes, latency=args.openai_latency) as openai_stub, \
+            StubSMTPServer(latency=args.smtp_latency) as smtp, \
+            StubHTTPServer(twilio_routes(), latency=args.sms_latency) as twilio, \
+            StubHTTPServer(latency=args.webhook_latency) as webhook:
+        smtp_host, smtp_port = smtp.address
+        port = _free_port()
+        env = dict(
+            os.environ,
+            DATABASE_URL=args.database_url or f"sqlite:///{os.path.join(workdir.name, 'bench.db')}",
+            API_KEY="benchmark",
+            ALERT_THRESHOLD="0.5",
+            OPENAI_BASE_URL=openai_stub.url + "/v1",
+            SMTP_HOST=smtp_host,
+            SMTP_PORT=str(smtp_port),
+            SMTP_USER="bench",
+            SMTP_PASSWORD="bench",
+            SMTP_STARTTLS="false",
+            TWILIO_ACCOUNT_SID=TWILIO_ACCOUNT_SID,
+            TWILIO_AUTH_TOKEN="stub",
+            TWILIO_FROM_NUMBER="+15550000",
+            BENCH_TWILIO_URL=twilio.url,
+            ALERT_SERVICE_URL=webhook.url + "/hook",
+            ALERT_ONCALL_EMAILS=json.dumps(ONCALL_EMAILS),
+            ALERT_ONCALL_PHONES=json.dumps(ONCALL_PHONES),
+            ALERT_DELIVERY_MODE=args.delivery_mode,
+            METRICS_SERVER_TIMING="true",
+        )
+        # app logs would drown the report; keep them for a failed run
+        log_path = os.path.join(workdir.name, "server.log")
+        log = open(log_path, "w")
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "--factory", "benchmarks.bench_end_to_end:create_app",
+             "--port", str(port), "--log-level", "warning"],
+            env=env, stdout=log, stderr=subprocess.STDOUT,
+        )
+        processes.append(server)
+        worker = None
+        try:
+            url = f"http://127.0.0.1:{port}"
+            _wait_ready(url, server)
+            if args.delivery_mode == "outbox":
+                worker = subprocess.Popen(
+                    [sys.executable, "-m", "benchmarks.bench_end_to_end", "--run-worker", str(args.worker_consumers)],
+                    env=env, stdout=log, stderr=subprocess.STDOUT,
+                )
+                processes.append(worker)
+            idle = _status_kb(server.pid, "VmRSS")
+            note = voice_note(args.audio_seconds)
+            print(
+                f"{args.requests} requests, concurrency {args.concurrency}, {args.audio_seconds:.0f} s notes, "
+                f"{args.patients} patients, delivery {args.delivery_mode}, OpenAI stub {args.openai_latency * 1000:.0f} ms"
+            )
+
+            started = time.perf_counter()
+            elapsed, latencies, stages, statuses, planned, suppressed, errors = asyncio.run(
+                drive(url, note, args.requests, args.concurrency, args.patients)
+            )
+            ok = statuses.get(200, 0)
+            print(f"throughput {ok / elapsed:8.1f} req/s   {elapsed:6.2f} s   status {dict(sorted(statuses.items()))}")
+            if errors:
+                print(f"first error ({len(errors)} total): {errors[0]}")
+            print(f"{'stage':12s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'n':>6s}")
+            for stage, values in [*stages.items(), ("end to end", latencies)]:
+                if values:
+                    print(f"{stage:12s} {percentile(values, 0.5):9.1f} {percentile(values, 0.95):9.1f} "
+                          f"{percentile(values, 0.99):9.1f} {len(values):6d}")
+
+            def delivered() -> int:
+                return smtp.messages + twilio.requests + webhook.requests
+
+            deadline = time.monotonic() + args.drain_timeout
+            while delivered() < planned and time.monotonic() < deadline:
+                time.sleep(0.05)
+            drained = time.perf_counter() - started
+            print(
+                f"deliveries {delivered()}/{planned} planned (email {smtp.messages}, sms {twilio.requests}, "
+                f"webhook {webhook.requests}), {suppressed} alerts suppressed, all delivered after {drained:.2f} s"
+            )
+            print(f"memory: server idle {idle:.0f} MB, peak {_status_kb(server.pid, 'VmHWM'):.0f} MB"
+                  + (f"; worker peak {_status_kb(worker.pid, 'VmHWM'):.0f} MB" if worker else ""))
+            print(f"OpenAI stub calls {openai_stub.requests}")
+        except Exception:
+            log.flush()
+            with open(log_path) as f:
+                print("".join(f.readlines()[-40:]), file=sys.stderr)
+            raise
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.wait()
+            log.close()
+            workdir.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--patients", type=int, default=None, help="distinct user_ids (default: one per request)")
+    parser.add_argument("--audio-seconds", type=float, default=10.0)
+    parser.add_argument("--alert-ratio", type=float, default=0.25, help="share of notes triaged HIGH")
+    parser.add_argument("--delivery-mode", choices=("outbox", "background"), default="outbox")
+    parser.add_argument("--worker-consumers", type=int, default=4)
+    parser.add_argument("--openai-latency", type=float, default=0.2, help="seconds per OpenAI request")
+    parser.add_argument("--triage-latency", type=float, default=0.0, help="extra seconds per triaged transcript")
+    parser.add_argument("--smtp-latency", type=float, default=0.005)
+    parser.add_argument("--sms-latency", type=float, default=0.05)
+    parser.add_argument("--webhook-latency", type=float, default=0.02)
+    parser.add_argument("--drain-timeout", type=float, default=60.0)
+    parser.add_argument("--database-url", help="outbox / audit database (default: a temporary SQLite file)")
+    parser.add_argument("--run-worker", type=int, metavar="CONSUMERS", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run_worker:
+        run_stub_worker(args.run_worker)
+    else:
+        args.patients = args.patients or args.requests
+        main(args)
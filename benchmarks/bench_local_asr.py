@@ -0,0 +1,106 @@
+"""
+Local (offline) transcription throughput per core.
+
+Transcribes a batch of clips with the warm process-pool engine for each
+worker count, and once through SpeechRecognition's recognize_sphinx, which
+loads the model on every call (what a naive integration would do). Reports
+audio seconds transcribed per wall second, overall and per worker core.
+Synthetic clips measure engine cost only; pass --audio for a real recording.
+
+    python -m benchmarks.bench_local_asr --clips 16 --clip-seconds 10 --workers 1 2 4
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+from app.services.local_asr import LocalTranscriber
+from app.utils.audio import load_samples
+
+RATE = 16000
+
+
+def write_clip(path: str, seconds: float, seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * RATE)) / RATE
+    # voiced-ish bursts with a wandering pitch, separated by short pauses
+    pitch = 140 + 40 * np.sin(2 * np.pi * 0.7 * t + seed)
+    voice = np.sin(2 * np.pi * np.cumsum(pitch) / RATE) * (np.sin(2 * np.pi * 1.5 * t) > -0.3)
+    signal = 0.4 * voice + 0.01 * rng.standard_normal(len(t))
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(RATE)
+        w.writeframes((signal * 32767).astype(np.int16).tobytes())
+
+
+def clip_seconds(path: str) -> float:
+    return len(load_samples(path)) / RATE
+
+
+def bench_cold(clips):
+    import speech_recognition as sr
+
+    recognizer = sr.Recognizer()
+    start = time.perf_counter()
+    for path in clips:
+        with sr.AudioFile(path) as source:
+            audio = recognizer.record(source)
+        try:
+            recognizer.recognize_sphinx(audio)
+        except sr.UnknownValueError:
+            pass
+    return time.perf_counter() - start
+
+
+async def bench_warm(clips, engine, model, workers):
+    transcriber = LocalTranscriber(engine, model, workers)
+    try:
+        started = time.perf_counter()
+        await transcriber.start()
+        warmup = time.perf_counter() - started
+        start = time.perf_counter()
+        await asyncio.gather(*(transcriber.transcribe(path) for path in clips))
+        return warmup, time.perf_counter() - start
+    finally:
+        transcriber.shutdown()
+
+
+def report(label, audio_seconds, elapsed, cores):
+    speed = audio_seconds / elapsed
+    print(f"{label:24s} {elapsed:7.2f} s  {speed:6.2f}x realtime  {speed / cores:6.2f}x realtime per core")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clips", type=int, default=16)
+    parser.add_argument("--clip-seconds", type=float, default=10.0)
+    parser.add_argument("--audio", help="use this recording for every clip instead of synthetic audio")
+    parser.add_argument("--engine", default="sphinx")
+    parser.add_argument("--model")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.audio:
+            clips = [args.audio] * args.clips
+        else:
+            clips = []
+            for i in range(args.clips):
+                path = os.path.join(workdir, f"clip_{i}.wav")
+                write_clip(path, args.clip_seconds, seed=i)
+                clips.append(path)
+        audio_seconds = sum(clip_seconds(path) for path in clips)
+        cores = os.cpu_count() or 1
+        print(f"{len(clips)} clips, {audio_seconds:.0f} s of audio, {cores} CPU(s), engine {args.engine}")
+
+        if args.engine == "sphinx":
+            report("SpeechRecognition (cold)", audio_seconds, bench_cold(clips), 1)
+        for workers in sorted(set(args.workers)):
+            warmup, elapsed = asyncio.run(bench_warm(clips, args.engine, args.model, workers))
+            report(f"pool x{workers} (warm)", audio_seconds, elapsed, min(workers, cores))
+            print(f"{'':24s} warm-up (spawn + model load) {warmup:.2f} s, paid once at startup")
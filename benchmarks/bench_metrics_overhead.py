@@ -0,0 +1,80 @@
+"""
+Cost of one latency span (app/core/metrics.py).
+
+Times a `with span(...)` block and a `@timed` coroutine against the same
+empty body without instrumentation, outside a request and inside one that
+collects Server-Timing entries, and reports the added nanoseconds per span.
+
+    python -m benchmarks.bench_metrics_overhead --iterations 1000000
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+os.environ.setdefault("API_KEY", "benchmark")
+os.environ.setdefault("ALERT_THRESHOLD", "0.5")
+
+from app.core import metrics  # noqa: E402
+from app.core.metrics import span, timed  # noqa: E402
+
+
+def per_call_ns(fn, iterations: int) -> float:
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter_ns()
+        fn(iterations)
+        best = min(best, (time.perf_counter_ns() - start) / iterations)
+    return best
+
+
+def bare_block(n: int) -> None:
+    for _ in range(n):
+        pass
+
+
+def span_block(n: int) -> None:
+    for _ in range(n):
+        with span("bench"):
+            pass
+
+
+async def work():
+    return None
+
+
+timed_work = timed("bench")(work)
+
+
+def coroutine_loop(func):
+    def run(n: int) -> None:
+        async def calls():
+            for _ in range(n):
+                await func()
+
+        asyncio.run(calls())
+
+    return run
+
+
+def report(iterations: int) -> None:
+    bare, spanned = per_call_ns(bare_block, iterations), per_call_ns(span_block, iterations)
+    plain, decorated = per_call_ns(coroutine_loop(work), iterations), per_call_ns(coroutine_loop(timed_work), iterations)
+    print(f"  with span(...)    {spanned - bare:7.0f} ns per span")
+    print(f"  @timed coroutine  {decorated - plain:7.0f} ns per call")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print("outside a request")
+    report(args.iterations)
+    print("inside a request (Server-Timing collection)")
+    token = metrics._request_timings.set({})
+    try:
+        report(args.iterations)
+    finally:
+        metrics._request_timings.reset(token)
@@ -0,0 +1,76 @@
+"""
+Red-flag pre-triage throughput on a synthetic transcript corpus.
+
+Compares the compiled single-regex matcher with the equivalent naive loop
+(lower() + substring scan per phrase) and reports per-transcript latency.
+
+    python -m benchmarks.bench_pretriage --transcripts 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+os.environ.setdefault("API_KEY", "benchmark")
+os.environ.setdefault("ALERT_THRESHOLD", "0.5")
+
+from app.services.triage_rules import DEFAULT_LEXICON, pretriage  # noqa: E402
+
+FILLER = (
+    "hi doctor this is a quick voice note", "I wanted to let you know", "since this morning",
+    "my daughter is with me", "I took my tablets as usual", "it started after lunch",
+    "I am at home right now", "please call me back when you can", "not sure if this matters",
+    "the weather has been cold", "I slept badly last night", "my blood pressure was fine yesterday",
+)
+FINDINGS = [phrase for _, phrases in DEFAULT_LEXICON.values() for phrase in phrases]
+
+
+def make_corpus(n: int, seed: int = 7):
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(n):
+        parts = rng.sample(FILLER, rng.randint(3, 8))
+        for _ in range(rng.choice((0, 0, 1, 2))):
+            parts.insert(rng.randrange(len(parts) + 1), rng.choice(FINDINGS))
+        corpus.append(", ".join(parts) + ".")
+    return corpus
+
+
+def naive_pretriage(text: str):
+    tags = []
+    for tag, (_, phrases) in DEFAULT_LEXICON.items():
+        for phrase in phrases:
+            if phrase in text.lower():
+                tags.append(tag)
+                break
+    return tags
+
+
+def run(label, fn, corpus):
+    samples = []
+    start = time.perf_counter()
+    for text in corpus:
+        t0 = time.perf_counter()
+        fn(text)
+        samples.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    samples.sort()
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    print(
+        f"{label:<10} {len(corpus) / elapsed:10.0f} transcripts/s  "
+        f"median {statistics.median(samples) * 1e6:6.1f} us  p99 {p99 * 1e6:6.1f} us"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transcripts", type=int, default=100_000)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.transcripts)
+    high = sum(pretriage(t)["urgency"] == "HIGH" for t in corpus)
+    print(f"{len(corpus)} transcripts, {len(FINDINGS)} lexicon phrases, {high} flagged HIGH")
+    run("naive", naive_pretriage, corpus)
+    run("compiled", pretriage, corpus)
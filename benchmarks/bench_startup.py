@@ -0,0 +1,131 @@
+"""
+Cold start of the API: import time and time to the first request.
+
+1. `python -X importtime -c "import app.main"`, repeated `--imports` times:
+   the median total and the heaviest top-level packages of one run.
+2. uvicorn started `--starts` times per configuration, timing (from spawn)
+   the first answer on / (process up, lifespan done), the first 200 on
+   /ready (preloaded clients built, database reachable) and the first triage
+   request that reaches the OpenAI stub (benchmarks/stubs.py) right after
+   readiness. Configurations: CLIENT_PRELOAD as configured (warm in the
+   background after startup) and CLIENT_PRELOAD=[] (everything built by the
+   first request that needs it).
+
+The local ASR fallback pool is disabled unless --with-local-asr is passed.
+It starts in the background, so with it "up" stays fast and "ready" waits
+for its worker processes to load the model.
+
+    python -m benchmarks.bench_startup --imports 5 --starts 3
+"""
+import argparse
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+import httpx
+
+from benchmarks.stubs import StubHTTPServer, openai_routes
+
+BASE_ENV = {"DATABASE_URL": "sqlite:///:memory:", "API_KEY": "benchmark", "ALERT_THRESHOLD": "0.5"}
+IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| *(\S+)")
+
+
+def import_profile(env: Dict[str, str]) -> Tuple[float, List[Tuple[str, float]]]:
+    """Seconds to import app.main and the packages that take longest to import (own time)."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"], env=env, capture_output=True, text=True, check=True
+    )
+    total, packages = 0.0, {}
+    for match in IMPORTTIME.finditer(out.stderr):
+        own, cumulative, name = int(match[1]) / 1e6, int(match[2]) / 1e6, match[3]
+        if name == "app.main":
+            total = cumulative
+        # every module is listed once, where it was first imported: sum the self times per package
+        root = name.split(".")[0]
+        packages[root] = packages.get(root, 0.0) + own
+    return total, sorted(packages.items(), key=lambda item: -item[1])
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _poll(url: str, server: subprocess.Popen, ok, deadline: float) -> None:
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            if ok(httpx.get(url, timeout=1.0)):
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.005)
+    raise RuntimeError(f"{url} did not answer in time")
+
+
+def cold_start(env: Dict[str, str], timeout: float = 120.0) -> Dict[str, float]:
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryFile("w+") as log:
+        started = time.monotonic()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+            env=env, stdout=log, stderr=subprocess.STDOUT,
+        )
+        try:
+            deadline = started + timeout
+            _poll(url + "/", server, lambda r: True, deadline)
+            up = time.monotonic() - started
+            _poll(url + "/ready", server, lambda r: r.status_code == 200, deadline)
+            ready = time.monotonic() - started
+            sent = time.monotonic()
+            response = httpx.post(url + "/api/v1/profiling/profile/batch",
+                                  json={"transcripts": ["I have a mild headache"]}, timeout=30.0)
+            response.raise_for_status()
+            first = time.monotonic() - sent
+        except Exception:
+            log.seek(0)
+            sys.stderr.write(log.read())
+            raise
+        finally:
+            server.terminate()
+            server.wait(10)
+    return {"up": up, "ready": ready, "first_request": first}
+
+
+def main(args) -> None:
+    env = dict(os.environ, **BASE_ENV)
+    env["TRANSCRIPTION_FALLBACK_BACKEND"] = "local" if args.with_local_asr else "none"
+
+    runs = [import_profile(env) for _ in range(args.imports)]
+    print(f"import app.main: median {statistics.median(total for total, _ in runs) * 1000:.0f} ms over {args.imports} runs")
+    for name, seconds in runs[0][1][:args.top]:
+        print(f"  {name:24s} {seconds * 1000:7.1f} ms")
+
+    with StubHTTPServer(openai_routes()) as stub:
+        env["OPENAI_BASE_URL"] = stub.url + "/v1"
+        for label, preload in (("preload in background", None), ("no preload", "[]")):
+            run_env = dict(env)
+            if preload is not None:
+                run_env["CLIENT_PRELOAD"] = preload
+            results = [cold_start(run_env) for _ in range(args.starts)]
+            print(f"{label}: " + "  ".join(
+                f"{key} {statistics.median(r[key] for r in results) * 1000:6.0f} ms" for key in ("up", "ready", "first_request")
+            ))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--imports", type=int, default=5, help="-X importtime runs")
+    parser.add_argument("--starts", type=int, default=3, help="cold starts per configuration")
+    parser.add_argument("--top", type=int, default=10, help="heaviest packages listed")
+    parser.add_argument("--with-local-asr", action="store_true", help="start the local ASR fallback pool")
+    main(parser.parse_args())
@@ -0,0 +1,112 @@
+"""
+Peak server memory for /patient_alert uploads of different sizes.
+
+For each size a fresh uvicorn process serves the real app (transcription and
+LLM stubbed out, LOW urgency so no alert is queued). The client streams the
+file from disk and the server's peak RSS (VmHWM) is read from /proc
+afterwards. With chunked streaming to disk, peak RSS should stay flat as the
+upload grows.
+
+    python -m benchmarks.bench_upload_memory --sizes-mb 1 10 100
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+
+def create_stub_app():
+    # uvicorn --factory entry point, runs inside the server process
+    from app.api.v1.endpoints import patient_alert
+    from app.main import app
+
+    async def fake_transcribe(path: str):
+        return {"text": "mild headache since this morning", "seconds_removed": None}
+
+    async def fake_profile(text: str):
+        return {"urgency": "LOW", "tags": ["headache"], "reason": "benchmark stub"}
+
+    patient_alert.transcribe_audio_with_stats = fake_transcribe
+    patient_alert.profile_text = fake_profile
+    return app
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _peak_rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    raise RuntimeError("VmHWM not available")
+
+
+def _wait_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url + "/", timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+def measure(size_mb: int, workdir: str) -> None:
+    audio = os.path.join(workdir, f"note_{size_mb}mb.wav")
+    with open(audio, "wb") as f:
+        block = os.urandom(1024 * 1024)
+        for _ in range(size_mb):
+            f.write(block)
+
+    port = _free_port()
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        API_KEY="benchmark",
+        ALERT_THRESHOLD="0.5",
+        MAX_UPLOAD_BYTES=str((size_mb + 1) * 1024 * 1024),
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "--factory", "benchmarks.bench_upload_memory:create_stub_app",
+         "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_ready(url)
+        baseline = _peak_rss_mb(server.pid)
+        start = time.perf_counter()
+        with open(audio, "rb") as f:
+            resp = httpx.post(
+                url + "/api/v1/patient_alert/patient_alert",
+                data={"user_id": "bench"},
+                files={"file": (os.path.basename(audio), f, "audio/wav")},
+                timeout=300.0,
+            )
+        elapsed = time.perf_counter() - start
+        resp.raise_for_status()
+        peak = _peak_rss_mb(server.pid)
+        print(f"{size_mb:6d} MB upload  {elapsed:7.2f} s  peak RSS {peak:7.1f} MB  (idle {baseline:6.1f} MB, +{peak - baseline:5.1f} MB)")
+    finally:
+        server.terminate()
+        server.wait()
+        os.remove(audio)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes-mb", type=int, nargs="+", default=[1, 100])
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes_mb:
+            measure(size, workdir)
@@ -0,0 +1,236 @@
+"""
+Local stand-in servers used by the benchmarks. Everything binds to 127.0.0.1
+on an ephemeral port and runs in a daemon thread, so a benchmark can start a
+stub, point settings at it and measure our client code without any network.
+"""
+import json
+import socketserver
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+# handler(path, body) -> (status, json payload)
+Route = Callable[[str, bytes], Tuple[int, Any]]
+
+
+class _StubHTTPHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so pooled clients can reuse sockets
+
+    def log_message(self, *args):
+        pass
+
+    def _handle(self):
+        server: "StubHTTPServer" = self.server.stub  # type: ignore[attr-defined]
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        if server.latency:
+            time.sleep(server.latency)
+        route = server.routes.get(self.path.split("?", 1)[0], server.default_route)
+        status, payload = route(self.path, body)
+        data = json.dumps(payload).encode()
+        with server.lock:
+            server.requests += 1
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = _handle
+    do_POST = _handle
+
+    def setup(self):
+        super().setup()
+        server: "StubHTTPServer" = self.server.stub  # type: ignore[attr-defined]
+        with server.lock:
+            server.connections += 1
+
+
+class _QuietThreadingHTTPServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # clients hanging up mid-response (timeouts, shutdown) are expected under load
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StubHTTPServer:
+    """
+    Threaded HTTP/1.1 server answering JSON. `routes` maps a path to a
+    handler; unknown paths get `{"ok": true}`. `latency` is added to every
+    request to mimic a remote provider.
+    """
+
+    def __init__(self, routes: Optional[Dict[str, Route]] = None, latency: float = 0.0):
+        self.routes = routes or {}
+        self.latency = latency
+        self.requests = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+        self._httpd = _QuietThreadingHTTPServer(("127.0.0.1", 0), _StubHTTPHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.stub = self  # type: ignore[attr-defined]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @staticmethod
+    def default_route(path: str, body: bytes) -> Tuple[int, Any]:
+        return 200, {"ok": True}
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "StubHTTPServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+class _StubSMTPHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line: str) -> None:
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        server: "StubSMTPServer" = self.server.stub  # type: ignore[attr-defined]
+        with server.lock:
+            server.connections += 1
+        if server.latency:
+            time.sleep(server.latency)
+        self._reply("220 stub ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            cmd = line.decode(errors="replace").strip().upper()
+            if server.latency:
+                time.sleep(server.latency)
+            if cmd.startswith(("EHLO", "HELO")):
+                self.wfile.write(b"250-stub\r\n250-AUTH PLAIN\r\n250 8BITMIME\r\n")
+            elif cmd.startswith("AUTH"):
+                self._reply("235 2.7.0 Authentication successful")
+            elif cmd == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                with server.lock:
+                    server.messages += 1
+                self._reply("250 OK queued")
+            elif cmd == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:  # MAIL, RCPT, NOOP, RSET
+                self._reply("250 OK")
+
+
+class StubSMTPServer:
+    """
+    Minimal threaded SMTP sink: accepts AUTH PLAIN, swallows messages and
+    counts connections. No STARTTLS, so clients must run with it disabled.
+    `latency` is added to the greeting and every command reply.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.connections = 0
+        self.messages = 0
+        self.lock = threading.Lock()
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _StubSMTPHandler)
+        self._server.daemon_threads = True
+        self._server.stub = self  # type: ignore[attr-defined]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        host, port = self._server.server_address[:2]
+        return host, port
+
+    def __enter__(self) -> "StubSMTPServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _chat_completion(content: str) -> Dict[str, Any]:
+    return {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": "gpt-4o-mini",
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+
+def _stub_profile(transcript: str) -> Dict[str, Any]:
+    urgent = any(w in transcript.lower() for w in ("chest", "breathe", "fell", "bleeding"))
+    return {"urgency": "HIGH" if urgent else "LOW", "tags": [], "reason": "stub triage"}
+
+
+def openai_routes(
+    per_item_latency: float = 0.0, transcript: Union[str, Callable[[], str]] = "I have a mild headache"
+) -> Dict[str, Route]:
+    """
+    Routes for an OpenAI-compatible stub (point AsyncOpenAI at `<url>/v1`).
+    /chat/completions answers both single and packed (batch) triage prompts;
+    `per_item_latency` is added per transcript to mimic output-token time.
+    /audio/transcriptions returns `transcript`, or a fresh one per call when
+    it is a callable (so the triage cache does not absorb repeated requests).
+    """
+
+    def chat(path: str, body: bytes) -> Tuple[int, Any]:
+        request = json.loads(body)
+        user = request["messages"][-1]["content"]
+        if user.startswith("Patient transcripts as a JSON array"):
+            items = json.loads(user.split("\n")[1])
+            if per_item_latency:
+                time.sleep(per_item_latency * len(items))
+            results = [{"id": item["id"], **_stub_profile(item["transcript"])} for item in items]
+            return 200, _chat_completion(json.dumps({"results": results}))
+        if per_item_latency:
+            time.sleep(per_item_latency)
+        return 200, _chat_completion(json.dumps(_stub_profile(user)))
+
+    def transcribe(path: str, body: bytes) -> Tuple[int, Any]:
+        return 200, {"text": transcript() if callable(transcript) else transcript}
+
+    return {"/v1/chat/completions": chat, "/v1/audio/transcriptions": transcribe}
+
+
+TWILIO_ACCOUNT_SID = "ACstub"
+
+
+def twilio_routes(account_sid: str = TWILIO_ACCOUNT_SID) -> Dict[str, Route]:
+    """Twilio REST stub: Messages.json accepts every SMS (see twilio_client_class)."""
+
+    def create_message(path: str, body: bytes) -> Tuple[int, Any]:
+        return 201, {"sid": "SMstub", "account_sid": account_sid, "status": "queued"}
+
+    return {f"/2010-04-01/Accounts/{account_sid}/Messages.json": create_message}
+
+
+def twilio_client_class(base_url: str):
+    """
+    A twilio.rest.Client that talks to a stub at `base_url` instead of
+    api.twilio.com. Put an instance in the client registry
+    (app.services.clients) before the delivery clients are created.
+    """
+    from twilio.rest import Client
+
+    class StubTwilioClient(Client):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.api.base_url = base_url
+
+    return StubTwilioClient
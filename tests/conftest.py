@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+# Settings() is built at import time; give the test run harmless defaults.
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+os.environ.setdefault("API_KEY", "test")
+os.environ.setdefault("ALERT_THRESHOLD", "0.5")
+# audit rows go nowhere unless a test sets up its own database
+os.environ.setdefault("PERSIST_ENABLED", "false")
+# storm suppression would hide repeat alerts across tests
+os.environ.setdefault("ALERT_DEDUP_ENABLED", "false")
+# unacknowledged alerts would escalate in the background of unrelated tests
+os.environ.setdefault("ESCALATION_ENABLED", "false")
+
+
+class FakeClock:
+    """A clock moved by hand: pass it as `clock=` and set or advance `now`."""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture(autouse=True)
+def fresh_provider_guards():
+    # limiters and circuit breakers are per process; a test that fails a provider must not open it for the next
+    from app.services import resilience
+
+    resilience.reset_providers()
+    yield
@@ -0,0 +1,124 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.database import init_db
+from app.deps import get_database_session
+from app.models.alert import DeliveryAttempt
+from app.services import alert_history, persistence
+from app.services.persistence import BufferedWriter
+
+NOW = datetime(2026, 3, 1, 12, 0)
+
+
+@pytest.fixture
+def sessionmaker(tmp_path, monkeypatch):
+    # NullPool: seeded from one event loop, queried from the TestClient's
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'history.db'}", poolclass=NullPool)
+    sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+    writer = BufferedWriter(sessionmaker, batch_size=10_000, after_insert=persistence._mark_buffered_alerts_delivered)
+    monkeypatch.setattr(persistence, "audit_writer", writer)
+    monkeypatch.setattr(persistence.settings, "PERSIST_ENABLED", True)
+
+    async def seed():
+        await init_db(engine)
+        # 60 alerts, one a minute up to NOW: patients p0..p2, every 4th tagged "cardiac", every 5th undelivered;
+        # "high" is recorded in lower case and must be stored (and filtered) as HIGH
+        for i in range(60):
+            alert_id = f"a{i:02d}"
+            monkeypatch.setattr(persistence, "_utcnow", lambda: NOW - timedelta(minutes=59 - i))
+            persistence.record_alert(
+                alert_id, f"p{i % 3}", ("high", "MEDIUM", "LOW")[i // 3 % 3], f"message {i}", "outbox",
+                {"email": ["doc@example.com"]}, tags=["cardiac", "chest"] if i % 4 == 0 else ["fever"],
+            )
+            persistence.record_delivery_attempts(alert_id, {"email": {"doc@example.com": i % 5 != 0}})
+        await writer.close()
+
+    asyncio.run(seed())
+    return sessionmaker
+
+
+def _page_all(sessionmaker, **filters):
+    async def run():
+        ids, cursor = [], None
+        while True:
+            async with sessionmaker() as session:
+                items, cursor = await alert_history.query_alerts(session, fields=["id"], limit=7, cursor=cursor, **filters)
+            ids.extend(item["id"] for item in items)
+            if cursor is None:
+                return ids
+
+    return asyncio.run(run())
+
+
+def _expected(sessionmaker, predicate):
+    async def run():
+        async with sessionmaker() as session:
+            items, _ = await alert_history.query_alerts(session, limit=500)
+        return [item["id"] for item in items if predicate(item)]
+
+    return asyncio.run(run())
+
+
+def test_keyset_pages_cover_each_filter_exactly_once(sessionmaker):
+    everything = _page_all(sessionmaker)
+    assert everything == [f"a{i:02d}" for i in reversed(range(60))]
+
+    since = NOW - timedelta(minutes=30)
+    cases = [
+        ({"user_id": "p1", "urgency_level": "high", "since": since},
+         lambda a: a["user_id"] == "p1" and a["urgency_level"] == "HIGH" and a["created_at"] >= since),
+        ({"tag": "cardiac"}, lambda a: "cardiac" in a["tags"]),
+        ({"tag": "cardiac", "user_id": "p0", "until": since}, lambda a: "cardiac" in a["tags"] and a["user_id"] == "p0" and a["created_at"] < since),
+        ({"delivery_status": "undelivered"}, lambda a: a["delivered_at"] is None),
+        ({"delivery_status": "delivered", "urgency_level": "LOW"}, lambda a: a["delivered_at"] and a["urgency_level"] == "LOW"),
+    ]
+    for filters, predicate in cases:
+        expected = _expected(sessionmaker, predicate)
+        assert expected, filters
+        assert _page_all(sessionmaker, **filters) == expected, filters
+
+    assert _page_all(sessionmaker, delivery_status="undelivered") == [f"a{i:02d}" for i in reversed(range(0, 60, 5))]
+
+
+def test_history_endpoints_select_fields_and_reject_bad_input(sessionmaker):
+    from app.main import app
+
+    async def session_override():
+        async with sessionmaker() as session:
+            yield session
+
+    app.dependency_overrides[get_database_session] = session_override
+    try:
+        client = TestClient(app)
+        page = client.get("/api/v1/alerts/alerts", params={"fields": "id,urgency_level", "limit": 2}).json()
+        assert page["items"] == [{"id": "a59", "urgency_level": "MEDIUM"}, {"id": "a58", "urgency_level": "MEDIUM"}]
+        older = client.get("/api/v1/alerts/alerts", params={"fields": "id", "limit": 2, "cursor": page["next_cursor"]}).json()
+        assert [item["id"] for item in older["items"]] == ["a57", "a56"]
+
+        assert client.get("/api/v1/alerts/alerts", params={"fields": "id,ssn"}).status_code == 400
+        assert client.get("/api/v1/alerts/alerts", params={"cursor": "not-a-cursor"}).status_code == 400
+        assert client.get("/api/v1/alerts/alerts", params={"delivery_status": "lost"}).status_code == 400
+
+        detail = client.get("/api/v1/alerts/alerts/a55").json()
+        assert detail["tags"] == ["fever"] and detail["delivered_at"] is None
+        assert [(a["recipient"], a["delivered"]) for a in detail["attempts"]] == [("doc@example.com", False)]
+        assert client.get("/api/v1/alerts/alerts/missing").status_code == 404
+    finally:
+        app.dependency_overrides.pop(get_database_session, None)
+
+
+def test_outbox_delivery_after_the_alert_row_marks_it_delivered(sessionmaker):
+    async def run():
+        async with sessionmaker() as session:
+            session.add(DeliveryAttempt(alert_id="a05", channel="email", recipient="doc@example.com", attempt=2,
+                                        delivered=True, attempted_at=NOW))
+            await persistence.mark_delivered(session, {"a05"})
+            await session.commit()
+            return await alert_history.get_alert(session, "a05")
+
+    assert asyncio.run(run())["delivered_at"] == NOW
@@ -1,24 +1,202 @@
-from fastapi import FastAPI
-from app.services.alerting import trigger_alert
+import asyncio
+import smtplib
+from email.message import EmailMessage
 
-def test_trigger_alert(monkeypatch):
-    def mock_trigger_alert(urgency_level, message):
-        return {"status": "success", "urgency_level": urgency_level, "message": message}
+import pytest
 
-    monkeypatch.setattr(trigger_alert, "trigger_alert", mock_trigger_alert)
+from app.services import alerting
+from app.services.alerting import SMTPPool, trigger_alert, trigger_alert_sync
 
-    response = trigger_alert("high", "Patient requires immediate attention.")
-    assert response["status"] == "success"
-    assert response["urgency_level"] == "high"
-    assert response["message"] == "Patient requires immediate attention."
+def _instant_transports(monkeypatch, calls):
+    async def fake_send(recipient, *args, **kwargs):
+        calls.append(recipient)
+        return True
 
-def test_trigger_alert_failure(monkeypatch):
-    def mock_trigger_alert(urgency_level, message):
-        raise Exception("Alert service unavailable")
+    async def fake_email(to_email, subject, body):
+        return await fake_send(to_email)
 
-    monkeypatch.setattr(trigger_alert, "trigger_alert", mock_trigger_alert)
+    monkeypatch.setattr(alerting, "send_email", fake_email)
+    monkeypatch.setattr(alerting, "send_sms_one", fake_send)
+    monkeypatch.setattr(alerting, "send_webhook", fake_send)
 
-    try:
-        trigger_alert("low", "Routine check-up needed.")
-    except Exception as e:
-        assert str(e) == "Alert service unavailable"
\ No newline at end of file
+
+def _overlapping_transports(monkeypatch):
+    """Transports that yield to the loop a few times and record the peak number of sends in flight."""
+    sends = {"calls": 0, "inflight": 0, "peak": 0}
+
+    async def fake_send(recipient, *args, **kwargs):
+        sends["calls"] += 1
+        sends["inflight"] += 1
+        sends["peak"] = max(sends["peak"], sends["inflight"])
+        for _ in range(3):
+            await asyncio.sleep(0)
+        sends["inflight"] -= 1
+        return True
+
+    async def fake_email(to_email, subject, body):
+        return await fake_send(to_email)
+
+    monkeypatch.setattr(alerting, "send_email", fake_email)
+    monkeypatch.setattr(alerting, "send_sms_one", fake_send)
+    monkeypatch.setattr(alerting, "send_webhook", fake_send)
+    return sends
+
+
+@pytest.mark.parametrize("recipients", [1, 10, 100])
+def test_trigger_alert_sends_to_every_recipient_concurrently(monkeypatch, recipients):
+    sends = _overlapping_transports(monkeypatch)
+    emails = [f"doc{i}@example.com" for i in range(recipients)]
+    phones = [f"+1555{i:07d}" for i in range(recipients)]
+
+    results = asyncio.run(trigger_alert("high", "Patient requires immediate attention.", emails, phones))
+
+    assert sends["calls"] == 2 * recipients
+    assert all(results["email"].values()) and len(results["email"]) == recipients
+    assert all(results["sms"].values()) and len(results["sms"]) == recipients
+    # every send is in flight at once, up to the fan-out limit
+    assert sends["peak"] == min(2 * recipients, alerting.settings.ALERT_MAX_CONCURRENCY)
+
+
+def test_trigger_alert_low_urgency_sends_nothing(monkeypatch):
+    calls = []
+    _instant_transports(monkeypatch, calls)
+
+    assert asyncio.run(trigger_alert("low", "Routine check-up needed.", ["doc@example.com"])) == {}
+    assert calls == []
+
+
+def test_trigger_alert_sync_wrapper(monkeypatch):
+    calls = []
+    _instant_transports(monkeypatch, calls)
+
+    results = trigger_alert_sync("medium", "Fever since yesterday.", ["doc@example.com"])
+
+    assert results == {"email": {"doc@example.com": True}}
+
+
+class FakeSMTP:
+    instances = []
+
+    def __init__(self, host, port, timeout=None):
+        self.sent = []
+        self.alive = True
+        self.logins = 0
+        FakeSMTP.instances.append(self)
+
+    def starttls(self):
+        pass
+
+    def login(self, user, password):
+        self.logins += 1
+
+    def noop(self):
+        if not self.alive:
+            raise smtplib.SMTPServerDisconnected()
+        return (250, b"OK")
+
+    def send_message(self, msg):
+        if not self.alive:
+            raise smtplib.SMTPServerDisconnected()
+        self.sent.append(msg)
+
+    def quit(self):
+        self.alive = False
+
+    def close(self):
+        self.alive = False
+
+
+def _message():
+    msg = EmailMessage()
+    msg["To"] = "doc@example.com"
+    msg.set_content("alert")
+    return msg
+
+
+def test_smtp_pool_reuses_authenticated_session(monkeypatch):
+    FakeSMTP.instances = []
+    monkeypatch.setattr(smtplib, "SMTP", FakeSMTP)
+    pool = SMTPPool("smtp.example.com", 587, "user", "pw", size=2)
+
+    for _ in range(5):
+        pool.send(_message())
+
+    assert len(FakeSMTP.instances) == 1
+    assert FakeSMTP.instances[0].logins == 1
+    assert len(FakeSMTP.instances[0].sent) == 5
+    pool.close()
+    assert not FakeSMTP.instances[0].alive
+
+
+def test_smtp_pool_replaces_dropped_session(monkeypatch):
+    FakeSMTP.instances = []
+    monkeypatch.setattr(smtplib, "SMTP", FakeSMTP)
+    pool = SMTPPool("smtp.example.com", 587, size=1, health_check_after=0.0)
+
+    pool.send(_message())
+    FakeSMTP.instances[0].alive = False  # server timed the idle session out
+    pool.send(_message())
+
+    assert len(FakeSMTP.instances) == 2
+    assert len(FakeSMTP.instances[1].sent) == 1
+
+
+def _stub_transports(monkeypatch, latency=0.05, slow=()):
+    async def fake_send(recipient, *args, **kwargs):
+        await asyncio.sleep(1.0 if recipient in slow else latency)
+        return True
+
+    async def fake_email(to_email, subject, body):
+        return await fake_send(to_email)
+
+    monkeypatch.setattr(alerting, "send_email", fake_email)
+    monkeypatch.setattr(alerting, "send_sms_one", fake_send)
+    monkeypatch.setattr(alerting, "send_webhook", fake_send)
+
+
+def test_fan_out_runs_recipients_concurrently(monkeypatch):
+    sends = _overlapping_transports(monkeypatch)
+    plan = {
+        "email": [f"doc{i}@example.com" for i in range(10)],
+        "sms": [f"+1555000{i:04d}" for i in range(10)],
+        "webhook": ["http://hook.local/a"],
+    }
+
+    results = asyncio.run(alerting.fan_out("HIGH", "help", plan, max_concurrency=50))
+    # one round-trip for all 21 sends, not 21 of them
+    assert sends["peak"] == 21
+    sends["peak"] = 0
+    limited = asyncio.run(alerting.fan_out("HIGH", "help", plan, max_concurrency=4))
+    assert sends["peak"] == 4 and limited == results
+    assert all(results["email"].values()) and len(results["email"]) == 10
+    assert all(results["sms"].values()) and len(results["sms"]) == 10
+    assert results["webhook"] == {"http://hook.local/a": True}
+
+
+def test_fan_out_enforces_channel_deadline(monkeypatch):
+    _stub_transports(monkeypatch, latency=0.01, slow={"slow@example.com"})
+    monkeypatch.setattr(alerting.settings, "ALERT_EMAIL_DEADLINE_SECONDS", 0.1)
+    plan = {"email": ["fast@example.com", "slow@example.com"]}
+
+    results = asyncio.run(alerting.fan_out("MEDIUM", "help", plan))
+
+    assert results == {"email": {"fast@example.com": True, "slow@example.com": False}}
+
+
+def test_plan_deliveries_follows_urgency(monkeypatch):
+    monkeypatch.setattr(alerting.settings, "ALERT_SERVICE_URL", "http://default.local/hook")
+
+    high = alerting.plan_deliveries("HIGH", ["a@example.com"], ["+15550000"])
+    medium = alerting.plan_deliveries("medium", ["a@example.com"], ["+15550000"])
+
+    assert high == {"sms": ["+15550000"], "email": ["a@example.com"], "webhook": ["http://default.local/hook"]}
+    assert medium == {"email": ["a@example.com"], "webhook": ["http://default.local/hook"]}
+    assert alerting.plan_deliveries("low", ["a@example.com"]) == {}
+
+
+def test_plan_deliveries_falls_back_to_oncall_recipients(monkeypatch):
+    monkeypatch.setattr(alerting.settings, "ALERT_ONCALL_EMAILS", ["oncall@example.com"])
+    monkeypatch.setattr(alerting.settings, "ALERT_ONCALL_PHONES", ["+15550100"])
+
+    assert alerting.plan_deliveries("HIGH") == {"sms": ["+15550100"], "email": ["oncall@example.com"]}
+    assert alerting.plan_deliveries("HIGH", ["doc@example.com"]) == {"sms": ["+15550100"], "email": ["doc@example.com"]}
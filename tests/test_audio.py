@@ -0,0 +1,78 @@
+import wave
+
+import numpy as np
+from pydub import AudioSegment
+
+from app.utils.audio import (
+    audio_to_numpy,
+    iter_frames,
+    load_audio,
+    load_samples,
+    preprocess_audio,
+    resampled_length,
+    wav_info,
+)
+
+
+def _write_wav(path, samples, rate, sample_width=2):
+    samples = np.asarray(samples)
+    channels = 1 if samples.ndim == 1 else samples.shape[1]
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(sample_width)
+        w.setframerate(rate)
+        w.writeframes(samples.tobytes())
+
+
+def _stereo_tone(seconds=2.0, rate=44100):
+    t = np.arange(int(seconds * rate)) / rate
+    left = 0.6 * np.sin(2 * np.pi * 440 * t)
+    right = 0.3 * np.sin(2 * np.pi * 300 * t)
+    return (np.stack([left, right], axis=1) * 32767).astype(np.int16)
+
+
+def test_silence_normalizes_to_zeros_instead_of_nan(tmp_path):
+    silent = AudioSegment.silent(duration=500, frame_rate=16000)
+    assert not np.isnan(audio_to_numpy(silent)).any()
+
+    path = tmp_path / "silent.wav"
+    _write_wav(path, np.zeros(8000, dtype=np.int16), 16000)
+    samples = load_samples(str(path))
+    assert len(samples) == 8000 and not samples.any()
+
+
+def test_matches_pydub_preprocessing(tmp_path):
+    path = tmp_path / "stereo.wav"
+    _write_wav(path, _stereo_tone(), 44100)
+
+    reference = audio_to_numpy(preprocess_audio(load_audio(str(path))))
+    samples = load_samples(str(path), block_frames=4096)
+
+    assert samples.dtype == np.float32
+    assert abs(len(samples) - len(reference)) <= 2
+    n = min(len(samples), len(reference))
+    assert np.max(np.abs(samples[:n] - reference[:n])) < 0.02
+    assert np.isclose(np.max(np.abs(samples)), 1.0)
+
+
+def test_frames_are_fixed_size_and_block_size_independent(tmp_path):
+    path = tmp_path / "stereo.wav"
+    _write_wav(path, _stereo_tone(seconds=1.3, rate=22050), 22050)
+    expected = resampled_length(wav_info(str(path)).frames, 22050, 16000)
+
+    small = list(iter_frames(str(path), frame_size=480, block_frames=1000))
+    large = list(iter_frames(str(path), frame_size=480, block_frames=1 << 16))
+
+    assert all(len(frame) == 480 for frame in small)
+    assert len(small) == -(-expected // 480)
+    np.testing.assert_allclose(np.concatenate(small), np.concatenate(large), atol=1e-6)
+    # the tail beyond the recording is zero padding
+    assert not np.concatenate(small)[expected:].any()
+
+
+def test_audiosegment_source_is_read_without_wav_file():
+    segment = AudioSegment(
+        data=(np.arange(-8000, 8000, dtype=np.int16) * 2).tobytes(), sample_width=2, frame_rate=16000, channels=1
+    )
+    samples = load_samples(segment, normalize=False)
+    np.testing.assert_allclose(samples, np.arange(-8000, 8000) * 2 / 32768, atol=1e-6)
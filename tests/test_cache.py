@@ -0,0 +1,114 @@
+import asyncio
+
+from app.services.cache import AsyncTTLCache, DiskCacheStore
+
+
+def _counting(value="result", delay=0.0, fail=False):
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        if fail:
+            raise RuntimeError("upstream down")
+        return value
+
+    return compute, calls
+
+
+def test_hits_are_served_from_memory():
+    cache = AsyncTTLCache(maxsize=4, ttl=60)
+    compute, calls = _counting()
+
+    async def run():
+        return [await cache.get_or_compute("k", compute) for _ in range(3)]
+
+    assert asyncio.run(run()) == ["result"] * 3
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 1
+
+
+def test_concurrent_misses_share_one_upstream_call():
+    cache = AsyncTTLCache()
+    compute, calls = _counting(delay=0.05)
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(10)))
+
+    assert asyncio.run(run()) == ["result"] * 10
+    assert len(calls) == 1
+    assert cache.stats()["coalesced"] == 9
+
+
+def test_failures_propagate_to_waiters_and_are_not_cached():
+    cache = AsyncTTLCache()
+    failing, _ = _counting(delay=0.01, fail=True)
+    working, calls = _counting()
+
+    async def run():
+        results = await asyncio.gather(*(cache.get_or_compute("k", failing) for _ in range(3)), return_exceptions=True)
+        return results, await cache.get_or_compute("k", working)
+
+    results, value = asyncio.run(run())
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert value == "result" and len(calls) == 1
+
+
+def test_a_cancelled_leader_hands_the_computation_to_a_waiter():
+    cache = AsyncTTLCache()
+    compute, calls = _counting(delay=0.05)
+
+    async def run():
+        leader = asyncio.create_task(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0.01)
+        waiters = [asyncio.create_task(cache.get_or_compute("k", compute)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return leader, await asyncio.gather(*waiters)
+
+    leader, results = asyncio.run(run())
+
+    assert leader.cancelled()
+    assert results == ["result"] * 3
+    # the leader's call and one retry by a waiter
+    assert len(calls) == 2 and cache.stats()["coalesced"] == 2
+
+
+def test_lru_eviction_and_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.services.cache.time.monotonic", lambda: now[0])
+    cache = AsyncTTLCache(maxsize=2, ttl=10)
+    compute, calls = _counting()
+
+    async def get(key):
+        return await cache.get_or_compute(key, compute)
+
+    async def run():
+        await get("a")
+        await get("b")
+        await get("a")  # a is now most recently used
+        await get("c")  # evicts b
+        await get("a")
+        await get("b")
+        now[0] += 11
+        await get("b")  # expired
+
+    asyncio.run(run())
+    assert len(calls) == 5
+
+
+def test_disk_tier_survives_a_new_process(tmp_path):
+    compute, calls = _counting(value={"text": "chest pain"})
+
+    async def run():
+        first = AsyncTTLCache(store=DiskCacheStore(str(tmp_path)))
+        await first.get_or_compute("k", compute)
+        second = AsyncTTLCache(store=DiskCacheStore(str(tmp_path)))
+        return second, await second.get_or_compute("k", compute)
+
+    second, value = asyncio.run(run())
+
+    assert value == {"text": "chest pain"}
+    assert len(calls) == 1
+    assert second.stats()["persistent_hits"] == 1
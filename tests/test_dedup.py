@@ -0,0 +1,165 @@
+import asyncio
+import io
+
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.database import init_db
+from app.services import dedup
+from app.services.dedup import AlertSuppressor, DatabaseWindowStore, MemoryWindowStore
+
+
+def test_repeats_are_held_escalations_forwarded_and_digested_at_window_end(monkeypatch, clock):
+    monkeypatch.setattr(dedup.settings, "ALERT_DEDUP_ENABLED", True)
+    store = MemoryWindowStore(clock=clock)
+    suppressor = AlertSuppressor(store, window=60)
+    digests = []
+
+    async def on_digest(digest):
+        digests.append(digest)
+
+    async def run():
+        suppressor._on_digest = on_digest
+        admitted = [
+            await suppressor.admit("p1", "MEDIUM", ["fever"], "note 1"),
+            await suppressor.admit("p1", "medium", ["Fever"], "note 2"),
+            await suppressor.admit("p1", "MEDIUM", ["fever", "cough"], "other tags"),
+            await suppressor.admit("p2", "MEDIUM", ["fever"], "other patient"),
+            await suppressor.admit("p1", "HIGH", ["fever"], "escalated"),
+            await suppressor.admit("p1", "MEDIUM", ["fever"], "note 3"),
+            await suppressor.admit("p1", "HIGH", ["fever"], "note 4"),
+        ]
+        clock.now = 30
+        early = await suppressor.sweep()
+        clock.now = 61
+        at_end = await suppressor.sweep()
+        # the window restarted after the digest; nothing more was held, so it simply expires
+        clock.now = 200
+        expired = await suppressor.sweep()
+        return admitted, early, at_end, expired
+
+    admitted, early, at_end, expired = asyncio.run(run())
+
+    assert admitted == [True, False, True, True, True, False, False]
+    assert (early, at_end, expired) == (0, 1, 0)
+    (digest,) = digests
+    # note 2, held before the escalation, is carried into the restarted window's digest
+    assert (digest.user_id, digest.urgency_level, digest.tags, digest.count, digest.message) == (
+        "p1", "HIGH", ["fever"], 3, "note 4"
+    )
+    assert len(store) == 0
+    assert suppressor.stats()["forwarded"] == 4 and suppressor.stats()["suppressed"] == 3
+
+
+def test_memory_store_is_bounded_and_digests_evicted_windows(clock):
+    store = MemoryWindowStore(max_keys=2, clock=clock)
+
+    async def run():
+        assert await store.admit("a", "p1", [], 1, "m", 60)
+        assert not await store.admit("a", "p1", [], 1, "repeat", 60)
+        assert await store.admit("b", "p2", [], 1, "m", 60)
+        assert await store.admit("c", "p3", [], 1, "m", 60)
+        return await store.take_due(60)
+
+    (digest,) = asyncio.run(run())
+    assert len(store) == 2 and store.evictions == 1
+    assert (digest.user_id, digest.count, digest.message) == ("p1", 1, "repeat")
+
+
+def test_repeats_held_before_an_escalation_are_digested_by_both_stores(tmp_path, clock):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'carry.db'}")
+
+    async def digest_after_escalation(store, window, wait=0.0):
+        assert await store.admit("k", "p1", [], 1, "first", window)
+        assert not await store.admit("k", "p1", [], 1, "held", window)
+        assert not await store.admit("k", "p1", [], 0, "held too", window)
+        assert await store.admit("k", "p1", [], 2, "escalated", window)
+        # past the window: the fake clock for memory, real time for the database
+        clock.now = 100
+        await asyncio.sleep(wait)
+        return await store.take_due(window)
+
+    async def run():
+        await init_db(engine)
+        memory = await digest_after_escalation(MemoryWindowStore(clock=clock), 60)
+        database = await digest_after_escalation(DatabaseWindowStore(async_sessionmaker(engine)), 0.2, wait=0.25)
+        await engine.dispose()
+        return memory, database
+
+    for (digest,) in asyncio.run(run()):
+        assert (digest.count, digest.urgency_level, digest.message) == (2, "MEDIUM", "held too")
+
+
+def test_database_store_is_shared_between_replicas(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'dedup.db'}")
+    sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+    replicas = [DatabaseWindowStore(sessionmaker), DatabaseWindowStore(sessionmaker)]
+
+    async def run():
+        await init_db(engine)
+        admitted = await asyncio.gather(*(
+            replicas[i % 2].admit("k", "p1", ["chest_pain"], 2, f"note {i}", 0.2) for i in range(10)
+        ))
+        await asyncio.sleep(0.25)
+        due = await asyncio.gather(*(replica.take_due(0.2) for replica in replicas))
+        await asyncio.sleep(0.25)
+        # the restarted window ends empty and is deleted
+        leftover = await replicas[0].take_due(0.2)
+        reopened = await replicas[1].admit("k", "p1", ["chest_pain"], 2, "later", 0.2)
+        await engine.dispose()
+        return admitted, due, leftover, reopened
+
+    admitted, due, leftover, reopened = asyncio.run(run())
+
+    assert admitted.count(True) == 1
+    digests = [d for replica_due in due for d in replica_due]
+    assert len(digests) == 1 and digests[0].count == 9 and digests[0].urgency_level == "HIGH"
+    assert leftover == [] and reopened is True
+
+
+def test_patient_alert_reports_suppressed_repeats_and_sends_a_digest(monkeypatch):
+    from app.api.v1.endpoints import patient_alert
+    from app.main import app
+
+    suppressor = AlertSuppressor(MemoryWindowStore(), window=60)
+    monkeypatch.setattr(patient_alert, "alert_suppressor", suppressor)
+    monkeypatch.setattr(dedup.settings, "ALERT_DEDUP_ENABLED", True)
+    monkeypatch.setattr(patient_alert.settings, "ALERT_DELIVERY_MODE", "background")
+    monkeypatch.setattr(patient_alert.settings, "ALERT_SERVICE_URL", "http://hook.local")
+    sent = []
+
+    async def fake_transcribe(path):
+        return {"text": "my chest feels tight", "seconds_removed": 0.0}
+
+    async def fake_profile(text):
+        return {"urgency": "MEDIUM", "tags": ["chest"], "reason": "chest tightness"}
+
+    async def fake_trigger(urgency_level, message, **kwargs):
+        sent.append((urgency_level, message))
+        return {"webhook": {"http://hook.local": True}}
+
+    monkeypatch.setattr(patient_alert, "transcribe_audio_with_stats", fake_transcribe)
+    monkeypatch.setattr(patient_alert, "profile_text", fake_profile)
+    monkeypatch.setattr(patient_alert, "trigger_alert", fake_trigger)
+
+    client = TestClient(app)
+    responses = [
+        client.post(
+            "/api/v1/patient_alert/patient_alert",
+            data={"user_id": "u1"},
+            files={"file": ("note.wav", io.BytesIO(b"RIFF"), "audio/wav")},
+        ).json()
+        for _ in range(3)
+    ]
+    assert [(r["alert_sent"], r["alert_suppressed"]) for r in responses] == [(True, False), (False, True), (False, True)]
+    assert len(sent) == 1
+
+    async def shutdown():
+        suppressor.start(patient_alert.dispatch_digest)
+        await suppressor.close()
+        await asyncio.gather(*patient_alert._inflight_alerts)
+
+    asyncio.run(shutdown())
+    assert len(sent) == 2
+    assert sent[1][0] == "MEDIUM" and sent[1][1].startswith("2 further alerts from this patient")
+    assert client.get("/api/v1/patient_alert/dedup/stats").json()["suppressed"] == 2
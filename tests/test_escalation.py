@@ -0,0 +1,106 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.database import init_db
+from app.services import escalation
+from app.services.escalation import EscalationScheduler
+from app.services.timer_wheel import TimerWheel
+
+
+def test_wheel_fires_each_timer_once_at_its_tick_across_levels():
+    wheel = TimerWheel(tick=1.0, slots=4, levels=2)
+    # level 0 (< 4 ticks), level 1 (< 16) and past the top level's range (parked and re-placed)
+    for key, deadline in (("soon", 2.5), ("later", 9), ("far", 40), ("cancelled", 5), ("late", -3)):
+        wheel.schedule(key, deadline)
+    assert wheel.cancel("cancelled") and not wheel.cancel("cancelled")
+
+    fired = {}
+    for now in range(0, 45):
+        for key in wheel.advance(now):
+            fired[key] = now
+    assert fired == {"late": 1, "soon": 3, "later": 9, "far": 40}
+    assert len(wheel) == 0
+
+
+def test_unacknowledged_alerts_escalate_tier_by_tier_and_survive_a_restart(tmp_path, monkeypatch, clock):
+    monkeypatch.setattr(escalation.settings, "ESCALATION_ENABLED", True)
+    monkeypatch.setattr(escalation.settings, "ESCALATION_TIERS", [{"sms": ["+1555001"]}, {"email": ["chief@example.com"]}])
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'escalation.db'}")
+    sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+    clock.now = datetime(2026, 1, 1)
+    sent = []
+
+    async def on_escalate(item):
+        sent.append((item.alert_id, item.tier, item.recipients))
+
+    def replica():
+        scheduler = EscalationScheduler(sessionmaker, ack_seconds=60, tick=1, clock=clock)
+        scheduler._on_escalate = on_escalate
+        return scheduler
+
+    async def run():
+        await init_db(engine)
+        first = replica()
+        for alert_id in ("a1", "a2", "a3"):
+            first.track(alert_id, "p1", "HIGH", "chest pain")
+        assert not first.track("m1", "p1", "MEDIUM", "cough")
+        ack = await first.acknowledge("a1", "dr-who")
+
+        clock.now += timedelta(seconds=61)
+        await first.fire_due()
+        # a restart between the two deadlines: the new replica rebuilds a2 and a3 from the table
+        second = replica()
+        assert await second.recover() == 2
+        again = await second.acknowledge("a1", "someone else")
+        await second.acknowledge("a2")
+        clock.now += timedelta(seconds=61)
+        await second.fire_due()
+        # the first replica's timers fire too, but the rows are already claimed or acknowledged
+        await first.fire_due()
+        clock.now += timedelta(seconds=120)
+        await second.fire_due()
+        unknown = await second.acknowledge("nope")
+        await engine.dispose()
+        return ack, again, unknown, first.stats(), second.stats()
+
+    ack, again, unknown, first, second = asyncio.run(run())
+    assert (ack.acknowledged_by, ack.escalations) == ("dr-who", 0)
+    assert again == ack and unknown is None
+    assert sent == [
+        ("a2", 1, {"sms": ["+1555001"]}),
+        ("a3", 1, {"sms": ["+1555001"]}),
+        ("a3", 2, {"email": ["chief@example.com"]}),
+    ]
+    assert first["tracked"] == 3 and first["escalated"] == 2 and first["pending"] == 0
+    assert second["escalated"] == 1 and second["pending"] == 0
+
+
+def test_ack_endpoint(tmp_path, monkeypatch):
+    from app.api.v1.endpoints import alerts
+    from app.main import app
+
+    monkeypatch.setattr(escalation.settings, "ESCALATION_ENABLED", True)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'ack.db'}")
+    scheduler = EscalationScheduler(async_sessionmaker(engine, expire_on_commit=False), ack_seconds=60)
+    monkeypatch.setattr(alerts, "escalation_scheduler", scheduler)
+
+    async def run():
+        await init_db(engine)
+        scheduler.track("a1", "p1", "HIGH", "chest pain")
+        # the row is still buffered: acknowledging writes it first
+        assert scheduler.stats()["unwritten"] == 1
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            acked = await client.post("/api/v1/alerts/alerts/a1/ack", json={"acknowledged_by": "dr-who"})
+            missing = await client.post("/api/v1/alerts/alerts/nope/ack")
+        await engine.dispose()
+        return acked, missing
+
+    acked, missing = asyncio.run(run())
+    assert acked.status_code == 200
+    assert acked.json()["acknowledged_by"] == "dr-who" and acked.json()["escalations"] == 0
+    assert missing.status_code == 404
+    assert scheduler.stats()["pending"] == 0
@@ -0,0 +1,130 @@
+import asyncio
+import io
+import os
+
+import httpx
+import pytest
+
+from app.services.jobs import JobManager
+from app.services.resilience import Overloaded
+
+
+def test_jobs_run_in_order_stream_their_stages_and_clean_up(tmp_path):
+    release = asyncio.Event()
+
+    async def handler(job):
+        await release.wait()
+        job.emit("transcribed", {"transcribed_text": job.user_id})
+        if job.user_id == "bad":
+            raise ValueError("unreadable audio")
+        return {"user_id": job.user_id}
+
+    def audio(name):
+        path = tmp_path / name
+        path.write_bytes(b"RIFF")
+        return str(path)
+
+    async def run():
+        manager = JobManager(workers=1, max_pending=2, retention=60)
+        manager.start(handler)
+        good = manager.submit("good", "standard", audio("good.wav"))
+        bad = manager.submit("bad", "standard", audio("bad.wav"))
+        with pytest.raises(Overloaded):
+            manager.submit("third", "standard", audio("third.wav"))
+
+        async def collect(job, after=-1):
+            return [record["event"] async for record in job.subscribe(after)]
+
+        # one subscriber before anything ran (live), one after the job finished (replay)
+        live = asyncio.create_task(collect(good))
+        await asyncio.sleep(0)
+        release.set()
+        streamed = await live
+        replayed = await collect(bad)
+        resumed = await collect(bad, after=1)
+        await manager.close()
+        return manager, good, bad, streamed, replayed, resumed
+
+    manager, good, bad, streamed, replayed, resumed = asyncio.run(run())
+    assert streamed == ["queued", "started", "transcribed", "completed"]
+    assert replayed == ["queued", "started", "transcribed", "failed"]
+    assert resumed == ["transcribed", "failed"]
+    assert good.to_dict()["status"] == "done" and good.result == {"user_id": "good"}
+    assert bad.status == "failed" and bad.error == "ValueError: unreadable audio"
+    assert not os.path.exists(good.audio_path) and not os.path.exists(bad.audio_path)
+    assert manager.stats() == {"pending": 0, "running": 0, "tracked": 2, "completed": 1, "failed": 1, "rejected": 1}
+
+
+def test_finished_jobs_expire_without_new_submissions(tmp_path):
+    async def handler(job):
+        return {"user_id": job.user_id}
+
+    async def run():
+        manager = JobManager(workers=1, retention=0)
+        manager.start(handler)
+        path = tmp_path / "a.wav"
+        path.write_bytes(b"RIFF")
+        job = manager.submit("a", "standard", str(path))
+        for _ in range(100):
+            if not manager.stats()["tracked"]:
+                break
+            await asyncio.sleep(0.01)
+        await manager.close()
+        return manager, job
+
+    manager, job = asyncio.run(run())
+    assert job.status == "done" and manager.get(job.id) is None
+
+
+def test_job_api_returns_202_then_the_result_and_its_events(monkeypatch):
+    from app.api.v1.endpoints import patient_alert
+    from app.main import app
+
+    monkeypatch.setattr(patient_alert.settings, "ALERT_DELIVERY_MODE", "background")
+    monkeypatch.setattr(patient_alert.settings, "ALERT_SERVICE_URL", "http://hook.local")
+    manager = JobManager(workers=2, max_pending=10, retention=60)
+    monkeypatch.setattr(patient_alert, "job_manager", manager)
+    sent = []
+
+    async def fake_transcribe(path):
+        return {"text": "my chest feels tight", "seconds_removed": 0.5}
+
+    async def fake_profile(text):
+        return {"urgency": "MEDIUM", "tags": ["chest"], "reason": "chest tightness"}
+
+    async def fake_trigger(urgency_level, message, **kwargs):
+        sent.append(urgency_level)
+        return {"webhook": {"http://hook.local": True}}
+
+    monkeypatch.setattr(patient_alert, "transcribe_audio_with_stats", fake_transcribe)
+    monkeypatch.setattr(patient_alert, "profile_text", fake_profile)
+    monkeypatch.setattr(patient_alert, "trigger_alert", fake_trigger)
+
+    async def run():
+        manager.start(patient_alert.run_job)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            accepted = await client.post(
+                "/api/v1/patient_alert/jobs",
+                data={"user_id": "u1"},
+                files={"file": ("note.wav", io.BytesIO(b"RIFF"), "audio/wav")},
+            )
+            body = accepted.json()
+            events = await client.get(body["events_url"])
+            status = await client.get(body["status_url"])
+            missing = await client.get("/api/v1/patient_alert/jobs/nope")
+        await asyncio.gather(*patient_alert._inflight_alerts)
+        await manager.close()
+        return accepted, events, status, missing
+
+    accepted, events, status, missing = asyncio.run(run())
+    assert accepted.status_code == 202
+    assert accepted.headers["location"] == accepted.json()["status_url"]
+    assert events.headers["content-type"].startswith("text/event-stream")
+    names = [line[len("event: "):] for line in events.text.splitlines() if line.startswith("event: ")]
+    assert names == ["queued", "started", "transcribed", "triaged", "alerted", "completed"]
+    assert status.json()["status"] == "done"
+    result = status.json()["result"]
+    assert result["urgency_level"] == "MEDIUM" and result["alert_sent"] is True and result["audio_seconds_removed"] == 0.5
+    assert sent == ["MEDIUM"]
+    assert missing.status_code == 404
@@ -0,0 +1,37 @@
+import asyncio
+import wave
+
+import numpy as np
+import pytest
+
+from app.services.local_asr import LocalTranscriber
+
+pytest.importorskip("pocketsphinx")
+
+
+def test_pool_is_warm_and_transcribes_in_workers(tmp_path):
+    note = tmp_path / "note.wav"
+    t = np.arange(16000 * 2) / 16000
+    with wave.open(str(note), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(16000)
+        w.writeframes((0.3 * np.sin(2 * np.pi * 200 * t) * 32767).astype(np.int16).tobytes())
+
+    async def run():
+        transcriber = LocalTranscriber("sphinx", workers=2)
+        try:
+            pids = await transcriber.start()
+            texts = await asyncio.gather(*(transcriber.transcribe(str(note)) for _ in range(4)))
+            return pids, texts
+        finally:
+            transcriber.shutdown()
+
+    pids, texts = asyncio.run(run())
+    assert len(set(pids)) == 2
+    assert all(isinstance(text, str) for text in texts)
+
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(ValueError):
+        LocalTranscriber("nope")
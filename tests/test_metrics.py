@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import metrics
+from app.core.metrics import Histogram, MetricsMiddleware, MetricsRegistry, span, timed
+
+
+def test_histogram_buckets_and_prometheus_text():
+    histogram = Histogram(bounds=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value)
+    assert histogram.counts == [2, 1, 1] and histogram.count == 4
+
+    registry = MetricsRegistry()
+    registry.histogram("latency_seconds", "Latency.", stage="asr").observe(0.5)
+    registry.register_collector("cache", "Cache counters.", lambda: {"hits": 3, "ratio": 0.5, "name": "ttl"})
+    registry.register_collector("broken", "Fails.", lambda: 1 / 0)
+    text = registry.render()
+
+    assert 'latency_seconds_bucket{stage="asr",le="0.25"} 0' in text
+    assert 'latency_seconds_bucket{stage="asr",le="1.0"} 1' in text
+    assert 'latency_seconds_bucket{stage="asr",le="+Inf"} 1' in text
+    assert 'latency_seconds_count{stage="asr"} 1' in text
+    assert "cache_hits 3\n" in text and "cache_ratio 0.5\n" in text
+    assert "cache_name" not in text and "broken" not in text
+
+
+def test_span_and_timed_record_into_the_current_request():
+    @timed("unit_timed")
+    async def fails():
+        raise RuntimeError("boom")
+
+    async def run():
+        timings = {}
+        token = metrics._request_timings.set(timings)
+        try:
+            with span("unit_span"):
+                pass
+            with span("unit_span"):
+                pass
+            with pytest.raises(RuntimeError):
+                await fails()
+        finally:
+            metrics._request_timings.reset(token)
+        return timings
+
+    before = metrics.registry.histogram(metrics.STAGE_SECONDS, "", stage="unit_span").count
+    timings = asyncio.run(run())
+    assert set(timings) == {"unit_span", "unit_timed"}
+    assert metrics.registry.histogram(metrics.STAGE_SECONDS, "", stage="unit_span").count == before + 2
+    assert metrics.registry.histogram(metrics.STAGE_SECONDS, "", stage="unit_timed").count >= 1
+    assert fails.__name__ == "fails"
+
+
+def test_middleware_adds_server_timing_and_labels_by_route_template(caplog):
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, server_timing=True, slow_request_seconds=0.05)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: str):
+        with span("lookup"):
+            await asyncio.sleep(0.06)
+        return {"id": item_id}
+
+    client = TestClient(app)
+    for item_id in ("a", "b"):
+        resp = client.get(f"/items/{item_id}")
+    assert client.get("/missing").status_code == 404
+
+    entries = dict(entry.split(";dur=") for entry in resp.headers["server-timing"].split(", "))
+    assert set(entries) == {"lookup", "total"}
+    assert 60 <= float(entries["lookup"]) <= float(entries["total"])
+    text = metrics.registry.render()
+    assert 'medical_alert_http_request_seconds_count{method="GET",route="/items/{item_id}",status="200"} 2' in text
+    assert 'route="unmatched",status="404"' in text
+    assert any("slow request GET /items/{item_id}" in record.getMessage() for record in caplog.records)
+
+
+def test_metrics_endpoint_exports_request_latency_and_service_counters():
+    from app.main import app
+
+    client = TestClient(app)
+    client.get("/api/v1/patient_alert/dedup/stats")
+    resp = client.get("/metrics")
+
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'route="/api/v1/patient_alert/dedup/stats"' in resp.text
+    assert "medical_alert_transcription_cache_hits" in resp.text
+    assert "medical_alert_dedup_suppressed" in resp.text
+    assert "server-timing" not in resp.headers
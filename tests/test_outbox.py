@@ -0,0 +1,133 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.database import init_db
+from app.models.alert import DeliveryAttempt
+from app.models.outbox import DEAD, DELIVERED, PENDING, AlertOutbox
+from app.services import alerting, outbox
+
+
+@pytest.fixture
+def sessionmaker(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'outbox.db'}")
+    asyncio.run(init_db(engine))
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    asyncio.run(engine.dispose())
+
+
+def _fake_deliver(monkeypatch, failing=()):
+    sent = []
+
+    async def deliver(channel, recipient, urgency_level, message):
+        sent.append((channel, recipient))
+        return recipient not in failing
+
+    monkeypatch.setattr(alerting, "deliver", deliver)
+    return sent
+
+
+async def _rows(sessionmaker):
+    async with sessionmaker() as session:
+        return list((await session.execute(select(AlertOutbox).order_by(AlertOutbox.id))).scalars())
+
+
+def test_enqueue_then_drain_delivers_every_recipient(sessionmaker, monkeypatch):
+    sent = _fake_deliver(monkeypatch)
+
+    async def run():
+        async with sessionmaker() as session:
+            queued = await outbox.enqueue_alert(
+                session, "HIGH", "chest pain", ["a@example.com", "b@example.com"], ["+15550001"], user_id="u1"
+            )
+        processed = await outbox.drain_once(sessionmaker, batch_size=10)
+        return queued, processed, await _rows(sessionmaker)
+
+    queued, processed, rows = asyncio.run(run())
+
+    assert queued["email"] == {"a@example.com": None, "b@example.com": None}
+    assert processed == 3
+    assert sorted(sent) == [("email", "a@example.com"), ("email", "b@example.com"), ("sms", "+15550001")]
+    assert {r.status for r in rows} == {DELIVERED}
+    assert asyncio.run(outbox.drain_once(sessionmaker)) == 0
+
+
+def test_failed_delivery_backs_off_then_dead_letters(sessionmaker, monkeypatch):
+    _fake_deliver(monkeypatch, failing={"down@example.com"})
+    monkeypatch.setattr(outbox.settings, "OUTBOX_MAX_ATTEMPTS", 2)
+
+    async def make_due():
+        async with sessionmaker() as session:
+            for row in (await session.execute(select(AlertOutbox))).scalars():
+                row.next_attempt_at -= timedelta(hours=1)
+            await session.commit()
+
+    async def run():
+        async with sessionmaker() as session:
+            await outbox.enqueue_alert(session, "MEDIUM", "fever", ["down@example.com"])
+        await outbox.drain_once(sessionmaker)
+        first = (await _rows(sessionmaker))[0]
+        # not due yet: backoff pushed next_attempt_at into the future
+        skipped = await outbox.drain_once(sessionmaker)
+        await make_due()
+        await outbox.drain_once(sessionmaker)
+        return first, skipped, (await _rows(sessionmaker))[0]
+
+    first, skipped, last = asyncio.run(run())
+
+    assert first.status == PENDING and first.attempts == 1
+    assert first.next_attempt_at > first.updated_at
+    assert first.last_error == "email delivery failed"
+    assert skipped == 0
+    assert last.status == DEAD and last.attempts == 2
+
+
+def test_every_attempt_is_audited_with_the_alert_id(sessionmaker, monkeypatch):
+    _fake_deliver(monkeypatch, failing={"down@example.com"})
+    monkeypatch.setattr(outbox.settings, "PERSIST_ENABLED", True)
+
+    async def run():
+        async with sessionmaker() as session:
+            await outbox.enqueue_alert(
+                session, "HIGH", "chest pain", ["up@example.com", "down@example.com"], alert_id="alert-1"
+            )
+        await outbox.drain_once(sessionmaker)
+        async with sessionmaker() as session:
+            return list((await session.execute(select(DeliveryAttempt).order_by(DeliveryAttempt.recipient))).scalars())
+
+    down, up = asyncio.run(run())
+
+    assert (down.alert_id, down.delivered, down.error, down.attempt) == ("alert-1", False, "email delivery failed", 1)
+    assert (up.alert_id, up.delivered, up.error) == ("alert-1", True, None)
+
+
+def test_concurrent_consumers_never_claim_the_same_row(sessionmaker, monkeypatch):
+    sent = _fake_deliver(monkeypatch)
+
+    async def run():
+        async with sessionmaker() as session:
+            await outbox.enqueue_alert(session, "MEDIUM", "fever", [f"d{i}@example.com" for i in range(40)])
+        return await asyncio.gather(*(consumer() for _ in range(8)))
+
+    async def consumer():
+        total = 0
+        while processed := await outbox.drain_once(sessionmaker, batch_size=7):
+            total += processed
+        return total
+
+    processed = asyncio.run(run())
+
+    assert sum(processed) == 40
+    assert len(sent) == len(set(sent)) == 40
+
+
+def test_backoff_grows_and_is_capped(monkeypatch):
+    monkeypatch.setattr(outbox.settings, "OUTBOX_BACKOFF_BASE_SECONDS", 1.0)
+    monkeypatch.setattr(outbox.settings, "OUTBOX_BACKOFF_MAX_SECONDS", 30.0)
+
+    assert 0.5 <= outbox.backoff_delay(1) <= 1.0
+    assert 4.0 <= outbox.backoff_delay(4) <= 8.0
+    assert 15.0 <= outbox.backoff_delay(20) <= 30.0
@@ -0,0 +1,151 @@
+import asyncio
+import io
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.database import init_db
+from app.models.alert import DeliveryAttempt, PatientAlert
+from app.models.transcript import Transcript, TriageResult
+from app.services import persistence
+from app.services.persistence import BufferedWriter
+
+
+@pytest.fixture
+def db_url(tmp_path):
+    return f"sqlite+aiosqlite:///{tmp_path / 'audit.db'}"
+
+
+def _sessionmaker(url):
+    # NullPool: tests drive the writer from several event loops
+    return async_sessionmaker(create_async_engine(url, poolclass=NullPool), expire_on_commit=False)
+
+
+async def _count(sessionmaker, model):
+    async with sessionmaker() as session:
+        return await session.scalar(select(func.count()).select_from(model))
+
+
+def _transcript(writer, i):
+    writer.add(Transcript, id=f"t{i}", user_id="u1", text="hello", audio_seconds=None, speech_seconds=None,
+               backend=None, created_at=persistence._utcnow())
+
+
+def test_flushes_by_size_and_by_time(db_url):
+    sessionmaker = _sessionmaker(db_url)
+
+    async def run():
+        await init_db(sessionmaker.kw["bind"])
+        by_size = BufferedWriter(sessionmaker, batch_size=3, flush_interval=60)
+        for i in range(3):
+            _transcript(by_size, i)
+        await asyncio.sleep(0.1)
+        after_size = await _count(sessionmaker, Transcript)
+
+        by_time = BufferedWriter(sessionmaker, batch_size=100, flush_interval=0.05)
+        _transcript(by_time, 99)
+        before_interval = await _count(sessionmaker, Transcript)
+        await asyncio.sleep(0.2)
+        after_interval = await _count(sessionmaker, Transcript)
+        await by_size.close()
+        await by_time.close()
+        return after_size, before_interval, after_interval, by_size.stats()
+
+    after_size, before_interval, after_interval, stats = asyncio.run(run())
+    assert (after_size, before_interval, after_interval) == (3, 3, 4)
+    assert stats["flushes"] == 1 and stats["written"] == 3
+
+
+def test_failed_flush_keeps_rows_and_bounds_the_buffer(db_url):
+    sessionmaker = _sessionmaker(db_url)
+    writer = BufferedWriter(sessionmaker, batch_size=1000, flush_interval=60, max_buffer=5)
+
+    async def run():
+        for i in range(7):
+            _transcript(writer, i)
+        failed = await writer.flush()  # tables do not exist yet
+        await init_db(sessionmaker.kw["bind"])
+        written = await writer.flush()
+        await writer.close()
+        async with sessionmaker() as session:
+            ids = sorted((await session.execute(select(Transcript.id))).scalars())
+        return failed, written, ids
+
+    failed, written, ids = asyncio.run(run())
+    assert failed == 0 and written == 5
+    # the two oldest rows were dropped to respect max_buffer
+    assert ids == ["t2", "t3", "t4", "t5", "t6"]
+    assert writer.stats()["dropped"] == 2 and writer.stats()["failed_flushes"] == 1
+
+
+def test_rejected_rows_are_dropped_without_holding_back_the_batch(db_url):
+    sessionmaker = _sessionmaker(db_url)
+    writer = BufferedWriter(sessionmaker, batch_size=1000, flush_interval=60)
+
+    async def run():
+        await init_db(sessionmaker.kw["bind"])
+        _transcript(writer, 1)
+        _transcript(writer, 1)  # duplicate primary key: the whole batch fails
+        _transcript(writer, 2)
+        written = await writer.flush()
+        _transcript(writer, 3)
+        later = await writer.flush()
+        await writer.close()
+        async with sessionmaker() as session:
+            ids = sorted((await session.execute(select(Transcript.id))).scalars())
+        return written, later, ids
+
+    written, later, ids = asyncio.run(run())
+    assert (written, later) == (2, 1) and ids == ["t1", "t2", "t3"]
+    assert writer.stats()["rejected"] == 1 and writer.stats()["buffered"] == 0
+    assert len(persistence.fit(PatientAlert.user_id, "u" * 500)) == 128
+
+
+def test_patient_alert_records_an_audit_trail(db_url, monkeypatch):
+    from app.api.v1.endpoints import patient_alert
+    from app.main import app
+
+    sessionmaker = _sessionmaker(db_url)
+    asyncio.run(init_db(sessionmaker.kw["bind"]))
+    writer = BufferedWriter(sessionmaker, batch_size=1000, flush_interval=60)
+    monkeypatch.setattr(persistence, "audit_writer", writer)
+    monkeypatch.setattr(persistence.settings, "PERSIST_ENABLED", True)
+    monkeypatch.setattr(patient_alert.settings, "ALERT_DELIVERY_MODE", "background")
+    monkeypatch.setattr(patient_alert.settings, "ALERT_SERVICE_URL", "http://hook.local")
+
+    async def fake_transcribe(path):
+        return {"text": "my ankle hurts", "seconds_removed": 2.0, "audio_seconds": 5.0,
+                "speech_seconds": 3.0, "backend": "openai"}
+
+    async def fake_profile(text):
+        return {"urgency": "MEDIUM", "tags": ["injury"], "reason": "ankle pain"}
+
+    async def fake_trigger(urgency_level, message, **kwargs):
+        return {"webhook": {"http://hook.local": False}}
+
+    monkeypatch.setattr(patient_alert, "transcribe_audio_with_stats", fake_transcribe)
+    monkeypatch.setattr(patient_alert, "profile_text", fake_profile)
+    monkeypatch.setattr(patient_alert, "trigger_alert", fake_trigger)
+
+    resp = TestClient(app).post(
+        "/api/v1/patient_alert/patient_alert",
+        data={"user_id": "u7"},
+        files={"file": ("note.wav", io.BytesIO(b"RIFF"), "audio/wav")},
+    )
+    assert resp.status_code == 200
+
+    async def rows():
+        await writer.close()
+        async with sessionmaker() as session:
+            return [list((await session.execute(select(m))).scalars())
+                    for m in (Transcript, TriageResult, PatientAlert, DeliveryAttempt)]
+
+    (transcript,), (triage,), (alert,), (attempt,) = asyncio.run(rows())
+    assert transcript.user_id == "u7" and transcript.speech_seconds == 3.0
+    assert triage.transcript_id == transcript.id and triage.tags == ["injury"] and triage.source == "llm"
+    assert (alert.transcript_id, alert.triage_id) == (transcript.id, triage.id)
+    assert alert.delivery_mode == "background" and alert.recipients == {"webhook": ["http://hook.local"]}
+    assert attempt.alert_id == alert.id and attempt.delivered is False
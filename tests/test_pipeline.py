@@ -0,0 +1,67 @@
+import asyncio
+import time
+import wave
+
+import numpy as np
+
+from app.services import pipeline
+from app.services.pipeline import plan_chunk_cuts
+
+
+def _write_recording(path, segments=8, speech_s=3.0, gap_s=0.8, rate=16000):
+    t = np.arange(int(speech_s * rate)) / rate
+    tone = (0.5 * np.sin(2 * np.pi * 220 * t) * 32767).astype(np.int16)
+    gap = np.zeros(int(gap_s * rate), dtype=np.int16)
+    samples = np.concatenate([np.concatenate([tone, gap]) for _ in range(segments)])
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(samples.tobytes())
+
+
+def test_cuts_fall_in_silences_near_target():
+    speech = [(0, 4000), (5000, 9000), (10000, 14000), (15000, 19000)]
+
+    assert plan_chunk_cuts(speech, 20000, target_ms=10000) == [0, 9500, 14500, 20000]
+    assert plan_chunk_cuts(speech, 20000, target_ms=30000) == [0, 20000]
+    # continuous speech is hard split so no chunk exceeds 2 * target
+    assert plan_chunk_cuts([(0, 50000)], 50000, target_ms=10000) == [0, 10000, 20000, 30000, 50000]
+
+
+def test_alert_time_tracks_red_flag_position(tmp_path, monkeypatch):
+    audio = tmp_path / "long_note.wav"
+    _write_recording(audio)
+    monkeypatch.setattr(pipeline.settings, "PIPELINE_CHUNK_SECONDS", 3.5)
+    order = []
+
+    def fake_transcriber(red_flag_chunk):
+        async def transcribe(path):
+            index = int(path.rsplit("_", 1)[1].split(".")[0])
+            order.append(index)
+            await asyncio.sleep(0.05)
+            text = "I have chest pain and can't breathe" if index == red_flag_chunk else f"part {index}"
+            return {"text": text, "seconds_removed": 0.5}
+        return transcribe
+
+    async def run(red_flag_chunk):
+        monkeypatch.setattr(pipeline, "transcribe_audio_with_stats", fake_transcriber(red_flag_chunk))
+        paged = []
+
+        async def on_red_flag(rules, partial):
+            paged.append((time.perf_counter(), partial))
+
+        started = time.perf_counter()
+        result = await pipeline.run_pipeline(str(audio), on_red_flag=on_red_flag, max_concurrency=2)
+        return result, paged, time.perf_counter() - started
+
+    early, early_paged, total = asyncio.run(run(red_flag_chunk=0))
+    late, late_paged, _ = asyncio.run(run(red_flag_chunk=7))
+
+    assert early["chunks"] == 8 and len(early_paged) == 1
+    assert early["audio_seconds_removed"] == 4.0
+    assert early["transcribed_text"].startswith("I have chest pain")
+    assert early["red_flag"]["tags"] == ["chest_pain", "shortness_of_breath"]
+    assert early["seconds_to_alert"] < total / 2
+    assert late["seconds_to_alert"] > early["seconds_to_alert"]
+    assert late_paged[0][1].endswith("I have chest pain and can't breathe")
@@ -0,0 +1,192 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import profiling
+from app.services.cache import AsyncTTLCache
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    calls = []
+    replies = {"content": json.dumps({"urgency": "HIGH", "tags": ["chest_pain"], "reason": "chest pain"})}
+
+    async def create(**kwargs):
+        calls.append(kwargs)
+        await asyncio.sleep(0.01)
+        message = SimpleNamespace(content=replies["content"])
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    monkeypatch.setattr(profiling.openai_client().chat.completions, "create", create)
+    monkeypatch.setattr(profiling, "profile_cache", AsyncTTLCache())
+    return calls, replies
+
+
+def test_profile_text_memoizes_normalized_transcripts(fake_llm):
+    calls, _ = fake_llm
+
+    async def run():
+        first = await profiling.profile_text("My chest hurts")
+        first["tags"].append("mutated")
+        again = await profiling.profile_text("  my CHEST   hurts ")
+        return first, again
+
+    first, again = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert again == {"urgency": "HIGH", "tags": ["chest_pain"], "reason": "chest pain"}
+
+
+def test_identical_burst_makes_one_upstream_call(fake_llm):
+    calls, _ = fake_llm
+
+    async def run():
+        return await asyncio.gather(*(profiling.profile_text("I fell down the stairs") for _ in range(20)))
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert all(r["urgency"] == "HIGH" for r in results)
+
+
+def test_unparseable_reply_is_not_cached(fake_llm):
+    calls, replies = fake_llm
+    replies["content"] = "sorry, I cannot help"
+
+    fallback = asyncio.run(profiling.profile_text("dizzy"))
+    replies["content"] = json.dumps({"urgency": "LOW", "tags": [], "reason": "ok"})
+    parsed = asyncio.run(profiling.profile_text("dizzy"))
+
+    assert fallback == {"urgency": "MEDIUM", "tags": [], "reason": "sorry, I cannot help"}
+    assert parsed["urgency"] == "LOW"
+    assert len(calls) == 2
+
+
+def test_malformed_reply_falls_back_to_rules_and_is_not_cached(fake_llm):
+    calls, replies = fake_llm
+
+    results = []
+    for content in ('"HIGH"', '["HIGH"]', json.dumps({"urgency": "urgent", "tags": [], "reason": "?"})):
+        replies["content"] = content
+        results.append(asyncio.run(profiling.profile_text("my chest hurts")))
+
+    assert [r["urgency"] for r in results] == ["HIGH"] * 3
+    assert all("LLM triage unavailable" in r["reason"] and "malformed" in r["error"] for r in results)
+    assert len(calls) == 3 and profiling.profile_cache.stats()["size"] == 0
+
+
+def test_prompt_change_and_invalidation(fake_llm, monkeypatch):
+    calls, _ = fake_llm
+    key = profiling.profile_cache_key("dizzy")
+
+    asyncio.run(profiling.profile_text("dizzy"))
+    monkeypatch.setattr(profiling, "PROMPT_VERSION", "edited")
+    assert profiling.profile_cache_key("dizzy") != key
+    asyncio.run(profiling.profile_text("dizzy"))
+    asyncio.run(profiling.invalidate_profile_cache())
+    asyncio.run(profiling.profile_text("dizzy"))
+
+    assert len(calls) == 3
+
+
+@pytest.fixture
+def fake_batch_llm(monkeypatch):
+    calls = []
+
+    async def create(**kwargs):
+        items = json.loads(kwargs["messages"][1]["content"].split("\n")[1])
+        calls.append([item["id"] for item in items])
+        await asyncio.sleep(0.01)
+        results = [
+            {"id": item["id"], "urgency": "LOW", "tags": [], "reason": item["transcript"]}
+            for item in items
+            if "drop me" not in item["transcript"]
+        ]
+        message = SimpleNamespace(content=json.dumps({"results": results}))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    monkeypatch.setattr(profiling.openai_client().chat.completions, "create", create)
+    monkeypatch.setattr(profiling, "profile_cache", AsyncTTLCache())
+    return calls
+
+
+def test_batch_packs_transcripts_into_few_calls(fake_batch_llm):
+    texts = [f"note {i}" for i in range(20)]
+
+    async def run():
+        return [item async for item in profiling.profile_texts_batch(texts, pack_size=8, max_concurrency=2)]
+
+    results = dict(asyncio.run(run()))
+
+    assert len(fake_batch_llm) == 3
+    assert sorted(len(c) for c in fake_batch_llm) == [4, 8, 8]
+    assert {i: r["reason"] for i, r in results.items()} == {i: f"note {i}" for i in range(20)}
+
+
+def test_batch_retries_dropped_items_individually(fake_batch_llm, monkeypatch):
+    singles = []
+
+    async def fake_profile_text(text):
+        singles.append(text)
+        return {"urgency": "MEDIUM", "tags": [], "reason": "single"}
+
+    monkeypatch.setattr(profiling, "profile_text", fake_profile_text)
+
+    async def run():
+        return dict([item async for item in profiling.profile_texts_batch(["ok", "drop me", "fine"], pack_size=3)])
+
+    results = asyncio.run(run())
+
+    assert singles == ["drop me"]
+    assert results[1]["reason"] == "single" and results[0]["reason"] == "ok"
+
+
+def test_batch_endpoint_streams_jsonl(fake_batch_llm):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    body = "\n".join(json.dumps(t) for t in ["a", {"text": "b"}, "c"]) + "\n"
+    resp = TestClient(app).post(
+        "/api/v1/profiling/profile/batch", content=body, headers={"content-type": "application/x-ndjson"}
+    )
+
+    assert resp.status_code == 200
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert sorted((line["index"], line["reason"]) for line in lines) == [(0, "a"), (1, "b"), (2, "c")]
+
+
+def test_batch_endpoint_reports_bad_jsonl_lines_without_truncating(fake_batch_llm):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    body = '"a"\n{not json\n{"txt": "b"}\n"c"\n{"text": "d"'
+    resp = TestClient(app).post(
+        "/api/v1/profiling/profile/batch", content=body, headers={"content-type": "application/x-ndjson"}
+    )
+
+    assert resp.status_code == 200
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert sorted(line["line"] for line in lines if "error" in line) == [2, 3, 5]
+    assert sorted((line["index"], line["reason"]) for line in lines if "index" in line) == [(0, "a"), (1, "c")]
+
+
+def test_openai_errors_fall_back_to_the_rules_at_once_for_single_and_batch_triage(monkeypatch):
+    import httpx
+    import openai
+
+    async def create(**kwargs):
+        raise openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+
+    monkeypatch.setattr(profiling.openai_client().chat.completions, "create", create)
+    monkeypatch.setattr(profiling, "profile_cache", AsyncTTLCache())
+
+    async def run():
+        single = await profiling.profile_text("I have crushing chest pain")
+        batch = dict([item async for item in profiling.profile_texts_batch(["I have crushing chest pain"])])
+        return single, batch[0]
+
+    single, batched = asyncio.run(run())
+    assert single == batched
+    assert single["urgency"] == "HIGH" and "APIConnectionError" in single["error"]
@@ -0,0 +1,133 @@
+import asyncio
+import io
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.services import profiling, resilience
+from app.services.cache import AsyncTTLCache
+from app.services.resilience import (
+    AdaptiveLimiter, CircuitBreaker, CircuitOpen, ConcurrencyLimiter, Overloaded, Provider, ProviderTimeout,
+)
+
+
+def test_limit_grows_additively_and_backs_off_once_per_round_trip(clock):
+    limiter = AdaptiveLimiter("p", initial=4, min_limit=1, max_limit=10, max_queue=0, queue_timeout=1, clock=clock)
+    for _ in range(40):
+        limiter.record(0.1, True)
+    assert 8 < limiter.limit <= 10
+
+    grown = limiter.limit
+    # a burst of failures from calls that were in flight together costs one cut
+    for _ in range(5):
+        limiter.record(0.1, False)
+    assert limiter.limit == pytest.approx(grown * 0.9)
+    clock.now += 1
+    # latency far above the long-run average is congestion as well
+    for _ in range(3):
+        limiter.record(2.0, True)
+    assert limiter.limit == pytest.approx(grown * 0.81)
+
+
+def test_limiter_queues_in_order_and_sheds_beyond_the_queue():
+    limiter = ConcurrencyLimiter("p", limit=1, max_queue=2, queue_timeout=0.05)
+    order = []
+
+    async def holder(name, hold):
+        await limiter.acquire()
+        order.append(name)
+        await asyncio.sleep(hold)
+        limiter.release()
+
+    async def run():
+        first = asyncio.create_task(holder("first", 0.02))
+        await asyncio.sleep(0)
+        queued = [asyncio.create_task(holder(name, 0)) for name in ("second", "third")]
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded):
+            await limiter.acquire()
+        await asyncio.gather(first, *queued)
+
+        # a waiter that times out leaves no slot behind
+        await limiter.acquire()
+        with pytest.raises(Overloaded) as shed:
+            await limiter.acquire()
+        limiter.release()
+        return shed.value
+
+    shed = asyncio.run(run())
+    assert order == ["first", "second", "third"]
+    assert limiter.inflight == 0 and limiter.queued == 0 and limiter.rejected == 2
+    assert shed.retry_after == 0.05
+
+
+def test_breaker_fails_fast_then_lets_one_probe_through(clock):
+    breaker = CircuitBreaker("p", failure_threshold=3, reset_after=10, clock=clock)
+    provider = Provider("p", timeout=0.05, breaker=breaker)
+    calls = []
+
+    async def failing():
+        calls.append("call")
+        raise ConnectionError("down")
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    async def ok():
+        calls.append("probe")
+        return "fine"
+
+    async def run():
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                await provider.call(failing)
+        with pytest.raises(ProviderTimeout):
+            await provider.call(slow)
+        with pytest.raises(CircuitOpen) as opened:
+            await provider.call(failing)
+        clock.now = 11
+        return opened.value, await provider.call(ok)
+
+    opened, answer = asyncio.run(run())
+    assert calls == ["call", "call", "probe"]
+    assert opened.retry_after == 10 and answer == "fine"
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.opens == 1
+
+
+def test_triage_falls_back_to_local_rules_while_the_llm_circuit_is_open(monkeypatch):
+    calls = []
+
+    async def create(**kwargs):
+        calls.append(kwargs)
+        raise ConnectionError("upstream unreachable")
+
+    monkeypatch.setattr(profiling.openai_client().chat.completions, "create", create)
+    monkeypatch.setattr(profiling, "profile_cache", AsyncTTLCache())
+    monkeypatch.setattr(resilience.settings, "CIRCUIT_FAILURE_THRESHOLD", 2)
+
+    async def run():
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                await profiling.profile_text("note")
+        return [await profiling.profile_text(text) for text in ("I have crushing chest pain", "mild headache")]
+
+    urgent, mild = asyncio.run(run())
+    assert len(calls) == 2
+    assert urgent["urgency"] == "HIGH" and urgent["tags"] == ["chest_pain"] and "CircuitOpen" in urgent["error"]
+    assert mild["urgency"] == "MEDIUM" and mild["reason"].startswith("LLM triage unavailable")
+
+
+def test_patient_alert_sheds_load_with_503_and_retry_after(monkeypatch):
+    from app.api.v1.endpoints import patient_alert
+    from app.main import app
+
+    monkeypatch.setattr(patient_alert, "request_limiter", ConcurrencyLimiter("patient_alert", 0, 0, 2.5))
+
+    resp = TestClient(app).post(
+        "/api/v1/patient_alert/patient_alert",
+        data={"user_id": "u1"},
+        files={"file": ("note.wav", io.BytesIO(b"RIFF"), "audio/wav")},
+    )
+
+    assert resp.status_code == 503
+    assert resp.headers["retry-after"] == "3"
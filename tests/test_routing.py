@@ -0,0 +1,83 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.database import init_db
+from app.models.routing import CareTeamMember, OnCallShift, PatientCareTeam
+from app.services.routing import Member, RecipientRouter, RoutingDelta, RoutingIndex, Shift
+
+
+def test_index_routes_by_urgency_tags_and_shift_and_apply_leaves_the_old_index_alone():
+    index = RoutingIndex().apply(RoutingDelta(
+        [("p1", "cardio"), ("p2", "cardio"), ("p3", "neuro")],
+        [
+            (1, "cardio", Member("email", "cardio@example.com", 0, frozenset())),
+            (2, "cardio", Member("sms", "+1555001", 2, frozenset())),
+            (3, "cardio", Member("sms", "+1555002", 0, frozenset({"fall"}))),
+        ],
+        [
+            (1, "cardio", Shift(100, 200, "sms", "+1555100")),
+            (2, None, Shift(0, 1000, "webhook", "https://oncall.example.com")),
+        ],
+    ))
+    assert index.recipients("p1", "low", now=150) == {
+        "email": ["cardio@example.com"], "sms": ["+1555100"], "webhook": ["https://oncall.example.com"],
+    }
+    assert index.recipients("p2", "HIGH", ["Fall"], now=300)["sms"] == ["+1555001", "+1555002"]
+    assert index.recipients("unknown", "HIGH", now=150) == {"webhook": ["https://oncall.example.com"]}
+
+    # enough patients to grow the table: the rehash keeps every mapping
+    many = [(f"patient-{n}", f"team-{n % 7}") for n in range(1000)]
+    moved = index.apply(RoutingDelta(many + [("p1", "neuro"), ("p2", None)], [(2, "neuro", None)], []))
+    assert [moved.team_of(p) for p in ("p1", "p2", "p3", "patient-999")] == ["neuro", None, "neuro", "team-5"]
+    assert moved.patients == 1002 and moved.stats()["members"] == 2
+    assert [index.team_of(p) for p in ("p1", "p2", "patient-999")] == ["cardio", "cardio", None]
+    assert index.patients == 3 and index.member(2) is not None
+
+
+def test_router_loads_then_applies_only_changed_rows(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'routing.db'}")
+    sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+    router = RecipientRouter(sessionmaker)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+
+    async def run():
+        await init_db(engine)
+        async with sessionmaker() as session:
+            session.add_all([
+                PatientCareTeam(user_id="p1", team_id="cardio", updated_at=now),
+                PatientCareTeam(user_id="p2", team_id="cardio", updated_at=now),
+                CareTeamMember(id=1, team_id="cardio", channel="email", address="a@example.com",
+                               min_urgency="MEDIUM", updated_at=now),
+                OnCallShift(id=1, team_id=None, channel="sms", address="+1555100", starts_at=now - timedelta(hours=1),
+                            ends_at=now + timedelta(hours=1), updated_at=now),
+                OnCallShift(id=2, team_id="cardio", channel="sms", address="+1555200",
+                            starts_at=now - timedelta(hours=2), ends_at=now - timedelta(hours=1), updated_at=now),
+            ])
+            await session.commit()
+        loaded = await router.refresh()
+        first = router.index
+        unchanged = await router.refresh()
+
+        later = now + timedelta(minutes=1)
+        async with sessionmaker() as session:
+            await session.execute(
+                update(PatientCareTeam).where(PatientCareTeam.user_id == "p2").values(active=False, updated_at=later)
+            )
+            session.add(CareTeamMember(id=2, team_id="cardio", channel="sms", address="+1555300", updated_at=later))
+            await session.commit()
+        changed = await router.refresh()
+        await engine.dispose()
+        return loaded, unchanged, changed, first
+
+    loaded, unchanged, changed, first = asyncio.run(run())
+    # the shift that is already over is not loaded
+    assert (loaded, unchanged, changed) == (4, 0, 2)
+    assert router.recipients("p1", "HIGH") == {"email": ["a@example.com"], "sms": ["+1555300", "+1555100"]}
+    assert router.recipients("p1", "LOW") == {"sms": ["+1555300", "+1555100"]}
+    assert router.recipients("p2", "HIGH") == {"sms": ["+1555100"]}
+    # requests holding the previous index still see it whole
+    assert first.team_of("p2") == "cardio" and first.member(2) is None
+    assert router.stats()["refreshes"] == 3
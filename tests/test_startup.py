@@ -0,0 +1,66 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+
+from app.services.clients import ClientRegistry
+
+
+def test_importing_the_app_needs_no_settings_and_loads_no_provider_sdks():
+    env = {k: v for k, v in os.environ.items() if k not in ("DATABASE_URL", "API_KEY", "ALERT_THRESHOLD")}
+    code = "import sys, app.main; print(sorted(m for m in ('openai', 'twilio', 'numpy', 'pydub') if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "[]"
+
+
+def test_clients_are_built_once_on_first_use_and_warming_never_raises():
+    built, connected, closed = [], [], []
+    registry = ClientRegistry()
+
+    async def connect(client):
+        connected.append(client)
+
+    async def close(client):
+        closed.append(client)
+
+    def broken():
+        raise ImportError("no such SDK")
+
+    registry.register("sdk", lambda: built.append("sdk") or "client", connect=connect, close=close)
+    registry.register("broken", broken)
+    assert not registry.loaded("sdk") and built == []
+
+    async def run():
+        await registry.warm(["sdk", "broken", "unknown"], connect=True)
+        assert registry.get("sdk") == "client"
+        await registry.aclose()
+
+    asyncio.run(run())
+    assert built == ["sdk"] and connected == ["client"] and closed == ["client"]
+    assert not registry.loaded("broken") and not registry.loaded("sdk")
+    assert registry.stats()["sdk_load_seconds"] >= 0
+
+
+def test_ready_answers_503_until_the_clients_are_warm(monkeypatch):
+    from app.main import app
+
+    client = TestClient(app)
+    warming = client.get("/ready")
+    assert warming.status_code == 503 and warming.json()["checks"]["clients"] == "warming"
+
+    async def done():
+        task = asyncio.ensure_future(asyncio.sleep(0))
+        await task
+        return task
+
+    monkeypatch.setattr(app.state, "warmup", asyncio.run(done()), raising=False)
+    # the local ASR pool is still loading its model
+    assert client.get("/ready").json()["checks"]["local_asr"] == "warming"
+    monkeypatch.setattr(app.state, "asr_warmup", asyncio.run(done()), raising=False)
+    ready = client.get("/ready")
+    assert ready.status_code == 200
+    assert ready.json() == {
+        "ready": True, "checks": {"clients": "ok", "local_asr": "ok", "config": "ok", "database": "ok"},
+    }
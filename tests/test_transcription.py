@@ -1,3 +1,7 @@
+import asyncio
+
+import pytest
+
 from fastapi.testclient import TestClient
 from app.main import app
 from app.services.transcription import transcribe_audio
@@ -19,4 +23,75 @@ def test_transcribe_audio_invalid_format():
     audio_file = "path/to/test/invalid_format.txt"  # Replace with an invalid audio file path
     response = client.post("/api/v1/transcriptions/", files={"file": open(audio_file, "rb")})
     assert response.status_code == 415  # Unsupported Media Type
-    assert "detail" in response.json()  # Check for appropriate error message
\ No newline at end of file
+    assert "detail" in response.json()  # Check for appropriate error message
+
+
+def test_transcribe_audio_is_content_addressed(monkeypatch, tmp_path):
+    from app.services import transcription
+
+    calls = []
+
+    async def fake_upstream(path):
+        calls.append(path)
+        return "my chest hurts"
+
+    monkeypatch.setattr(transcription, "_transcribe_upstream", fake_upstream)
+    monkeypatch.setattr(transcription, "transcription_cache", transcription.AsyncTTLCache())
+    first, retry, other = tmp_path / "a.wav", tmp_path / "b.wav", tmp_path / "c.wav"
+    first.write_bytes(b"RIFF same audio")
+    retry.write_bytes(b"RIFF same audio")
+    other.write_bytes(b"RIFF other audio")
+
+    async def run():
+        return [await transcription.transcribe_audio(str(p)) for p in (first, retry, other)]
+
+    assert asyncio.run(run()) == ["my chest hurts"] * 3
+    assert calls == [str(first), str(other)]
+
+
+def test_slow_or_failing_backend_falls_back_without_caching(monkeypatch, tmp_path):
+    from app.services import transcription
+
+    class FakeBackend(transcription.TranscriptionBackend):
+        def __init__(self, name, delay, text=None):
+            self.name = self.model_id = name
+            self.delay, self.text, self.calls = delay, text, 0
+
+        async def transcribe(self, audio_path):
+            self.calls += 1
+            await asyncio.sleep(self.delay)
+            if self.text is None:
+                raise RuntimeError("upstream down")
+            return self.text
+
+    def use(primary, fallback):
+        monkeypatch.setattr(transcription, "_backends", {"openai": primary, "local": fallback})
+
+    monkeypatch.setattr(transcription.settings, "VAD_ENABLED", False)
+    monkeypatch.setattr(transcription.settings, "TRANSCRIPTION_FALLBACK_BACKEND", "local")
+    monkeypatch.setattr(transcription.settings, "TRANSCRIPTION_FALLBACK_AFTER_SECONDS", 0.05)
+    monkeypatch.setattr(transcription, "transcription_cache", transcription.AsyncTTLCache())
+    note = tmp_path / "note.wav"
+    note.write_bytes(b"RIFF audio")
+
+    def run():
+        return asyncio.run(transcription.transcribe_audio_with_stats(str(note)))
+
+    use(FakeBackend("openai", 0.0, "whisper text"), FakeBackend("local", 0.0, "local text"))
+    assert run()["backend"] == "openai"
+
+    asyncio.run(transcription.transcription_cache.clear())
+    slow, local = FakeBackend("openai", 1.0, "whisper text"), FakeBackend("local", 0.0, "local text")
+    use(slow, local)
+    assert run()["text"] == "local text"
+    # the degraded transcript is not cached: the next request asks the primary again
+    assert run()["backend"] == "local" and slow.calls == 2
+    assert transcription.transcription_cache.stats()["size"] == 0
+
+    down, local = FakeBackend("openai", 0.0), FakeBackend("local", 0.01, "local text")
+    use(down, local)
+    assert run()["backend"] == "local"
+
+    use(FakeBackend("openai", 0.0), FakeBackend("local", 0.0))
+    with pytest.raises(RuntimeError, match="upstream down"):
+        run()
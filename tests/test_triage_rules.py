@@ -0,0 +1,75 @@
+import io
+
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import patient_alert
+from app.main import app
+from app.services.profiling import analyze_text
+from app.services.triage_rules import RedFlagMatcher, pretriage
+
+
+def test_obvious_emergency_is_high_with_tags():
+    result = pretriage("I have chest pain and I can’t breathe properly")
+
+    assert result["urgency"] == "HIGH"
+    assert result["tags"] == ["chest_pain", "shortness_of_breath"]
+    assert result["confidence"] >= 0.9
+
+
+def test_negated_and_partial_words_do_not_match():
+    assert pretriage("No chest pain today, just a mild headache")["tags"] == ["headache"]
+    assert pretriage("The painter fell asleep")["tags"] == []
+    assert pretriage("I'm fine, thanks")["urgency"] == "LOW"
+    # a negation in an earlier clause does not hide a red flag
+    assert pretriage("I don't know, chest pain since noon")["tags"] == ["chest_pain"]
+
+
+def test_confidence_combines_findings():
+    matcher = RedFlagMatcher({"a": (0.5, ("alpha",)), "b": (0.5, ("beta",))})
+
+    assert matcher.assess("alpha")["confidence"] == 0.5
+    assert matcher.assess("alpha and beta and alpha")["confidence"] == 0.75
+    assert matcher.match("alpha and beta and alpha") == {"a": ["alpha", "alpha"], "b": ["beta"]}
+
+
+def test_analyze_text_keeps_keyword_scoring():
+    result = analyze_text("URGENT: this is an emergency, need help ASAP")
+
+    assert result["urgency_level"] == "high"
+    assert result["urgency_score"] == 3
+
+
+def test_patient_alert_pages_before_llm_for_red_flags(monkeypatch):
+    events = []
+
+    async def fake_transcribe(path):
+        return {"text": "chest pain and I cannot breathe", "seconds_removed": 1.5}
+
+    async def fake_enqueue(db, urgency_level, message, user_id=None, alert_id=None):
+        events.append(("alert", urgency_level))
+        return {"webhook": {"http://hook.local": None}}
+
+    async def fake_profile(text):
+        events.append(("llm", text))
+        return {"urgency": "HIGH", "tags": ["chest_pain"], "reason": "llm"}
+
+    monkeypatch.setattr(patient_alert, "transcribe_audio_with_stats", fake_transcribe)
+    monkeypatch.setattr(patient_alert, "enqueue_alert", fake_enqueue)
+    monkeypatch.setattr(patient_alert, "profile_text", fake_profile)
+    monkeypatch.setattr(patient_alert.settings, "ALERT_DELIVERY_MODE", "outbox")
+    monkeypatch.setattr(patient_alert.settings, "PRETRIAGE_SKIP_LLM", True)
+    client = TestClient(app)
+
+    resp = client.post(
+        "/api/v1/patient_alert/patient_alert",
+        data={"user_id": "u1"},
+        files={"file": ("note.wav", io.BytesIO(b"RIFF"), "audio/wav")},
+    )
+
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["triage_source"] == "rules" and body["urgency_level"] == "HIGH"
+    # queued, not yet delivered: reported as null but still counted as sent
+    assert body["alert_sent"] is True and body["alert_results"] == {"webhook": {"http://hook.local": None}}
+    assert body["audio_seconds_removed"] == 1.5
+    assert events == [("alert", "HIGH")]
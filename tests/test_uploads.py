@@ -0,0 +1,91 @@
+import asyncio
+import io
+import os
+
+import pytest
+from fastapi import FastAPI, File, Request, UploadFile
+from fastapi.testclient import TestClient
+
+from app.utils.uploads import MaxBodySizeMiddleware, UploadTooLarge, save_upload, temporary_upload
+
+
+def _upload(data: bytes, name="note.wav") -> UploadFile:
+    return UploadFile(io.BytesIO(data), filename=name)
+
+
+def test_save_upload_streams_in_chunks():
+    data = os.urandom(300_000)
+
+    path = asyncio.run(save_upload(_upload(data), max_bytes=1_000_000, chunk_size=64 * 1024))
+    try:
+        assert path.endswith(".wav")
+        with open(path, "rb") as f:
+            assert f.read() == data
+    finally:
+        os.remove(path)
+
+
+def test_save_upload_rejects_oversized_file_and_cleans_up(monkeypatch, tmp_path):
+    monkeypatch.setattr("tempfile.tempdir", str(tmp_path))
+
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(save_upload(_upload(b"x" * 10_000), max_bytes=4_096, chunk_size=1_024))
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_temporary_upload_removes_file_when_body_raises():
+    async def run():
+        async with temporary_upload(_upload(b"abc"), max_bytes=10) as path:
+            seen.append(path)
+            raise RuntimeError("transcription failed")
+
+    seen = []
+    with pytest.raises(RuntimeError):
+        asyncio.run(run())
+
+    assert not os.path.exists(seen[0])
+
+
+def test_max_body_size_middleware_rejects_streamed_body():
+    app = FastAPI()
+    app.add_middleware(MaxBodySizeMiddleware, max_bytes=1_000)
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+
+    @app.post("/raw")
+    async def raw(request: Request):
+        return {"size": len(await request.body())}
+
+    client = TestClient(app)
+
+    ok = client.post("/upload", files={"file": ("a.wav", b"x" * 100, "audio/wav")})
+    too_big = client.post("/upload", files={"file": ("a.wav", b"x" * 5_000, "audio/wav")})
+
+    def chunks():
+        for _ in range(10):
+            yield b"x" * 500
+
+    # no Content-Length: the limit is enforced while the chunks arrive
+    streamed = client.post("/raw", content=chunks())
+
+    assert ok.status_code == 200 and ok.json() == {"size": 100}
+    assert too_big.status_code == 413
+    assert streamed.status_code == 413
+
+
+def test_max_body_size_middleware_only_caps_listed_paths():
+    app = FastAPI()
+    app.add_middleware(MaxBodySizeMiddleware, max_bytes=1_000, paths=("/upload",))
+
+    @app.post("/upload/raw")
+    @app.post("/batch")
+    async def raw(request: Request):
+        return {"size": len(await request.body())}
+
+    client = TestClient(app)
+
+    assert client.post("/upload/raw", content=b"x" * 5_000).status_code == 413
+    assert client.post("/batch", content=b"x" * 5_000).json() == {"size": 5_000}
@@ -0,0 +1,69 @@
+import asyncio
+import wave
+
+import numpy as np
+
+from app.services import transcription
+from app.services.vad import trim_silence
+from app.utils.audio import wav_info
+
+RATE = 44100
+
+
+def _voice(seconds):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return 0.5 * np.sin(2 * np.pi * 180 * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 3 * t))
+
+
+def _write_note(path, parts, noise=0.003):
+    """parts: ("speech" | "silence", seconds); stereo 44.1 kHz with a noise floor throughout."""
+    rng = np.random.default_rng(3)
+    signal = np.concatenate([
+        (_voice(sec) if kind == "speech" else 0) + noise * rng.standard_normal(int(sec * RATE)) for kind, sec in parts
+    ])
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(RATE)
+        w.writeframes((np.repeat(signal[:, None], 2, axis=1) * 32767).astype(np.int16).tobytes())
+
+
+def test_drops_leading_trailing_and_long_pauses_only(tmp_path):
+    note, out = tmp_path / "note.wav", tmp_path / "speech.wav"
+    _write_note(note, [("silence", 4), ("speech", 3), ("silence", 0.3), ("speech", 2),
+                       ("silence", 8), ("speech", 2), ("silence", 5)])
+
+    stats = trim_silence(str(note), str(out))
+
+    assert stats["audio_seconds"] == 24.3
+    # 7.3 s of speech incl. the short pause, plus 0.2 s padding either side of two segments
+    assert 7.3 <= stats["speech_seconds"] <= 8.3
+    assert np.isclose(stats["seconds_removed"], stats["audio_seconds"] - stats["speech_seconds"])
+    info = wav_info(str(out))
+    assert (info.rate, info.channels, info.sample_width) == (16000, 1, 2)
+    assert abs(info.frames / 16000 - stats["speech_seconds"]) < 0.05
+    assert out.stat().st_size < note.stat().st_size / 10
+
+
+def test_transcription_uploads_speech_and_reports_removed_seconds(tmp_path, monkeypatch):
+    note, silent = tmp_path / "note.wav", tmp_path / "silent.wav"
+    _write_note(note, [("silence", 5), ("speech", 2), ("silence", 5)])
+    _write_note(silent, [("silence", 3)], noise=0.0003)
+    uploads = []
+
+    async def fake_upstream(path):
+        uploads.append((path, wav_info(path).frames / wav_info(path).rate))
+        return "hello doctor"
+
+    monkeypatch.setattr(transcription, "_transcribe_upstream", fake_upstream)
+    monkeypatch.setattr(transcription, "transcription_cache", transcription.AsyncTTLCache())
+
+    async def run():
+        return [await transcription.transcribe_audio_with_stats(str(p)) for p in (note, silent)]
+
+    speech, nothing = asyncio.run(run())
+
+    assert speech["text"] == "hello doctor" and speech["seconds_removed"] > 9
+    assert uploads[0][0] != str(note) and uploads[0][1] < 3
+    # no speech detected: the original is sent rather than dropping the note
+    assert uploads[1] == (str(silent), 3.0) and nothing["seconds_removed"] == 0
@@ -1,15 +1,95 @@
-from fastapi import BackgroundTasks
-from app.services.transcription import transcribe_audio
-from app.services.profiling import analyze_text
+"""
+Alert outbox worker.
+
+    python -m workers.worker --consumers 4 --batch-size 50
+
+Runs N concurrent consumers that drain the alert outbox written by the API,
+retrying failed deliveries with backoff until they succeed or are
+dead-lettered. Start more processes (or raise --consumers) to scale delivery.
+`python -m workers.worker --process FILE...` runs the full pipeline once per
+audio file instead, for scripts.
+"""
+import argparse
+import asyncio
+import signal
+from typing import Any, Dict
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.database import dispose_engine, get_sessionmaker, init_db
+from app.services import alerting, outbox
+from app.services.transcription import close_transcription_backends, transcribe_audio
+from app.services.profiling import profile_text
 from app.services.alerting import trigger_alert
 
-def process_audio(audio_file: str, background_tasks: BackgroundTasks):
+
+async def process_audio(audio_file: str) -> Dict[str, Any]:
     # Step 1: Transcribe audio
-    transcribed_text = transcribe_audio(audio_file)
-    
+    transcribed_text = await transcribe_audio(audio_file)
+
     # Step 2: Profile the transcribed text
-    urgency_level = analyze_text(transcribed_text)
-    
-    # Step 3: Send alert if necessary
-    if urgency_level == "high":
-        background_tasks.add_task(trigger_alert, transcribed_text)
\ No newline at end of file
+    profile = await profile_text(transcribed_text)
+    urgency_level = profile.get("urgency", "MEDIUM")
+
+    # Step 3: Send alert if necessary (low urgency plans no deliveries)
+    alert_results = await trigger_alert(urgency_level, transcribed_text)
+    return {"transcribed_text": transcribed_text, "profile": profile, "alert_results": alert_results}
+
+
+async def consume(name: str, stop: asyncio.Event, batch_size: int, poll_seconds: float) -> None:
+    sessionmaker = get_sessionmaker()
+    while not stop.is_set():
+        try:
+            processed = await outbox.drain_once(sessionmaker, batch_size)
+        except Exception:
+            logger.exception("outbox consumer %s failed to drain a batch", name)
+            processed = 0
+        if processed:
+            logger.info("outbox consumer %s processed %d deliveries", name, processed)
+            continue
+        try:
+            await asyncio.wait_for(stop.wait(), poll_seconds)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_worker(consumers: int, batch_size: int, poll_seconds: float) -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+
+    await init_db()
+    await alerting.start_delivery_clients()
+    try:
+        await asyncio.gather(
+            *(consume(f"c{i}", stop, batch_size, poll_seconds) for i in range(consumers))
+        )
+    finally:
+        await alerting.close_delivery_clients()
+        await dispose_engine()
+
+
+async def _process_files(paths):
+    try:
+        for path in paths:
+            print(await process_audio(path))
+    finally:
+        await close_transcription_backends()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--consumers", type=int, default=settings.WORKER_CONSUMERS)
+    parser.add_argument("--batch-size", type=int, default=settings.OUTBOX_BATCH_SIZE)
+    parser.add_argument("--poll-seconds", type=float, default=settings.OUTBOX_POLL_SECONDS)
+    parser.add_argument("--process", nargs="+", metavar="FILE", help="run the pipeline on audio files and exit")
+    args = parser.parse_args()
+
+    if args.process:
+        asyncio.run(_process_files(args.process))
+    else:
+        asyncio.run(run_worker(args.consumers, args.batch_size, args.poll_seconds))